@@ -0,0 +1,405 @@
+"""Streaming anomaly detection over bank statement withdrawals.
+
+``analyze_bank_statement`` hands each new statement to ``observe_statements``,
+which updates running statistics in a single pass and flags:
+
+- ``amount_spike``: a withdrawal far above what this account usually pays this
+  merchant (z-score against a Welford running mean/variance);
+- ``new_merchant``: a merchant the account has not paid before, or not for a
+  long time (its exponentially decayed payment count has faded);
+- ``duplicate_charge``: the same amount to the same merchant from the same
+  account within ``duplicate_days``.
+
+Statistics are kept per (account, normalized merchant), so each transaction
+costs O(1) to score and update. Transactions repeated by an overlapping
+statement are recognized by the same fingerprints as dedupe.py and skipped.
+The state is kept next to the statements as a checkpoint,
+``anomaly_state.json``, plus ``anomaly_state.journal``, to which each
+statement appends only the entries it changed (O(changes), not O(state)).
+The checkpoint is rewritten once the journal outgrows it. Flags are appended
+to ``anomalies.jsonl``. A restart continues from the saved state instead of
+replaying history, and several processes (batch runs, the analyzer CLI) can
+share a folder: updates happen under a file lock, after catching up with
+whatever the others appended. To rebuild everything from the statements on
+disk (e.g. after changing thresholds)::
+
+    python anomaly.py rebuild [--tenant acme-consulting-inc]
+    python anomaly.py list --type amount_spike
+"""
+import argparse
+import json
+import math
+import os
+import re
+import threading
+from datetime import date, datetime
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from dedupe import normalize_description
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows; single writer assumed there
+    fcntl = None
+
+STATE_FILE = 'anomaly_state.json'
+JOURNAL_FILE = 'anomaly_state.journal'
+LOCK_FILE = 'anomaly_state.lock'
+FLAGS_FILE = 'anomalies.jsonl'
+FLAG_TYPES = ('amount_spike', 'new_merchant', 'duplicate_charge')
+
+# Card/payment boilerplate that does not identify the merchant
+_NOISE_TOKENS = {
+    'POS', 'PURCHASE', 'DEBIT', 'CREDIT', 'CARD', 'VISA', 'MASTERCARD', 'INTERAC', 'ACH', 'PAYMENT',
+    'PMT', 'RECURRING', 'ONLINE', 'WWW', 'COM', 'PREAUTHORIZED', 'PAP', 'BILL', 'CHECKCARD', 'TST',
+}
+_HAS_DIGIT = re.compile(r'\d')
+
+
+def merchant_key(description: str) -> str:
+    """Merchant part of a bank description: ``"POS PURCHASE STARBUCKS #1234"`` -> ``STARBUCKS``."""
+    tokens = [t for t in normalize_description(description).split()
+              if t not in _NOISE_TOKENS and not _HAS_DIGIT.search(t)]
+    return ' '.join(tokens[:3])
+
+
+def _day(value: Any) -> Optional[int]:
+    try:
+        return date.fromisoformat(str(value).strip()[:10]).toordinal()
+    except (TypeError, ValueError):
+        return None
+
+
+def _identity(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_mtime_ns
+
+
+@contextmanager
+def _file_lock(directory: str):
+    """Exclusive lock on a statements folder's anomaly state across processes."""
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, LOCK_FILE), 'a') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class AnomalyDetector:
+    """Per (account, merchant) running statistics and the flags they raise.
+
+    ``stats`` maps ``"<account>|<merchant>"`` to ``[n, mean, m2, decayed
+    count, last day, recent]`` where ``recent`` holds ``[day, cents]`` of
+    payments within the duplicate window. ``accounts`` holds ``[withdrawals,
+    first day]`` per account: merchants only count as new once the account
+    has ``min_account_days`` of history, so a newly added account does not
+    flag every merchant of its first statement. ``documents`` maps the
+    document ids seen to their last day; like the fingerprints, they are
+    dropped after ``retention_days`` (a late re-analysis is then still
+    recognized by its fingerprints).
+
+    ``sync()`` catches up with the files and ``save()`` appends the pending
+    changes; both expect the caller to hold the folder's file lock.
+    """
+
+    def __init__(self, directory: str, z_threshold: float = 3.5, min_history: int = 5,
+                 min_spike: float = 20.0, half_life_days: float = 180.0, new_below: float = 0.1,
+                 min_account_days: int = 60, duplicate_days: int = 1, retention_days: int = 400):
+        self.directory = directory
+        self.z_threshold = z_threshold
+        self.min_history = min_history
+        self.min_spike = min_spike
+        self.half_life_days = half_life_days
+        self.new_below = new_below
+        self.min_account_days = min_account_days
+        self.duplicate_days = duplicate_days
+        self.retention_days = retention_days
+        self._checkpoint: Optional[Tuple[int, int]] = None  # identity of the checkpoint file loaded
+        self._clear()
+        self.sync()
+
+    @property
+    def state_path(self) -> str:
+        return os.path.join(self.directory, STATE_FILE)
+
+    @property
+    def journal_path(self) -> str:
+        return os.path.join(self.directory, JOURNAL_FILE)
+
+    def _clear(self):
+        self.stats: Dict[str, list] = {}
+        self.accounts: Dict[str, list] = {}
+        self.fingerprints: Dict[str, int] = {}  # transaction fingerprint -> day, for overlap detection
+        self.documents: Dict[str, int] = {}  # document id -> last day
+        self.last_day = 0
+        self.sequence = 0  # last journal entry applied
+        self._journal_offset = 0
+        self._pending = {'stats': set(), 'accounts': set(), 'fingerprints': {}, 'documents': {}}
+
+    def sync(self):
+        """Load what other processes wrote since: the checkpoint if it was replaced, then new journal lines."""
+        checkpoint = _identity(self.state_path)
+        if checkpoint != self._checkpoint:
+            self._clear()
+            self._checkpoint = checkpoint
+            if checkpoint is not None:
+                try:
+                    with open(self.state_path, 'r') as f:
+                        state = json.load(f)
+                except Exception as e:
+                    print(f"Error reading anomaly state {self.state_path}: {e}")
+                    state = {}
+                self.stats = state.get('stats', {})
+                self.accounts = state.get('accounts', {})
+                self.fingerprints = state.get('fingerprints', {})
+                documents = state.get('documents', {})
+                # Older checkpoints kept a plain list of ids
+                self.documents = documents if isinstance(documents, dict) else dict.fromkeys(documents, 0)
+                self.last_day = state.get('last_day', 0)
+                self.sequence = state.get('sequence', 0)
+        try:
+            with open(self.journal_path, 'rb') as f:
+                f.seek(self._journal_offset)
+                data = f.read()
+        except FileNotFoundError:
+            return
+        end = data.rfind(b'\n') + 1
+        if end < len(data):
+            # A writer died mid-line: drop the fragment so the next entry starts on its own line
+            os.truncate(self.journal_path, self._journal_offset + end)
+        for line in data[:end].splitlines():
+            entry = json.loads(line)
+            if entry['sequence'] <= self.sequence:
+                continue  # already in the checkpoint
+            self.stats.update(entry['stats'])
+            self.accounts.update(entry['accounts'])
+            self.fingerprints.update(entry['fingerprints'])
+            self.documents.update(entry['documents'])
+            self.last_day = max(self.last_day, entry['last_day'])
+            self.sequence = entry['sequence']
+        self._journal_offset += end
+
+    def save(self):
+        """Append the changes since the last save to the journal; rewrite the checkpoint when it outgrew it."""
+        pending = self._pending
+        if not any(pending.values()):
+            return
+        self.sequence += 1
+        entry = {
+            'sequence': self.sequence,
+            'last_day': self.last_day,
+            'documents': pending['documents'],
+            'accounts': {k: self.accounts[k] for k in pending['accounts']},
+            'stats': {k: self.stats[k] for k in pending['stats']},
+            'fingerprints': pending['fingerprints'],
+        }
+        self._pending = {'stats': set(), 'accounts': set(), 'fingerprints': {}, 'documents': {}}
+        line = (json.dumps(entry, separators=(',', ':')) + '\n').encode('utf-8')
+        with open(self.journal_path, 'ab') as f:
+            f.write(line)
+        self._journal_offset += len(line)
+        try:
+            checkpoint_bytes = os.path.getsize(self.state_path)
+        except FileNotFoundError:
+            checkpoint_bytes = 0
+        if self._journal_offset >= checkpoint_bytes:
+            self.compact()
+
+    def compact(self):
+        """Write the whole state as the checkpoint and start an empty journal."""
+        # Fingerprints and document ids only need to outlive the overlap between statements
+        cutoff = self.last_day - self.retention_days
+        self.fingerprints = {k: d for k, d in self.fingerprints.items() if d >= cutoff}
+        self.documents = {k: d for k, d in self.documents.items() if d >= cutoff}
+        state = {
+            'saved_at': datetime.now().isoformat(timespec='seconds'),
+            'sequence': self.sequence,
+            'last_day': self.last_day,
+            'documents': self.documents,
+            'accounts': self.accounts,
+            'stats': self.stats,
+            'fingerprints': self.fingerprints,
+        }
+        os.makedirs(self.directory, exist_ok=True)
+        tmp = f'{self.state_path}.{os.getpid()}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(state, f, separators=(',', ':'))
+        os.replace(tmp, self.state_path)
+        # Entries up to ``sequence`` are now in the checkpoint, so a crash before this is harmless
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+        self._journal_offset = 0
+        self._checkpoint = _identity(self.state_path)
+
+    def _decay(self, count: float, last_day: int, day: int) -> float:
+        return count * math.pow(0.5, abs(day - last_day) / self.half_life_days)
+
+    def observe(self, document: str, statements: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Score and absorb one document's withdrawals; a document id already seen is ignored."""
+        if document in self.documents:
+            return []
+        flags = []
+        last_day = self.last_day
+        for statement in statements:
+            for account in statement.get('accounts') or []:
+                number = str(account.get('account_number') or '')
+                ordinals: Dict[tuple, int] = {}
+                for tx in account.get('transactions') or []:
+                    withdrawal = float(tx.get('withdrawal') or 0.0)
+                    day = _day(tx.get('date'))
+                    if withdrawal <= 0 or day is None:
+                        continue
+                    description = tx.get('description') or ''
+                    cents = int(round(withdrawal * 100))
+                    key = (number, day, cents, normalize_description(description))
+                    ordinals[key] = ordinals.get(key, 0) + 1
+                    fingerprint = f'{number}|{day}|{cents}|{key[3]}|{ordinals[key]}'
+                    if fingerprint in self.fingerprints:
+                        continue  # repeated by an overlapping statement
+                    self.fingerprints[fingerprint] = day
+                    self._pending['fingerprints'][fingerprint] = day
+                    last_day = max(last_day, day)
+                    flags += self._update(document, number, merchant_key(description) or key[3],
+                                          day, withdrawal, cents, tx)
+        self.documents[document] = last_day
+        self._pending['documents'][document] = last_day
+        return flags
+
+    def _update(self, document: str, account: str, merchant: str, day: int, amount: float, cents: int,
+                tx: Dict[str, Any]) -> List[Dict[str, Any]]:
+        key = f'{account}|{merchant}'
+        n, mean, m2, count, last, recent = self.stats.get(key) or [0, 0.0, 0.0, 0.0, day, []]
+        withdrawals, first_day = self.accounts.get(account) or [0, day]
+        flags = []
+
+        def flag(kind, **detail):
+            flags.append({
+                'type': kind, 'account': account, 'merchant': merchant, 'date': tx.get('date'),
+                'amount': amount, 'description': tx.get('description') or '', 'document': document,
+                'detail': detail,
+            })
+
+        if n >= self.min_history:
+            std = math.sqrt(m2 / (n - 1))
+            z = (amount - mean) / max(std, 0.05 * mean, 1.0)
+            if z >= self.z_threshold and amount - mean >= self.min_spike:
+                flag('amount_spike', z=round(z, 2), mean=round(mean, 2), std=round(std, 2), payments=n)
+        decayed = self._decay(count, last, day)
+        if day - first_day >= self.min_account_days and decayed < self.new_below:
+            flag('new_merchant', previous_payments=n, last_paid=date.fromordinal(last).isoformat() if n else None)
+        recent = [r for r in recent if abs(day - r[0]) <= self.duplicate_days]
+        twin = next((r for r in recent if r[1] == cents), None)
+        if twin is not None:
+            flag('duplicate_charge', other_date=date.fromordinal(twin[0]).isoformat(), days_apart=abs(day - twin[0]))
+
+        # Welford update of the amount statistics
+        n += 1
+        delta = amount - mean
+        mean += delta / n
+        m2 += delta * (amount - mean)
+        recent.append([day, cents])
+        self.stats[key] = [n, mean, m2, decayed + 1.0, max(last, day), recent]
+        self.accounts[account] = [withdrawals + 1, min(first_day, day)]
+        self._pending['stats'].add(key)
+        self._pending['accounts'].add(account)
+        self.last_day = max(self.last_day, day)
+        return flags
+
+
+# One detector per statements folder, shared by the analyzer threads of a batch
+_detectors: Dict[str, AnomalyDetector] = {}
+_lock = threading.Lock()
+
+
+def observe_statements(directory: str, document: str, statements: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Run the anomaly stage for one analyzed statement file and persist state and flags."""
+    with _lock, _file_lock(directory):
+        detector = _detectors.get(directory)
+        if detector is None:
+            detector = _detectors[directory] = AnomalyDetector(directory)
+        else:
+            detector.sync()
+        flags = detector.observe(document, statements)
+        detected_at = datetime.now().isoformat(timespec='seconds')
+        if flags:
+            with open(os.path.join(directory, FLAGS_FILE), 'a') as f:
+                for flag in flags:
+                    f.write(json.dumps(dict(flag, detected_at=detected_at)) + '\n')
+        detector.save()
+    return flags
+
+
+def read_flags(directory: str, kinds: Optional[Iterable[str]] = None, account: str = '',
+               start_date: str = '', end_date: str = '') -> List[Dict[str, Any]]:
+    """Flags recorded for a statements folder, newest transaction date first."""
+    kinds = set(kinds or FLAG_TYPES)
+    start, end = _day(start_date), _day(end_date)
+    flags = []
+    try:
+        with open(os.path.join(directory, FLAGS_FILE), 'r') as f:
+            for line in f:
+                if not line.endswith('\n'):
+                    continue  # partially written
+                flag = json.loads(line)
+                day = _day(flag.get('date'))
+                if (flag.get('type') in kinds and (not account or flag.get('account') == account)
+                        and (start is None or (day is not None and day >= start))
+                        and (end is None or (day is not None and day <= end))):
+                    flags.append(flag)
+    except FileNotFoundError:
+        return []
+    flags.sort(key=lambda f: f.get('date') or '', reverse=True)
+    return flags
+
+
+def rebuild(directory: str) -> Tuple[int, int]:
+    """Recompute state and flags from the statements in ``directory``, oldest file first."""
+    from json_folder import JsonFolder
+
+    with _lock, _file_lock(directory):
+        for name in (STATE_FILE, JOURNAL_FILE, FLAGS_FILE):
+            if os.path.exists(os.path.join(directory, name)):
+                os.remove(os.path.join(directory, name))
+        _detectors.pop(directory, None)
+    documents = JsonFolder(directory, '_bank_statement.json').documents()
+
+    def first_day(item):
+        days = [tx.get('date') or '' for s in item[1] for a in s.get('accounts') or []
+                for tx in a.get('transactions') or []]
+        return min(days) if days else ''
+
+    flagged = 0
+    for doc_id, statements in sorted(documents, key=first_day):
+        flagged += len(observe_statements(directory, doc_id, statements))
+    return len(documents), flagged
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('command', choices=['rebuild', 'list'])
+    parser.add_argument('--root', default='output')
+    parser.add_argument('--tenant', help='a tenant partition (see tenants.py) instead of the flat layout')
+    parser.add_argument('--type', choices=FLAG_TYPES, help='list: only this kind of flag')
+    args = parser.parse_args()
+
+    from tenants import partition_dir
+    directory = partition_dir('bank_statements', args.tenant, args.root)
+    if args.command == 'rebuild':
+        documents, flagged = rebuild(directory)
+        print(f"Replayed {documents} statement files: {flagged} flags")
+        return
+    for flag in read_flags(directory, [args.type] if args.type else None):
+        print(f"{flag['date']:<12} {flag['type']:<17} {flag['account']:<12} {flag['amount']:>10.2f}  "
+              f"{flag['merchant']}  {flag['detail']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,14 +1,55 @@
-from flask import Flask, render_template, jsonify, request
-import pandas as pd
+from flask import Flask, Response, render_template, jsonify, request
 import json
 import os
-from datetime import datetime
-import plotly.express as px
-import plotly.graph_objects as go
+from datetime import date, datetime
 import glob
 import re
 
+# pandas and plotly are imported inside the functions that use them: they
+# dominate import time, and workers should boot (and answer cached or
+# lightweight routes) without loading them
+
+import anomaly
+from downsample import DEFAULT_WIDTH, MAX_WIDTH, balance_series
+import export
+from http_cache import conditional, data_version
+from json_folder import JsonFolder
+from ledger import Ledger, build_view
+from matching import match_receipts
+from payables import AGING_BUCKETS, VendorAggregates, as_of_date
+import parquet_store
+from perf import PERF, init_flask, profiling_enabled, stage, timed
+from receipt_index import ReceiptIndex
+from receipt_items import ReceiptItems
+from reconcile import reconcile
+from snapshot import DEFAULT_SNAPSHOT_DIR, SnapshotReader
+import tenants
+from watcher import OutputWatcher
+
 app = Flask(__name__)
+# Per-route/stage latency histograms (see /debug/perf and /metrics)
+init_flask(app)
+
+# Shared read-only ledger snapshot (see snapshot.py); workers fall back to the loaders without one
+SNAPSHOTS = SnapshotReader(os.getenv('LEDGER_SNAPSHOT_DIR', DEFAULT_SNAPSHOT_DIR))
+_snapshot_view = {'name': None, 'view': None, 'checked': None, 'covers': False}
+_receipt_cache = {'generation': None, 'index': None}
+
+# Files each API reads; their names/sizes/mtimes form the data version behind the ETags
+BANK_SOURCES = (
+    ('output/bank_statements', '_bank_statement.json'),
+    ('output/bank_statements', '.ndjson'),
+    ('output/bank_statements', '.csv'),
+    ('output', '.csv'),
+    (os.path.join(SNAPSHOTS.root, 'CURRENT'), ''),
+)
+RECEIPT_SOURCES = (('output/receipts', '_receipt.json'), ('output/receipts', '.ndjson'))
+INVOICE_SOURCES = (('output/invoices', '_invoice.json'), ('output/invoices', '.ndjson'))
+DATASET_DIR = os.getenv('PARQUET_DATASET_DIR', parquet_store.DEFAULT_DATASET_DIR)
+DATASET_SOURCES = ((os.path.join(DATASET_DIR, parquet_store.MANIFEST_FILE), ''),)
+
+# Per-client partitions under output/<tenant>/ (see tenants.py), selected with ?tenant=
+TENANTS = tenants.TenantCache('output', max_tenants=int(os.getenv('TENANT_CACHE_SIZE', '16')))
 
 def load_bank_statements():
     """Load bank statement data from structured JSON; fallback to CSV pairs.
@@ -18,26 +59,17 @@ def load_bank_statements():
     2) CSV fallback by pairing *_summary.csv with *_all_transactions.csv
        found under output/bank_statements or output
     """
-    statements = []
     json_dir = 'output/bank_statements'
 
     # First preference: structured JSON files
-    if os.path.exists(json_dir):
-        for file in os.listdir(json_dir):
-            if file.endswith('_bank_statement.json'):
-                try:
-                    with open(os.path.join(json_dir, file), 'r') as f:
-                        payload = json.load(f)
-                        if isinstance(payload, list):
-                            statements.extend(payload)
-                        elif isinstance(payload, dict):
-                            statements.append(payload)
-                except Exception as e:
-                    print(f"Error reading file {file}: {str(e)}")
+    # (including statements appended to NDJSON segments)
+    statements = list(JsonFolder(json_dir, '_bank_statement.json').records())
 
     if statements:
         return statements
 
+    import pandas as pd
+
     # Fallback: construct from CSVs
     # Look in both bank_statements subfolder and root output
     csv_dirs = ['output/bank_statements', 'output']
@@ -167,108 +199,280 @@ def load_bank_statements():
     return []
 
 
-def load_receipts():
+# Receipt and invoice files parsed once each and re-read only when they change
+RECEIPTS = JsonFolder('output/receipts', '_receipt.json', label='receipt file')
+INVOICES = JsonFolder('output/invoices', '_invoice.json', label='invoice file')
+
+
+def load_receipts(tenant=None):
     """Load receipt data from JSON files (structured output)."""
-    output_dir = 'output/receipts'
-    receipts = []
-    if not os.path.exists(output_dir):
-        return receipts
-    for file in os.listdir(output_dir):
-        if file.endswith('_receipt.json'):
-            try:
-                with open(os.path.join(output_dir, file), 'r') as f:
-                    payload = json.load(f)
-                    # Each file may contain a list of receipts
-                    if isinstance(payload, list):
-                        receipts.extend(payload)
-                    elif isinstance(payload, dict):
-                        receipts.append(payload)
-            except Exception as e:
-                print(f"Error reading receipt file {file}: {e}")
-    return receipts
+    if tenant is not None:
+        return list(TENANTS.get(tenant).receipts.records())
+    # Each file may contain a list of receipts; the watcher keeps them current when running
+    return list(RECEIPTS.records(refresh=not WATCHER.ready.is_set()))
+
+
+# Line-item aggregates and top items, folded in as receipt files arrive (see receipt_items.py)
+RECEIPT_ITEMS = ReceiptItems(RECEIPTS)
+
+
+@timed('load')
+def load_receipt_items(tenant=None):
+    """Receipt line-item index; also normalizes the cached receipts' items."""
+    if tenant is not None:
+        return TENANTS.get(tenant).receipt_items.update()
+    return RECEIPT_ITEMS.update(refresh=not WATCHER.ready.is_set())
+
 
+# Per-vendor totals and AP aging, folded in as invoice files arrive (see payables.py)
+PAYABLES = VendorAggregates(INVOICES)
 
-def load_invoices():
+
+@timed('load')
+def load_payables(tenant=None):
+    """Vendor aggregates; also normalizes the cached invoice records (parsed dates and amounts)."""
+    if tenant is not None:
+        return TENANTS.get(tenant).payables.update()
+    return PAYABLES.update(refresh=not WATCHER.ready.is_set())
+
+
+@timed('load')
+def load_invoices(tenant=None):
     """Load invoice data from JSON files (structured output)."""
-    output_dir = 'output/invoices'
-    invoices = []
-    if not os.path.exists(output_dir):
-        return invoices
-    for file in os.listdir(output_dir):
-        if file.endswith('_invoice.json'):
-            try:
-                with open(os.path.join(output_dir, file), 'r') as f:
-                    payload = json.load(f)
-                    # Each file may contain a list of invoices
-                    if isinstance(payload, list):
-                        invoices.extend(payload)
-                    elif isinstance(payload, dict):
-                        invoices.append(payload)
-            except Exception as e:
-                print(f"Error reading invoice file {file}: {e}")
-    return invoices
+    if tenant is not None:
+        return list(TENANTS.get(tenant).invoices.records())
+    return list(INVOICES.records(refresh=not WATCHER.ready.is_set()))
+
+
+def load_dataset(table, columns=None, start_date=None, end_date=None, client=None, limit=None):
+    """Rows of a compacted Parquet dataset (see parquet_store.py), or None if none has been built.
+
+    Only the month partitions overlapping the date range and the requested
+    columns are read from disk.
+    """
+    if not parquet_store.HAVE_PYARROW or parquet_store.read_manifest(DATASET_DIR) is None:
+        return None
+    return parquet_store.query(table, columns=columns, start_date=start_date, end_date=end_date,
+                               client=client, root=DATASET_DIR, limit=limit)
+
+
+# Bank statements ingested incrementally; the CSV pairs are only used when no JSON exists
+LEDGER = Ledger('output/bank_statements', fallback_loader=load_bank_statements)
+
+
+@timed('load')
+def load_ledger(tenant=None):
+    """Ledger view for the dashboard: the published snapshot while it is current, else the incrementally loaded ledger.
+
+    A tenant's ledger is built from its own partition only (snapshots cover the default partition).
+    """
+    if tenant is not None:
+        return TENANTS.get(tenant).ledger.refresh()
+    store = current_snapshot()
+    if store is not None:
+        if _snapshot_view['name'] != SNAPSHOTS.name:
+            _snapshot_view['view'] = build_view(store)
+            _snapshot_view['name'] = SNAPSHOTS.name
+        return _snapshot_view['view']
+    if WATCHER.ready.is_set() and LEDGER.view is not None:
+        return LEDGER.view
+    return LEDGER.refresh()
+
+
+def current_snapshot():
+    """The published snapshot, or None when there is none or statements were written after it.
+
+    Statements from the analyzer CLI or segment appends are served from the
+    live ledger until the next snapshot covers them. With the watcher running
+    the check is redone on bank statement events and snapshot swaps only.
+    """
+    store = SNAPSHOTS.current()
+    if store is None:
+        return None
+    if not WATCHER.ready.is_set() or _snapshot_view['checked'] != SNAPSHOTS.name:
+        _snapshot_view['covers'] = SNAPSHOTS.manifest.get('sources') == LEDGER.folder.signature()
+        _snapshot_view['checked'] = SNAPSHOTS.name
+    return store if _snapshot_view['covers'] else None
+
+
+@timed('load')
+def load_receipt_index(tenant=None):
+    """Receipt query index, rebuilt only when the set of receipt files changes."""
+    if tenant is not None:
+        return TENANTS.get(tenant).receipt_index()
+    receipts = load_receipts()
+    if RECEIPTS.generation != _receipt_cache['generation']:
+        _receipt_cache['index'] = ReceiptIndex(receipts) if receipts else None
+        _receipt_cache['generation'] = RECEIPTS.generation
+    return _receipt_cache['index']
+
+
+def receipt_documents(tenant=None):
+    """``(document id, receipts)`` pairs, for callers that need the document ids."""
+    if tenant is not None:
+        return TENANTS.get(tenant).receipts.documents()
+    return RECEIPTS.documents(refresh=not WATCHER.ready.is_set())
+
+
+def invoice_documents(tenant=None):
+    """``(document id, invoices)`` pairs, for callers that need the document ids."""
+    if tenant is not None:
+        return TENANTS.get(tenant).invoices.documents()
+    return INVOICES.documents(refresh=not WATCHER.ready.is_set())
+
+
+def _chart_width():
+    """Target point count per series, from the ``width`` query parameter (chart width in pixels)."""
+    try:
+        width = int(request.args.get('width', DEFAULT_WIDTH))
+    except ValueError:
+        width = DEFAULT_WIDTH
+    return min(max(width, 0), MAX_WIDTH)
+
+
+def balance_trend_figure(series):
+    import plotly.graph_objects as go
+    fig = go.Figure()
+    for s in series:
+        fig.add_trace(go.Scatter(
+            x=s['dates'],
+            y=s['balances'],
+            name=f"Account {s['account_number']}",
+            mode='lines'
+        ))
+    fig.update_layout(title='Account Balances Over Time')
+    return fig
+
+
+def _refresh_bank_statements():
+    # Workers serving an up-to-date published snapshot do not need their own ledger
+    _snapshot_view['checked'] = None
+    if current_snapshot() is None:
+        LEDGER.refresh()
+
+
+def _refresh_receipts():
+    RECEIPTS.refresh()
+    load_receipt_index()
+    RECEIPT_ITEMS.update(refresh=False)
+
+
+def _refresh_invoices():
+    INVOICES.refresh()
+    PAYABLES.update(refresh=False)
+
+
+# Pre-ingests new analyzer outputs in the background; request handlers then skip rescanning
+WATCHER = OutputWatcher(
+    'output',
+    sources={'bank_statements': BANK_SOURCES, 'receipts': RECEIPT_SOURCES, 'invoices': INVOICE_SOURCES},
+    handlers={'bank_statements': _refresh_bank_statements, 'receipts': _refresh_receipts, 'invoices': _refresh_invoices},
+)
+
+
+def request_tenant():
+    """Tenant of the current request (``?tenant=``), or None for the default partition."""
+    return request.args.get('tenant', '').strip() or None
+
+
+@app.before_request
+def _check_tenant():
+    tenant = request_tenant()
+    if tenant is None:
+        return None
+    try:
+        if not tenants.exists(tenant):
+            return jsonify({'error': f"Unknown tenant '{tenant}'"}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return None
+
+
+@app.errorhandler(tenants.UnknownTenant)
+def _unknown_tenant(e):
+    # A partition removed after _check_tenant accepted the request
+    return jsonify({'error': str(e)}), 404
+
+
+def watched_version(*kinds):
+    """ETag data version from the watcher, or None (use file signatures) before it has loaded.
+
+    Tenant requests are versioned by the signatures of that tenant's partition only.
+    """
+    def version():
+        tenant = request_tenant()
+        if tenant is not None:
+            return data_version(tenants.sources(kinds, tenant))
+        versions = [WATCHER.version_of(kind) for kind in kinds]
+        if None in versions:
+            return None
+        if 'bank_statements' in kinds:
+            versions.append(str(SNAPSHOTS.name))
+        return ':'.join(versions)
+    return version
+
 
 @app.route('/')
 def index():
     return render_template('index.html')
 
 @app.route('/api/bank-statements')
+@conditional(*BANK_SOURCES, version_fn=watched_version('bank_statements'))
 def get_bank_statements():
-    data = load_bank_statements()
+    import pandas as pd
+    import plotly.express as px
+
+    ledger = load_ledger(request_tenant())
     
-    if data:
+    if ledger is not None:
         try:
-            # Prepare transaction data for visualization
-            all_transactions = []
-            for statement in data:
-                for account in statement['accounts']:
-                    for transaction in account['transactions']:
-                        all_transactions.append({
-                            'date': transaction['date'],
-                            'account_number': account['account_number'],
-                            'description': transaction['description'],
-                            'deposit': transaction['deposit'],
-                            'withdrawal': transaction['withdrawal'],
-                            'running_balance': transaction['running_balance']
-                        })
+            store = ledger.store
+            # Overlapping statements repeat transactions; aggregate each one once unless ?dedupe=0
+            dedupe = request.args.get('dedupe', '1').strip().lower() not in ('0', 'false', 'no')
             
-            df = pd.DataFrame(all_transactions)
-            if not df.empty:
-                df['date'] = pd.to_datetime(df['date'], errors='coerce')
-                df = df.dropna(subset=['date'])
+            # Create monthly summary (precomputed rollups cover the deduplicated rows)
+            with stage('groupby'):
+                if dedupe:
+                    monthly = pd.DataFrame(
+                        [{'date': p['period'], 'deposit': p['deposits'], 'withdrawal': p['withdrawals']}
+                         for p in ledger.rollups.series('monthly')],
+                        columns=['date', 'deposit', 'withdrawal'],
+                    )
+                else:
+                    with stage('dataframe'):
+                        df = store.to_frame()
+                    if not df.empty:
+                        monthly = df.groupby(df['date'].dt.strftime('%Y-%m')).agg({
+                            'deposit': 'sum',
+                            'withdrawal': 'sum'
+                        }).reset_index().rename(columns={'date': 'date'})
+                    else:
+                        monthly = pd.DataFrame(columns=['date', 'deposit', 'withdrawal'])
             
-            # Create monthly summary
-            if not df.empty:
-                monthly = df.groupby(df['date'].dt.strftime('%Y-%m')).agg({
-                    'deposit': 'sum',
-                    'withdrawal': 'sum'
-                }).reset_index().rename(columns={'date': 'date'})
-            else:
-                monthly = pd.DataFrame(columns=['date', 'deposit', 'withdrawal'])
+            # Balance trends: one grouping pass, downsampled to about the chart width
+            with stage('downsample'):
+                series = balance_series(
+                    store, mask=ledger.unique_mask() if dedupe else None,
+                    width=_chart_width(), method=request.args.get('downsample', 'lttb'),
+                )
             
             # Create visualizations
-            fig1 = px.line(monthly, x='date', 
-                          y=['deposit', 'withdrawal'],
-                          title='Monthly Transaction Summary')
-            
-            fig2 = go.Figure()
-            if not df.empty:
-                for account in pd.unique(df['account_number']):
-                    account_data = df[df['account_number'] == account]
-                    fig2.add_trace(go.Scatter(
-                        x=account_data['date'],
-                        y=account_data['running_balance'],
-                        name=f'Account {account}',
-                        mode='lines'
-                    ))
-            fig2.update_layout(title='Account Balances Over Time')
-            
-            return jsonify({
-                'statements': data,
-                'visualizations': {
+            with stage('figures'):
+                fig1 = px.line(monthly, x='date', 
+                              y=['deposit', 'withdrawal'],
+                              title='Monthly Transaction Summary')
+                fig2 = balance_trend_figure(series)
+                visualizations = {
                     'monthly_summary': json.loads(fig1.to_json()),
                     'balance_trends': json.loads(fig2.to_json())
                 }
+            
+            with stage('statements'):
+                statements = store.to_statements()
+            return jsonify({
+                'statements': statements,
+                'duplicates_excluded': int(ledger.duplicates.sum()) if dedupe else 0,
+                'visualizations': visualizations
             })
             
         except Exception as e:
@@ -277,27 +481,92 @@ def get_bank_statements():
     
     return jsonify({'error': 'No bank statement data found'})
 
+@app.route('/api/bank-statements/summary')
+@conditional(*BANK_SOURCES, version_fn=watched_version('bank_statements'))
+def get_bank_statements_summary():
+    """Deposit/withdrawal totals for a date range, answered from the prefix-sum rollups."""
+    ledger = load_ledger(request_tenant())
+    if ledger is None:
+        return jsonify({'error': 'No bank statement data found'})
+
+    start_date = request.args.get('start_date', '').strip()
+    end_date = request.args.get('end_date', '').strip()
+    account = request.args.get('account', '').strip()
+    try:
+        totals = ledger.rollups.range_total(start_date or None, end_date or None, account or None)
+    except ValueError as e:
+        return jsonify({'error': f'Invalid date: {e}'})
+
+    return jsonify({
+        'totals': totals,
+        'data_range': {'min': ledger.rollups.first_day or '', 'max': ledger.rollups.last_day or ''},
+        'filters_applied': {'start_date': start_date, 'end_date': end_date, 'account': account},
+    })
+
+@app.route('/api/bank-statements/rollup')
+@conditional(*BANK_SOURCES, version_fn=watched_version('bank_statements'))
+def get_bank_statements_rollup():
+    """Daily, weekly or monthly deposit/withdrawal series from the rollups."""
+    ledger = load_ledger(request_tenant())
+    if ledger is None:
+        return jsonify({'error': 'No bank statement data found'})
+
+    freq = request.args.get('freq', 'monthly').strip().lower()
+    if freq not in ('daily', 'weekly', 'monthly'):
+        return jsonify({'error': 'freq must be one of daily, weekly, monthly'})
+    start_date = request.args.get('start_date', '').strip()
+    end_date = request.args.get('end_date', '').strip()
+    account = request.args.get('account', '').strip()
+    try:
+        series = ledger.rollups.series(freq, start_date or None, end_date or None, account or None)
+    except ValueError as e:
+        return jsonify({'error': f'Invalid date: {e}'})
+
+    return jsonify({
+        'freq': freq,
+        'series': series,
+        'filters_applied': {'start_date': start_date, 'end_date': end_date, 'account': account},
+    })
+
+@app.route('/api/bank-statements/balance-trend')
+@conditional(*BANK_SOURCES, version_fn=watched_version('bank_statements'))
+def get_balance_trend():
+    """Balance series for a zoomed date window: full resolution unless it exceeds ``max_points``."""
+    ledger = load_ledger(request_tenant())
+    if ledger is None:
+        return jsonify({'error': 'No bank statement data found'})
+
+    start_date = request.args.get('start_date', '').strip()
+    end_date = request.args.get('end_date', '').strip()
+    account = request.args.get('account', '').strip()
+    try:
+        max_points = int(request.args.get('max_points', '100000'))
+    except ValueError:
+        max_points = 100000
+    try:
+        series = balance_series(
+            ledger.store, mask=ledger.unique_mask(), width=max_points,
+            method=request.args.get('downsample', 'lttb'),
+            start_date=start_date or None, end_date=end_date or None, account=account or None,
+        )
+    except ValueError as e:
+        return jsonify({'error': f'Invalid date: {e}'})
+
+    return jsonify({
+        'series': series,
+        'visualization': json.loads(balance_trend_figure(series).to_json()),
+        'filters_applied': {'start_date': start_date, 'end_date': end_date, 'account': account},
+    })
+
 @app.route('/api/receipts')
+@conditional(*RECEIPT_SOURCES, version_fn=watched_version('receipts'))
 def get_receipts():
-    receipts = load_receipts()
-    if not receipts:
-        return jsonify({'error': 'No receipt data found'})
+    import pandas as pd
+    import plotly.express as px
 
-    df = pd.DataFrame(receipts)
-    # Normalize columns
-    if 'merchant_name' not in df.columns:
-        df['merchant_name'] = 'Unknown'
-    if 'total' not in df.columns:
-        df['total'] = 0.0
-    if 'tax' not in df.columns:
-        df['tax'] = 0.0
-    if 'transaction_date' not in df.columns:
-        df['transaction_date'] = ''
-
-    # Coerce data types
-    df['total'] = pd.to_numeric(df['total'], errors='coerce').fillna(0.0)
-    df['tax'] = pd.to_numeric(df['tax'], errors='coerce').fillna(0.0)
-    df['transaction_date'] = pd.to_datetime(df['transaction_date'], errors='coerce')
+    index = load_receipt_index(request_tenant())
+    if index is None:
+        return jsonify({'error': 'No receipt data found'})
 
     # Read filters
     merchant_q = request.args.get('merchant', '').strip()
@@ -306,65 +575,62 @@ def get_receipts():
     min_total = request.args.get('min_total', '').strip()
     max_total = request.args.get('max_total', '').strip()
 
-    filtered = df.copy()
-    if merchant_q:
-        filtered = filtered[filtered['merchant_name'].str.contains(merchant_q, case=False, na=False)]
-    if start_date:
-        try:
-            sd = pd.to_datetime(start_date)
-            filtered = filtered[filtered['transaction_date'] >= sd]
-        except Exception:
-            pass
-    if end_date:
+    def parse(value, convert):
+        # Unparseable filters are ignored, as before
+        if not value:
+            return None
         try:
-            ed = pd.to_datetime(end_date)
-            filtered = filtered[filtered['transaction_date'] <= ed]
+            return convert(value)
         except Exception:
-            pass
-    if min_total:
-        try:
-            mn = float(min_total)
-            filtered = filtered[filtered['total'] >= mn]
-        except Exception:
-            pass
-    if max_total:
-        try:
-            mx = float(max_total)
-            filtered = filtered[filtered['total'] <= mx]
-        except Exception:
-            pass
+            return None
+
+    to_day = lambda v: pd.Timestamp(v).to_datetime64().astype('datetime64[D]')
+    with stage('query'):
+        rows = index.query(
+            merchant=merchant_q,
+            start_date=parse(start_date, to_day),
+            end_date=parse(end_date, to_day),
+            min_total=parse(min_total, float),
+            max_total=parse(max_total, float),
+        )
+        filtered = index.frame.iloc[rows]
 
     # Group by merchant
-    if not filtered.empty:
-        grouped = (
-            filtered.groupby('merchant_name').agg(
-                receipts_count=('merchant_name', 'size'),
-                total_amount=('total', 'sum'),
-                total_tax=('tax', 'sum'),
-                avg_amount=('total', 'mean'),
+    with stage('groupby'):
+        if not filtered.empty:
+            grouped = (
+                filtered.groupby('merchant_name').agg(
+                    receipts_count=('merchant_name', 'size'),
+                    total_amount=('total', 'sum'),
+                    total_tax=('tax', 'sum'),
+                    avg_amount=('total', 'mean'),
+                )
+                .reset_index()
+                .sort_values('total_amount', ascending=False)
             )
-            .reset_index()
-            .sort_values('total_amount', ascending=False)
-        )
-    else:
-        grouped = pd.DataFrame(columns=['merchant_name', 'receipts_count', 'total_amount', 'total_tax', 'avg_amount'])
+        else:
+            grouped = pd.DataFrame(columns=['merchant_name', 'receipts_count', 'total_amount', 'total_tax', 'avg_amount'])
 
     # Visualization: bar chart of top merchants by total
-    fig = px.bar(
-        grouped.head(15), x='merchant_name', y='total_amount',
-        title='Top Merchants by Total Spend', labels={'total_amount': 'Total ($)', 'merchant_name': 'Merchant'}
-    )
-    fig.update_layout(xaxis_tickangle=-30, height=400)
+    with stage('figures'):
+        fig = px.bar(
+            grouped.head(15), x='merchant_name', y='total_amount',
+            title='Top Merchants by Total Spend', labels={'total_amount': 'Total ($)', 'merchant_name': 'Merchant'}
+        )
+        fig.update_layout(xaxis_tickangle=-30, height=400)
+        visualization = json.loads(fig.to_json())
 
     # JSON outputs
     # Convert dates back to string for JSON
-    filtered_out = filtered.copy()
-    filtered_out['transaction_date'] = filtered_out['transaction_date'].dt.strftime('%Y-%m-%d')
+    with stage('records'):
+        filtered_out = filtered.copy()
+        filtered_out['transaction_date'] = filtered_out['transaction_date'].dt.strftime('%Y-%m-%d')
+        records = filtered_out.to_dict('records')
 
     return jsonify({
-        'receipts': filtered_out.to_dict('records'),
+        'receipts': records,
         'grouped': grouped.to_dict('records'),
-        'visualization': json.loads(fig.to_json()),
+        'visualization': visualization,
         'filters_applied': {
             'merchant': merchant_q,
             'start_date': start_date,
@@ -374,42 +640,284 @@ def get_receipts():
         }
     })
 
+
+@app.route('/api/receipt-items')
+@conditional(*RECEIPT_SOURCES, version_fn=watched_version('receipts'))
+def get_receipt_items():
+    """Top receipt items (``by`` spend, quantity or purchases), or one item's price history (``item``)."""
+    index = load_receipt_items(request_tenant())
+    if not index.items:
+        return jsonify({'error': 'No receipt item data found'})
+
+    item = request.args.get('item', '').strip()
+    merchant = request.args.get('merchant', '').strip()
+    start_month = request.args.get('start_month', '').strip()
+    end_month = request.args.get('end_month', '').strip()
+    filters = {'merchant': merchant, 'start_month': start_month, 'end_month': end_month}
+    try:
+        limit = min(max(int(request.args.get('limit', '20')), 1), 1000)
+    except ValueError:
+        limit = 20
+
+    try:
+        with stage('query'):
+            if item:
+                keys = index.resolve(item)
+                if not keys:
+                    return jsonify({'error': f"No receipt item matches '{item}'"}), 404
+                result = index.history(keys[0], merchant, start_month, end_month)
+                result['other_matches'] = keys[1:limit]
+            else:
+                by = request.args.get('by', 'spend').strip()
+                result = index.top(limit, by, merchant, start_month, end_month)
+                filters['by'] = by
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    result['filters_applied'] = dict(filters, item=item)
+    return jsonify(result)
+
+def invoice_version():
+    """Invoice data version plus today's date: aging buckets move every day."""
+    version = watched_version('invoices')() or data_version(INVOICE_SOURCES)
+    return f'{version}:{date.today().isoformat()}'
+
 @app.route('/api/invoices')
+@conditional(version_fn=invoice_version)
 def get_invoices():
-    invoices = load_invoices()
-    if invoices:
-        # Create vendor summary visualization
-        vendor_summary = pd.DataFrame(invoices)
-        if 'vendor_name' not in vendor_summary.columns:
-            vendor_summary['vendor_name'] = 'Unknown'
-        # Coerce totals to numeric from strings like "$1,234.56"
-        if 'invoice_total' in vendor_summary.columns:
-            totals = vendor_summary['invoice_total']
-            if totals.dtype == 'object':
-                vendor_summary['invoice_total_value'] = pd.to_numeric(
-                    totals.replace(r'[^0-9\.\-]', '', regex=True), errors='coerce'
-                ).fillna(0.0)
-            else:
-                vendor_summary['invoice_total_value'] = pd.to_numeric(totals, errors='coerce').fillna(0.0)
-        else:
-            vendor_summary['invoice_total_value'] = 0.0
+    """Invoices with per-vendor totals and AP aging, read from the precomputed vendor aggregates."""
+    import plotly.graph_objects as go
 
-        fig = px.bar(
-            vendor_summary, x='vendor_name', y='invoice_total_value',
-            title='Invoice Amounts by Vendor'
-        )
-        
-        return jsonify({
-            'invoices': invoices,
-            'visualization': json.loads(fig.to_json())
-        })
-    
-    return jsonify({'error': 'No invoice data found'})
+    tenant = request_tenant()
+    payables = load_payables(tenant)
+    invoices = load_invoices(tenant)
+    if not invoices:
+        return jsonify({'error': 'No invoice data found'})
+
+    vendor = request.args.get('vendor', '').strip()
+    try:
+        as_of = as_of_date(request.args.get('as_of', ''))
+    except ValueError as e:
+        return jsonify({'error': f'Invalid date: {e}'}), 400
+
+    with stage('aggregate'):
+        vendors = payables.summary(as_of, vendor)
+        aging = VendorAggregates.aging_totals(vendors)
+        if vendor:
+            keys = {v['vendor_key'] for v in vendors}
+            invoices = [i for i in invoices if payables.key_of(i) in keys]
+
+    # One bar per vendor (not per invoice): total billed and still open
+    with stage('figures'):
+        top = vendors[:30]
+        fig = go.Figure([
+            go.Bar(x=[v['vendor_name'] for v in top], y=[v['total_amount'] for v in top], name='Total'),
+            go.Bar(x=[v['vendor_name'] for v in top], y=[v['open_balance'] for v in top], name='Open balance'),
+        ])
+        fig.update_layout(title='Invoice Amounts by Vendor', barmode='group')
+        visualization = json.loads(fig.to_json())
+
+    return jsonify({
+        'invoices': invoices,
+        'vendors': vendors,
+        'aging': aging,
+        'aging_buckets': list(AGING_BUCKETS),
+        'as_of': as_of.isoformat(),
+        'visualization': visualization,
+        'filters_applied': {'vendor': vendor, 'as_of': request.args.get('as_of', '').strip()},
+    })
+
+@app.route('/api/reconciliation')
+@conditional(*BANK_SOURCES, version_fn=watched_version('bank_statements'))
+def get_reconciliation():
+    """Accounts whose computed running balance does not match the extracted balances."""
+    ledger = load_ledger(request_tenant())
+    if ledger is None:
+        return jsonify({'error': 'No bank statement data found'})
+
+    try:
+        tolerance = float(request.args.get('tolerance', '0.01'))
+    except ValueError:
+        tolerance = 0.01
+    only_mismatched = request.args.get('all', '').strip().lower() not in ('1', 'true', 'yes')
+
+    try:
+        return jsonify(reconcile(ledger.store, tolerance=tolerance, only_mismatched=only_mismatched))
+    except Exception as e:
+        print(f"Error reconciling statements: {str(e)}")
+        return jsonify({'error': str(e)})
+
+@app.route('/api/matches')
+@conditional(*BANK_SOURCES, *RECEIPT_SOURCES, version_fn=watched_version('bank_statements', 'receipts'))
+def get_matches():
+    """Match receipts to bank withdrawals by amount, date window and merchant similarity."""
+    receipts = load_receipts(request_tenant())
+    ledger = load_ledger(request_tenant())
+    if not receipts or ledger is None:
+        return jsonify({'error': 'Receipts and bank statements are both required for matching'})
+
+    try:
+        date_window = int(request.args.get('date_window', '3'))
+        amount_tolerance = float(request.args.get('amount_tolerance', '0.50'))
+        min_score = float(request.args.get('min_score', '0.5'))
+    except ValueError as e:
+        return jsonify({'error': f'Invalid parameter: {e}'}), 400
+    if date_window < 0 or not amount_tolerance >= 0:
+        return jsonify({'error': 'date_window and amount_tolerance must not be negative'}), 400
+
+    try:
+        return jsonify(match_receipts(
+            receipts, ledger.store, mask=ledger.unique_mask(),
+            date_window=date_window, amount_tolerance=amount_tolerance, min_score=min_score,
+        ))
+    except Exception as e:
+        print(f"Error matching receipts: {str(e)}")
+        return jsonify({'error': str(e)})
+
+def anomaly_version():
+    """ETag data version of the requested partition's anomaly flags file."""
+    directory = tenants.partition_dir('bank_statements', request_tenant())
+    return data_version(((os.path.join(directory, anomaly.FLAGS_FILE), ''),
+                         (os.path.join(directory, anomaly.STATE_FILE), '')))
+
+@app.route('/api/anomalies')
+@conditional(version_fn=anomaly_version)
+def get_anomalies():
+    """Unusual withdrawals flagged as statements were ingested (see anomaly.py), newest first."""
+    directory = tenants.partition_dir('bank_statements', request_tenant())
+    if not os.path.exists(os.path.join(directory, anomaly.STATE_FILE)):
+        return jsonify({'error': 'No anomaly data found; run anomaly.py rebuild to scan existing statements'})
+
+    kinds = [k.strip() for k in request.args.get('type', '').split(',') if k.strip()]
+    unknown = [k for k in kinds if k not in anomaly.FLAG_TYPES]
+    if unknown:
+        return jsonify({'error': f"type must be among {', '.join(anomaly.FLAG_TYPES)}"}), 400
+    account = request.args.get('account', '').strip()
+    start_date = request.args.get('start_date', '').strip()
+    end_date = request.args.get('end_date', '').strip()
+    try:
+        limit = int(request.args.get('limit', '500'))
+    except ValueError:
+        limit = 500
+
+    flags = anomaly.read_flags(directory, kinds or None, account, start_date, end_date)
+    by_type = {kind: 0 for kind in anomaly.FLAG_TYPES}
+    for flag in flags:
+        by_type[flag['type']] += 1
+    return jsonify({
+        'anomalies': flags[:max(limit, 0)],
+        'count': len(flags),
+        'by_type': by_type,
+        'filters_applied': {'type': kinds, 'account': account, 'start_date': start_date, 'end_date': end_date},
+    })
+
+@app.route('/api/datasets/<table>')
+@conditional(*DATASET_SOURCES)
+def get_dataset(table):
+    """Rows of a Parquet dataset with column projection and date/client filters."""
+    columns = [c.strip() for c in request.args.get('columns', '').split(',') if c.strip()] or None
+    start_date = request.args.get('start_date', '').strip() or None
+    end_date = request.args.get('end_date', '').strip() or None
+    client = request.args.get('client', '').strip() or None
+    tenant = request_tenant()
+    if client is None and tenant is not None:
+        # Datasets are partitioned by client name; a tenant selects its own
+        client = (tenants.read_manifest(tenant) or {}).get('name', tenant)
+    try:
+        limit = int(request.args['limit']) if request.args.get('limit') else None
+        frame = load_dataset(table, columns, start_date, end_date, client, limit)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if frame is None:
+        return jsonify({'error': 'No Parquet datasets found; run parquet_store.py first'})
+
+    import pandas as pd
+    for col in frame.columns:
+        if pd.api.types.is_datetime64_any_dtype(frame[col]):
+            frame[col] = frame[col].dt.strftime('%Y-%m-%d')
+    frame = frame.astype(object).where(frame.notna(), None)
+    return jsonify({
+        'table': table,
+        'compacted_at': parquet_store.read_manifest(DATASET_DIR).get('compacted_at'),
+        'count': len(frame),
+        'rows': frame.to_dict('records'),
+        'filters_applied': {'columns': columns, 'start_date': start_date, 'end_date': end_date, 'client': client},
+    })
+
+@app.route('/api/export/<dataset>')
+def export_dataset(dataset):
+    """Stream transactions, receipts or invoices (one row per line item) as CSV or XLSX.
+
+    Rows are generated while the response is sent (see export.py), so large
+    exports start at once and are never held in memory. Not ETag-cached:
+    the body cache would hold the whole file.
+    """
+    fmt = request.args.get('format', 'csv').strip().lower()
+    if dataset not in export.DATASETS:
+        return jsonify({'error': f"Unknown dataset '{dataset}'; use one of {', '.join(export.DATASETS)}"}), 404
+    if fmt not in export.FORMATS:
+        return jsonify({'error': f"format must be one of {', '.join(export.FORMATS)}"}), 400
+    if fmt == 'xlsx' and not export.HAVE_OPENPYXL:
+        return jsonify({'error': 'XLSX export requires openpyxl (pip install openpyxl)'}), 501
+    try:
+        start_date = export.parse_day(request.args.get('start_date', '').strip())
+        end_date = export.parse_day(request.args.get('end_date', '').strip())
+    except ValueError as e:
+        return jsonify({'error': f'Invalid date: {e}'}), 400
+    account = request.args.get('account', '').strip()
+    merchant = request.args.get('merchant', '').strip()
+    tenant = request_tenant()
+
+    if dataset == 'transactions':
+        ledger = load_ledger(tenant)
+        if ledger is None:
+            return jsonify({'error': 'No bank statement data found'})
+        dedupe = request.args.get('dedupe', '1').strip().lower() not in ('0', 'false', 'no')
+        columns = export.TRANSACTION_COLUMNS
+        rows = export.transaction_rows(ledger, start_date, end_date, account, merchant, dedupe)
+    elif dataset == 'receipts':
+        columns = export.RECEIPT_COLUMNS
+        rows = export.receipt_rows(receipt_documents(tenant), start_date, end_date, merchant)
+    else:
+        columns = export.INVOICE_COLUMNS
+        rows = export.invoice_rows(invoice_documents(tenant), start_date, end_date, merchant)
+
+    filename = f"{dataset}{'_' + tenant if tenant else ''}.{fmt}"
+    return Response(
+        export.encode(fmt, dataset, columns, rows),
+        mimetype=export.FORMATS[fmt],
+        headers={'Content-Disposition': f'attachment; filename="{filename}"', 'Cache-Control': 'no-store'},
+    )
+
+@app.route('/api/tenants')
+def get_tenants():
+    """Tenants with their own output partition, from their manifests."""
+    return jsonify({'tenants': tenants.list_tenants('output')})
+
+@app.route('/debug/perf')
+def debug_perf():
+    """Latency histograms per route and stage (``?reset=1`` clears them after reading)."""
+    snapshot = PERF.snapshot()
+    if request.args.get('reset') == '1':
+        PERF.reset()
+    return jsonify({
+        'routes': snapshot,
+        'profiling_enabled': profiling_enabled(),
+        'recent_profiles': PERF.profiles,
+    })
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus text exposition of the request stage histograms."""
+    return PERF.prometheus(), 200, {'Content-Type': 'text/plain; version=0.0.4'}
 
 @app.route('/debug/bank-statements')
 def debug_bank_statements():
     """Debug endpoint to check raw bank statement data"""
-    statements = load_bank_statements()
+    tenant = request_tenant()
+    if tenant is not None:
+        statements = TENANTS.get(tenant).ledger.folder.records()
+    else:
+        statements = load_bank_statements()
     # Compute counts for quick sanity check
     total_accounts = 0
     total_transactions = 0
@@ -440,7 +948,8 @@ def debug_bank_statements():
 @app.route('/debug/receipts')
 def debug_receipts():
     """Debug endpoint to check raw receipts and file discovery."""
-    output_dir = 'output/receipts'
+    tenant = request_tenant()
+    output_dir = tenants.partition_dir('receipts', tenant)
     files = []
     try:
         if os.path.exists(output_dir):
@@ -448,7 +957,9 @@ def debug_receipts():
     except Exception as e:
         files = [f"<error listing files: {e}>"]
 
-    receipts = load_receipts()
+    import pandas as pd
+
+    receipts = load_receipts(tenant)
     merchants = {}
     date_min = None
     date_max = None
@@ -478,5 +989,12 @@ def debug_receipts():
         'sample_receipt': sample_receipt,
     })
 
+if os.getenv('OUTPUT_WATCHER') == '1':
+    # e.g. under gunicorn: each worker keeps its own data current
+    WATCHER.start()
+
 if __name__ == '__main__':
+    # With the debug reloader only the serving child process watches
+    if os.getenv('OUTPUT_WATCHER') != '0' and os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        WATCHER.start()
     app.run(debug=True)
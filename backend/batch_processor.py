@@ -1,63 +1,255 @@
 import os
 import json
 import glob
+import threading
+import time
 from datetime import datetime
-from typing import Dict, List
-from doc_intel_quickstart import analyze_bank_statement, analyze_receipt, analyze_invoice
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+from batch_telemetry import BatchTelemetry, lap
+import tenants
+import preflight
+from doc_intel_quickstart import (analyze_bank_statement, analyze_receipt, analyze_invoice,
+                                  structure_bank_statement, structure_receipt, structure_invoice)
+
+
+ANALYZERS = {
+    'bank_statements': analyze_bank_statement,
+    'receipts': analyze_receipt,
+    'invoices': analyze_invoice,
+}
+
+SUPPORTED_FORMATS = ('.pdf', '.png', '.jpg', '.jpeg', '.tiff', '.tif')
+
+# Model id and structuring stage per document type, for the shared polling loop
+MODELS = {
+    'bank_statements': ('prebuilt-bankStatement.us', structure_bank_statement),
+    'receipts': ('prebuilt-receipt', structure_receipt),
+    'invoices': ('prebuilt-invoice', structure_invoice),
+}
 
 
 class DocumentBatchProcessor:
-    def __init__(self, input_dir: str, output_dir: str):
-        """Initialize batch processor with input and output directories"""
+    def __init__(self, input_dir: str, output_dir: str, output_format: str = None, concurrency: int = 1,
+                 tenant: str = None, tenant_name: str = None, polling: str = None, max_in_flight: int = None,
+                 preflight: bool = None, reroute: bool = True, preflight_workers: int = None,
+                 snapshot_dir: str = None, batch_timeout: float = None):
+        """Initialize batch processor with input and output directories
+
+        ``output_format`` is ``json`` (one file per document) or ``ndjson``
+        (appended to rotating segments, see segments.py). ``concurrency``
+        documents are analyzed at a time. With a ``tenant`` the results go to
+        that client's partition ``<output_dir>/<tenant>/<type>/`` and its
+        manifest is updated (see tenants.py); ``tenant_name`` is its display name.
+
+        ``polling`` is ``multiplexed`` (default): documents are submitted up to
+        ``max_in_flight`` at a time, one loop polls all of them (see
+        operation_poller.py) and ``concurrency`` workers structure the results
+        as they complete. ``sdk`` waits on one SDK poller per document instead.
+        Both fall back to the ``BATCH_POLLING`` and ``BATCH_MAX_IN_FLIGHT``
+        environment variables. A multiplexed batch waits at most
+        ``batch_timeout`` seconds (default ``BATCH_TIMEOUT`` or an hour) for
+        the service; documents still outstanding then fail.
+
+        With ``preflight`` (default, ``BATCH_PREFLIGHT=0`` turns it off) every
+        file under ``input_dir`` is inspected locally first (see preflight.py):
+        empty, corrupt, password-protected and duplicate files are skipped
+        (files that look blank only get a warning), and with ``reroute`` a
+        file in the wrong folder is analyzed as the type its text says it is.
+
+        After bank statements are processed for the default partition, a
+        ledger snapshot of ``output_dir`` is published under ``snapshot_dir``
+        (default ``<output_dir>/snapshots``, see snapshot.py).
+        """
         self.input_dir = input_dir
         self.output_dir = output_dir
-        self.supported_formats = ('.pdf', '.png', '.jpg', '.jpeg', '.tiff', '.tif')
-        
-    def process_batch(self, document_type: str) -> Dict:
-        """Process all documents of a specific type"""
-        type_output_dir = os.path.join(self.output_dir, document_type)
-        os.makedirs(type_output_dir, exist_ok=True)
-        
+        self.tenant = tenants.validate(tenant) if tenant else None
+        self.tenant_name = tenant_name
+        self.output_format = output_format
+        self.concurrency = max(1, concurrency)
+        self.polling = polling or os.getenv('BATCH_POLLING', 'multiplexed')
+        if self.polling not in ('multiplexed', 'sdk'):
+            raise ValueError(f"Unknown polling mode: {self.polling}")
+        self.max_in_flight = max(1, max_in_flight or int(os.getenv('BATCH_MAX_IN_FLIGHT', '32')))
+        self.batch_timeout = batch_timeout or float(os.getenv('BATCH_TIMEOUT', '3600'))
+        self.supported_formats = SUPPORTED_FORMATS
+        self.preflight = os.getenv('BATCH_PREFLIGHT', '1') != '0' if preflight is None else preflight
+        self.reroute = reroute
+        self.preflight_workers = preflight_workers
+        self._preflight = None  # (viable reports per type, rejected reports), inspected once
+        self.snapshot_dir = snapshot_dir or os.path.join(output_dir, 'snapshots')
+
+    def _list_files(self, document_type: str) -> List[str]:
         files = []
         for ext in self.supported_formats:
             files.extend(glob.glob(os.path.join(self.input_dir, document_type, f'*{ext}')))
+        return files
+
+    def _inspect(self) -> Tuple[Dict[str, List[Dict]], List[Dict]]:
+        """Pre-flight reports for every input folder, so files can move between types."""
+        if self._preflight is None:
+            items = [(path, kind) for kind in ANALYZERS for path in sorted(self._list_files(kind))]
+            self._preflight = preflight.route(preflight.inspect_files(items, self.preflight_workers), self.reroute)
+        return self._preflight
+
+    @staticmethod
+    def _outcome(file_path: str, timings, output_file: str = None, error: Exception = None) -> Dict:
+        timings.finish()
+        if error is not None:
+            return {
+                'file': file_path,
+                'error': str(error),
+                'timings': timings.to_dict()
+            }
+        return {
+            'input_file': file_path,
+            'output_file': output_file,
+            'status': 'success',
+            'timings': timings.to_dict()
+        }
+
+    def _process_file(self, document_type: str, file_path: str, type_output_dir: str,
+                      telemetry: BatchTelemetry) -> Dict:
+        timings = telemetry.document(file_path)
+        try:
+            if document_type not in ANALYZERS:
+                raise ValueError(f"Unknown document type: {document_type}")
+            output_file = ANALYZERS[document_type](
+                input_file=file_path,
+                output_dir=type_output_dir,
+                output_format=self.output_format,
+                timings=timings
+            )
+            return self._outcome(file_path, timings, output_file)
+        except Exception as e:
+            return self._outcome(file_path, timings, error=e)
+
+    def _process_multiplexed(self, document_type: str, files: List[str], type_output_dir: str,
+                             telemetry: BatchTelemetry, pages: Dict[str, int] = None) -> Tuple[List[Dict], Dict]:
+        """Submit every file, poll them all from one loop and structure each result as it arrives.
+
+        ``pages`` are the pre-flight page counts; files without one are counted on read.
+        """
+        from doc_intel_quickstart import _client
+        from operation_poller import MODEL_FILE, CompletionModel, OperationPoller, SdkTransport, count_pages
+
+        model_id, structure = MODELS[document_type]
+        model_path = os.path.join(self.output_dir, MODEL_FILE)
+        model = CompletionModel()
+        model.load(model_path)
+        try:
+            poller = OperationPoller(SdkTransport(_client()), model)
+        except Exception as e:
+            return [self._outcome(path, telemetry.document(path), error=e) for path in files], {}
+        in_flight = threading.BoundedSemaphore(self.max_in_flight)
+        remaining = threading.Condition()
+        outcomes: Dict[str, Dict] = {}
+        pending = [0]
+        deadline = time.monotonic() + self.batch_timeout
+        timed_out = f"Batch timed out after {self.batch_timeout:g}s"
+
+        def structure_result(file_path, timings, result):
+            from azure.ai.documentintelligence.models import AnalyzeResult
+            try:
+                output_file = structure(AnalyzeResult(result), file_path, type_output_dir, self.output_format, timings)
+                outcome = self._outcome(file_path, timings, output_file)
+            except Exception as e:
+                outcome = self._outcome(file_path, timings, error=e)
+            with remaining:
+                outcomes[file_path] = outcome
+                pending[0] -= 1
+                remaining.notify()
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as workers:
+            def completed(future, file_path, timings):
+                # Runs on the polling thread: only hand the result on
+                in_flight.release()
+                lap(timings, 'service_wait')
+                error = future.exception()
+                if error is None:
+                    workers.submit(structure_result, file_path, timings, future.result())
+                    return
+                with remaining:
+                    outcomes[file_path] = self._outcome(file_path, timings, error=error)
+                    pending[0] -= 1
+                    remaining.notify()
+
+            for file_path in files:
+                # Timed from when a slot is free: waiting for one is not part of any stage
+                if not in_flight.acquire(timeout=max(deadline - time.monotonic(), 0.0)):
+                    outcomes[file_path] = self._outcome(file_path, telemetry.document(file_path),
+                                                        error=TimeoutError(timed_out))
+                    continue
+                timings = telemetry.document(file_path)
+                try:
+                    with open(file_path, 'rb') as f:
+                        document = f.read()
+                    lap(timings, 'read')
+                    page_count = (pages or {}).get(file_path) or count_pages(document)
+                    future = poller.submit(model_id, document, pages=page_count)
+                    lap(timings, 'upload', 4 * ((len(document) + 2) // 3))  # base64 size
+                except Exception as e:
+                    in_flight.release()
+                    outcomes[file_path] = self._outcome(file_path, timings, error=e)
+                    continue
+                with remaining:
+                    pending[0] += 1
+                future.add_done_callback(lambda f, p=file_path, t=timings: completed(f, p, t))
+            with remaining:
+                while pending[0] and time.monotonic() < deadline:
+                    remaining.wait(deadline - time.monotonic())
+                expired = pending[0] > 0
+            if expired:
+                # Fails the operations still polled; results already structuring are waited for
+                poller.close(timed_out)
+        poller.close()
+        try:
+            model.save(model_path)
+        except OSError as e:
+            print(f"Error saving poll model {model_path}: {e}")
+        return [outcomes[path] for path in files], poller.summary()
+        
+    def process_batch(self, document_type: str) -> Dict:
+        """Process all documents of a specific type
+
+        The summary includes per-document stage timings and a ``telemetry``
+        section (see batch_telemetry.py). With pre-flight on, files it rejected
+        are listed under ``skipped`` and its counts under ``preflight``.
+        """
+        type_output_dir = tenants.partition_dir(document_type, self.tenant, self.output_dir)
+        os.makedirs(type_output_dir, exist_ok=True)
         
         results = {
             'processed': [],
             'failed': [],
             'timestamp': datetime.now().isoformat()
         }
+        pages = {}
+        if self.preflight:
+            viable, rejected = self._inspect()
+            reports = viable.get(document_type, [])
+            files = [report['file'] for report in reports]
+            pages = {report['file']: report['pages'] for report in reports}
+            skipped = [report for report in rejected if report['folder_type'] == document_type]
+            results['skipped'] = [{'file': report['file'], 'reason': report['reason']} for report in skipped]
+            results['preflight'] = preflight.summarize(reports + skipped)
+        else:
+            files = self._list_files(document_type)
         
-        for file_path in files:
-            try:
-                # Process based on document type
-                if document_type == 'bank_statements':
-                    output_file = analyze_bank_statement(
-                        input_file=file_path,
-                        output_dir=type_output_dir
-                    )
-                elif document_type == 'receipts':
-                    output_file = analyze_receipt(
-                        input_file=file_path,
-                        output_dir=type_output_dir
-                    )
-                elif document_type == 'invoices':
-                    output_file = analyze_invoice(
-                        input_file=file_path,
-                        output_dir=type_output_dir
-                    )
-                
-                results['processed'].append({
-                    'input_file': file_path,
-                    'output_file': output_file,
-                    'status': 'success'
-                })
-                
-            except Exception as e:
-                results['failed'].append({
-                    'file': file_path,
-                    'error': str(e)
-                })
+        multiplexed = self.polling == 'multiplexed' and files
+        telemetry = BatchTelemetry(self.max_in_flight if multiplexed else self.concurrency)
+        if multiplexed:
+            outcomes, results['polling'] = self._process_multiplexed(document_type, files, type_output_dir, telemetry,
+                                                                     pages)
+        elif self.concurrency > 1 and len(files) > 1:
+            with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+                outcomes = list(pool.map(
+                    lambda path: self._process_file(document_type, path, type_output_dir, telemetry), files))
+        else:
+            outcomes = [self._process_file(document_type, path, type_output_dir, telemetry) for path in files]
+        for outcome in outcomes:
+            results['processed' if 'error' not in outcome else 'failed'].append(outcome)
+        results['telemetry'] = telemetry.summary()
         
         # Save batch summary
         summary_file = os.path.join(
@@ -66,14 +258,29 @@ class DocumentBatchProcessor:
         )
         with open(summary_file, 'w') as f:
             json.dump(results, f, indent=2)
+
+        if self.tenant is not None:
+            tenants.write_manifest(self.tenant, self.output_dir, name=self.tenant_name)
+
+        # Publish a fresh shared snapshot so dashboard workers pick up the new statements
+        # (snapshots cover the default partition only)
+        elif document_type == 'bank_statements' and results['processed']:
+            try:
+                from snapshot import build_snapshot_from_output
+                build_snapshot_from_output(self.output_dir, self.snapshot_dir)
+            except Exception as e:
+                print(f"Error building ledger snapshot: {e}")
             
         return results
 
 if __name__ == "__main__":
-    # Initialize processor
+    # Initialize processor (BATCH_TENANT writes to that client's partition;
+    # snapshots go where the dashboard reads them, LEDGER_SNAPSHOT_DIR)
     processor = DocumentBatchProcessor(
         input_dir="input",
-        output_dir="output"
+        output_dir="output",
+        tenant=os.getenv("BATCH_TENANT") or None,
+        snapshot_dir=os.getenv("LEDGER_SNAPSHOT_DIR") or None
     )
     
     # Process each document type
@@ -81,4 +288,7 @@ if __name__ == "__main__":
         print(f"\nProcessing {doc_type}...")
         results = processor.process_batch(doc_type)
         print(f"Processed: {len(results['processed'])} files")
-        print(f"Failed: {len(results['failed'])} files")
\ No newline at end of file
+        print(f"Failed: {len(results['failed'])} files")
+        if 'skipped' in results:
+            print(f"Skipped: {len(results['skipped'])} files")
+        print(f"Throughput: {results['telemetry']['documents_per_minute']} documents/min")
\ No newline at end of file
@@ -3,28 +3,35 @@ import os
 import json
 import glob
 from datetime import datetime
-from azure.core.credentials import AzureKeyCredential
-from azure.ai.documentintelligence import DocumentIntelligenceClient
-from azure.ai.documentintelligence.models import AnalyzeResult
-from azure.ai.documentintelligence.models import AnalyzeDocumentRequest
-from dotenv import load_dotenv
 import base64
-
-# set `<your-endpoint>` and `<your-key>` variables with the values from the Azure portal
-load_dotenv()
-endpoint = os.getenv("AZURE_DOC_ENDPOINT")
-key = os.getenv("AZURE_DOC_KEY")
+from segments import SegmentWriter
 
 
 class DocumentBatchAnalyzer:
-    def __init__(self):
+    def __init__(self, output_format=None):
+        """``output_format`` ``ndjson`` appends raw and processed results to NDJSON segments.
+
+        Set ``AZURE_DOC_ENDPOINT`` and ``AZURE_DOC_KEY`` (or put them in ``.env``)
+        to the values from the Azure portal.
+        """
+        from dotenv import load_dotenv
         load_dotenv()
+        self.output_format = output_format or os.getenv("ANALYZER_OUTPUT_FORMAT", "json")
         self.endpoint = os.getenv("AZURE_DOC_ENDPOINT")
         self.key = os.getenv("AZURE_DOC_KEY")
-        self.client = DocumentIntelligenceClient(
-            endpoint=self.endpoint, 
-            credential=AzureKeyCredential(self.key)
-        )
+        self._client = None
+
+    @property
+    def client(self):
+        """Document Intelligence client, created (and the Azure SDK imported) on first use"""
+        if self._client is None:
+            from azure.core.credentials import AzureKeyCredential
+            from azure.ai.documentintelligence import DocumentIntelligenceClient
+            self._client = DocumentIntelligenceClient(
+                endpoint=self.endpoint, 
+                credential=AzureKeyCredential(self.key)
+            )
+        return self._client
         
     def analyze_batch(self, input_dir, output_dir, document_type):
         """
@@ -73,6 +80,16 @@ class DocumentBatchAnalyzer:
             
         return results
 
+    def _save(self, data, output_dir, base_filename, kind):
+        """Write ``<base_filename>_<kind>.json``, or append to the ``<kind>`` segments in ndjson mode."""
+        if self.output_format == "ndjson":
+            segment, _ = SegmentWriter(output_dir, kind).append(base_filename, data)
+            return segment
+        path = os.path.join(output_dir, f"{base_filename}_{kind}.json")
+        with open(path, 'w') as f:
+            json.dump(data, f, indent=2)
+        return path
+
     def _analyze_bank_statement(self, file_path, output_dir):
         """Process bank statement and save results"""
         base_filename = os.path.splitext(os.path.basename(file_path))[0]
@@ -86,9 +103,7 @@ class DocumentBatchAnalyzer:
         result = poller.result()
         
         # Save raw analysis
-        raw_output = os.path.join(output_dir, f"{base_filename}_raw.json")
-        with open(raw_output, 'w') as f:
-            json.dump(result.to_dict(), f, indent=2)
+        raw_output = self._save(result.to_dict(), output_dir, base_filename, "raw")
             
         # Process and save structured data
         self._save_bank_statement_data(result, base_filename, output_dir)
@@ -114,16 +129,11 @@ class DocumentBatchAnalyzer:
         result = poller.result()
         
         # Save raw and processed results
-        raw_output = os.path.join(output_dir, f"{base_filename}_raw.json")
-        processed_output = os.path.join(output_dir, f"{base_filename}_processed.json")
-        
-        with open(raw_output, 'w') as f:
-            json.dump(result.to_dict(), f, indent=2)
+        raw_output = self._save(result.to_dict(), output_dir, base_filename, "raw")
             
         # Process and save structured data
         processed_data = self._process_receipt_data(result)
-        with open(processed_output, 'w') as f:
-            json.dump(processed_data, f, indent=2)
+        processed_output = self._save(processed_data, output_dir, base_filename, "processed")
             
         return {
             'raw_output': raw_output,
@@ -143,16 +153,11 @@ class DocumentBatchAnalyzer:
         result = poller.result()
         
         # Save raw and processed results
-        raw_output = os.path.join(output_dir, f"{base_filename}_raw.json")
-        processed_output = os.path.join(output_dir, f"{base_filename}_processed.json")
-        
-        with open(raw_output, 'w') as f:
-            json.dump(result.to_dict(), f, indent=2)
+        raw_output = self._save(result.to_dict(), output_dir, base_filename, "raw")
             
         # Process and save structured data
         processed_data = self._process_invoice_data(result)
-        with open(processed_output, 'w') as f:
-            json.dump(processed_data, f, indent=2)
+        processed_output = self._save(processed_data, output_dir, base_filename, "processed")
             
         return {
             'raw_output': raw_output,
@@ -0,0 +1,196 @@
+"""Per-document stage timings for batch runs, and a report comparing runs.
+
+The analyzers time each document in these stages:
+
+- ``read``: creating the client, reading and base64-encoding the input file;
+- ``upload``: ``begin_analyze_document`` (sending the request);
+- ``service_wait``: time spent in ``poller.result()``, or until the shared
+  polling loop (operation_poller.py) sees the operation finish;
+- ``structure``: turning the service result into our records;
+- ``write``: saving the output file or segment line;
+- ``anomalies``: the anomaly stage for bank statements (see anomaly.py).
+
+``summarize`` turns the documents of one run into p50/p95/p99 per stage,
+documents per minute, bytes uploaded and concurrency utilization (busy
+document time / (wall time x workers)). ``process_batch`` stores this in its
+batch summary JSON. Running this module prints those summaries side by side,
+splitting time spent on our side from time spent waiting on the service, so a
+regression can be attributed to one or the other::
+
+    python batch_telemetry.py                     # all document types under output/
+    python batch_telemetry.py --type receipts --last 5
+"""
+import argparse
+import glob
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+STAGES = ('read', 'upload', 'service_wait', 'structure', 'write', 'anomalies')
+SERVICE_STAGES = ('upload', 'service_wait')
+LOCAL_STAGES = ('read', 'structure', 'write', 'anomalies')
+
+
+class DocumentTimings:
+    """Stage durations (seconds) and bytes uploaded for one document.
+
+    Stages are recorded as laps: ``lap(name)`` books the time since the
+    previous lap (or since the timings were created) under ``name``.
+    """
+
+    def __init__(self, document: str):
+        self.document = document
+        self.stages: Dict[str, float] = {}
+        self.bytes_uploaded = 0
+        self.started = time.time()
+        self.finished: Optional[float] = None
+        self._mark = time.perf_counter()
+
+    def lap(self, name: str, nbytes: int = 0):
+        now = time.perf_counter()
+        self.stages[name] = self.stages.get(name, 0.0) + now - self._mark
+        self.bytes_uploaded += nbytes
+        self._mark = now
+
+    def finish(self):
+        self.finished = time.time()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'stages': {name: round(seconds, 4) for name, seconds in self.stages.items()},
+            'bytes_uploaded': self.bytes_uploaded,
+            'started': self.started,
+            'finished': self.finished,
+        }
+
+
+def lap(timings: Optional[DocumentTimings], name: str, nbytes: int = 0):
+    """``timings.lap(name)``, or nothing when the caller is not collecting timings."""
+    if timings is not None:
+        timings.lap(name, nbytes)
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile (``q`` in 0-100)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, int(-(-q * len(ordered) // 100)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def _stats(values: List[float]) -> Dict[str, float]:
+    return {
+        'count': len(values),
+        'mean': round(sum(values) / len(values), 4) if values else 0.0,
+        'p50': round(percentile(values, 50), 4),
+        'p95': round(percentile(values, 95), 4),
+        'p99': round(percentile(values, 99), 4),
+        'total': round(sum(values), 4),
+    }
+
+
+def summarize(documents: List[DocumentTimings], wall_seconds: float, concurrency: int = 1) -> Dict[str, Any]:
+    """Run-level telemetry for a batch summary."""
+    stages = {name: _stats([d.stages[name] for d in documents if name in d.stages]) for name in STAGES}
+    busy = [sum(d.stages.values()) for d in documents]
+    local = [sum(d.stages.get(s, 0.0) for s in LOCAL_STAGES) for d in documents]
+    service = [sum(d.stages.get(s, 0.0) for s in SERVICE_STAGES) for d in documents]
+    capacity = wall_seconds * max(1, concurrency)
+    return {
+        'documents': len(documents),
+        'wall_seconds': round(wall_seconds, 3),
+        'documents_per_minute': round(len(documents) / wall_seconds * 60, 2) if wall_seconds > 0 else 0.0,
+        'bytes_uploaded': sum(d.bytes_uploaded for d in documents),
+        'concurrency': concurrency,
+        'utilization': round(sum(busy) / capacity, 3) if capacity > 0 else 0.0,
+        'stages': stages,
+        'per_document': {'local': _stats(local), 'service': _stats(service), 'total': _stats(busy)},
+    }
+
+
+class BatchTelemetry:
+    """Collects document timings from (possibly concurrent) workers during one batch run."""
+
+    def __init__(self, concurrency: int = 1):
+        self.concurrency = concurrency
+        self.documents: List[DocumentTimings] = []
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+
+    def document(self, name: str) -> DocumentTimings:
+        timings = DocumentTimings(name)
+        with self._lock:
+            self.documents.append(timings)
+        return timings
+
+    def summary(self) -> Dict[str, Any]:
+        return summarize(self.documents, time.perf_counter() - self._start, self.concurrency)
+
+
+# ----------------------------------------------------------------------
+# Report over batch summaries
+# ----------------------------------------------------------------------
+
+def load_runs(output_dir: str = 'output', document_type: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Batch summaries that carry telemetry, oldest first."""
+    pattern = os.path.join(output_dir, document_type or '*', 'batch_summary_*.json')
+    runs = []
+    for path in glob.glob(pattern):
+        try:
+            with open(path, 'r') as f:
+                summary = json.load(f)
+        except Exception as e:
+            print(f"Error reading batch summary {path}: {e}")
+            continue
+        if 'telemetry' in summary:
+            summary['_type'] = os.path.basename(os.path.dirname(path))
+            runs.append(summary)
+    return sorted(runs, key=lambda r: r.get('timestamp', ''))
+
+
+def _change(current: float, baseline: float) -> str:
+    if not baseline:
+        return ''
+    return f'{(current - baseline) / baseline * 100:+.0f}%'
+
+
+def format_report(runs: List[Dict[str, Any]]) -> str:
+    header = (f"{'run':<20} {'type':<16} {'docs':>5} {'docs/min':>9} {'MB up':>7} {'util':>5} "
+              f"{'local p50':>9} {'svc p50':>8} {'svc p95':>8} {'wait p99':>9}  vs previous (local / service)")
+    lines = [header, '-' * len(header)]
+    previous: Dict[str, Dict[str, Any]] = {}
+    for run in runs:
+        t = run['telemetry']
+        kind = run['_type']
+        local, service = t['per_document']['local'], t['per_document']['service']
+        prior = previous.get(kind)
+        delta = ''
+        if prior is not None:
+            p_local, p_service = prior['per_document']['local'], prior['per_document']['service']
+            delta = f"{_change(local['p50'], p_local['p50']) or '-'} / {_change(service['p50'], p_service['p50']) or '-'}"
+        lines.append(
+            f"{run.get('timestamp', '')[:19]:<20} {kind:<16} {t['documents']:>5} {t['documents_per_minute']:>9.1f} "
+            f"{t['bytes_uploaded'] / 1e6:>7.1f} {t['utilization']:>5.2f} {local['p50']:>8.2f}s {service['p50']:>7.2f}s "
+            f"{service['p95']:>7.2f}s {t['stages']['service_wait']['p99']:>8.2f}s  {delta}"
+        )
+        previous[kind] = t
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare batch runs by stage timings.')
+    parser.add_argument('--output-dir', default='output')
+    parser.add_argument('--type', dest='document_type', help='bank_statements, receipts or invoices')
+    parser.add_argument('--last', type=int, default=0, help='only the last N runs')
+    args = parser.parse_args()
+
+    runs = load_runs(args.output_dir, args.document_type)
+    if args.last:
+        runs = runs[-args.last:]
+    if not runs:
+        print("No batch summaries with telemetry found")
+    else:
+        print(format_report(runs))
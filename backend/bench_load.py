@@ -0,0 +1,118 @@
+"""Benchmark cold loading of analyzer JSON outputs: serial ``json.load`` vs ``load_many``.
+
+Writes synthetic ``*_receipt.json`` files (and optionally a few large
+``*_bank_statement.json`` files) into a temporary folder and times:
+
+- ``serial``: one ``json.load`` per file, as the loaders used to;
+- ``parallel``: ``json_folder.load_many`` with the stdlib parser;
+- ``parallel+orjson``: ``load_many`` with orjson (when installed).
+
+Usage::
+
+    python bench_load.py                     # 1k, 10k and 100k files
+    python bench_load.py --counts 1000 --large 4
+
+Files are read from the OS page cache after being written; run with
+``--drop-caches`` as root to measure reads from disk.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import tempfile
+import time
+
+import json_folder
+import segments
+
+
+def _receipt(i):
+    return {
+        'merchant_name': f'Merchant {i % 500}',
+        'transaction_date': f'2024-{1 + i % 12:02d}-{1 + i % 28:02d}',
+        'total': round(random.uniform(1, 500), 2),
+        'tax': round(random.uniform(0, 40), 2),
+        'items': [{'description': f'Item {j}', 'quantity': 1, 'total_price': 9.99} for j in range(5)],
+    }
+
+
+def _statement(i, transactions):
+    return {
+        'metadata': {'bank_name': 'Bench Bank', 'account_holder': f'Holder {i}',
+                     'statement_period': {'start_date': '2024-01-01', 'end_date': '2024-12-31'}},
+        'accounts': [{
+            'account_number': f'{i:08d}', 'account_type': 'checking',
+            'beginning_balance': 1000.0, 'ending_balance': 1000.0,
+            'transactions': [{'date': f'2024-{1 + t % 12:02d}-{1 + t % 28:02d}', 'description': f'Payment {t}',
+                              'deposit': 0.0, 'withdrawal': 1.25, 'running_balance': 1000.0 - t * 1.25,
+                              'check_number': '', 'category': ''} for t in range(transactions)],
+        }],
+    }
+
+
+def _write_files(folder, count, large):
+    paths = []
+    for i in range(count):
+        path = os.path.join(folder, f'r{i:06d}_receipt.json')
+        with open(path, 'w') as f:
+            json.dump(_receipt(i), f)
+        paths.append(path)
+    for i in range(large):
+        path = os.path.join(folder, f's{i:03d}_bank_statement.json')
+        with open(path, 'w') as f:
+            json.dump(_statement(i, 60000), f)
+        paths.append(path)
+    return paths
+
+
+def _serial(paths):
+    out = []
+    for path in paths:
+        with open(path, 'r') as f:
+            out.append(json.load(f))
+    return out
+
+
+def _drop_caches():
+    subprocess.run(['sync'], check=False)
+    with open('/proc/sys/vm/drop_caches', 'w') as f:
+        f.write('3\n')
+
+
+def _timed(fn, drop_caches):
+    if drop_caches:
+        _drop_caches()
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--counts', default='1000,10000,100000', help='comma-separated file counts')
+    parser.add_argument('--large', type=int, default=0, help='number of large (~6 MB) statement files to add')
+    parser.add_argument('--drop-caches', action='store_true', help='drop the OS page cache before each run (root)')
+    args = parser.parse_args()
+
+    orjson = segments.orjson
+    print(f"{'files':>8} {'serial':>10} {'parallel':>10} {'+orjson':>10}")
+    for count in [int(c) for c in args.counts.split(',')]:
+        folder = tempfile.mkdtemp(prefix='bench_load_')
+        try:
+            paths = _write_files(folder, count, args.large)
+            serial = _timed(lambda: _serial(paths), args.drop_caches)
+            segments.orjson = None
+            parallel = _timed(lambda: json_folder.load_many(paths), args.drop_caches)
+            segments.orjson = orjson
+            fast = _timed(lambda: json_folder.load_many(paths), args.drop_caches) if orjson else None
+            fast_text = f'{fast:9.2f}s' if fast is not None else f"{'n/a':>10}"
+            print(f'{len(paths):>8} {serial:9.2f}s {parallel:9.2f}s {fast_text}')
+        finally:
+            segments.orjson = orjson
+            shutil.rmtree(folder, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""Startup benchmark and import-time budget for each entry point.
+
+Heavy dependencies (pandas, plotly, pyarrow, the Azure SDK, python-dotenv) are
+imported where first used, not when a module is imported. This script keeps
+it that way:
+
+- by default it times ``python -c "import <module>"`` for every entry point
+  (median of ``--repeat`` fresh interpreters, next to a bare interpreter);
+- ``--check`` runs each import under ``python -X importtime``. It fails (exit
+  status 1) when an entry point's cumulative import time exceeds its budget,
+  or when it pulls in one of the deferred packages, and prints the slowest
+  imports of the offender.
+
+::
+
+    python bench_startup.py
+    python bench_startup.py --check
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BACKEND_DIR)
+
+# Packages that must not be imported just by importing an entry point
+DEFERRED = ('pandas', 'plotly', 'pyarrow', 'azure', 'dotenv')
+
+# module -> (working directory, import-time budget in ms)
+ENTRY_POINTS: Dict[str, Tuple[str, int]] = {
+    'app': (BACKEND_DIR, 500),
+    'backend.main': (REPO_DIR, 800),  # FastAPI itself accounts for most of it
+    'batch_processor': (BACKEND_DIR, 150),
+    'batch_processor_docs': (BACKEND_DIR, 100),
+    'doc_intel_quickstart': (BACKEND_DIR, 150),
+    'parquet_store': (BACKEND_DIR, 300),
+    'batch_telemetry': (BACKEND_DIR, 100),
+}
+
+
+def _run(args: List[str], cwd: str) -> subprocess.CompletedProcess:
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE='1', OUTPUT_WATCHER='0')
+    return subprocess.run([sys.executable] + args, cwd=cwd, env=env, capture_output=True, text=True)
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int]]:
+    """``(module, self us, cumulative us)`` for each line of ``-X importtime`` output."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3:
+            continue
+        rows.append((fields[2].strip(), int(fields[0]), int(fields[1])))
+    return rows
+
+
+def check(module: str, cwd: str, budget_ms: int) -> List[str]:
+    """Budget and deferred-import violations of ``module``."""
+    result = _run(['-X', 'importtime', '-c', f'import {module}'], cwd)
+    if result.returncode != 0:
+        return [f'import failed: {result.stderr.strip().splitlines()[-1]}']
+    rows = parse_importtime(result.stderr)
+    total_ms = next((cumulative for name, _, cumulative in rows if name == module), 0) / 1000
+    problems = []
+    loaded = sorted({name.split('.')[0] for name, _, _ in rows} & set(DEFERRED))
+    if loaded:
+        problems.append(f"imports deferred package(s): {', '.join(loaded)}")
+    if total_ms > budget_ms:
+        problems.append(f'import takes {total_ms:.0f}ms (budget {budget_ms}ms)')
+    if problems:
+        slowest = sorted(rows, key=lambda r: r[1], reverse=True)[:10]
+        problems.append('slowest imports (self time): ' +
+                        ', '.join(f'{name} {self_us / 1000:.0f}ms' for name, self_us, _ in slowest))
+    print(f"{module:<24} {total_ms:>7.0f}ms / {budget_ms}ms  {'FAIL' if problems else 'ok'}")
+    return problems
+
+
+def startup(module: str, cwd: str, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = _run(['-c', f'import {module}'], cwd)
+        times.append(time.perf_counter() - start)
+        if result.returncode != 0:
+            raise RuntimeError(f'import {module} failed: {result.stderr.strip().splitlines()[-1]}')
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--check', action='store_true', help='enforce the import-time budgets')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--only', default='', help='only entry points containing this text')
+    args = parser.parse_args()
+
+    entry_points = {m: v for m, v in ENTRY_POINTS.items() if args.only in m}
+    if args.check:
+        failures = {}
+        for module, (cwd, budget) in entry_points.items():
+            problems = check(module, cwd, budget)
+            if problems:
+                failures[module] = problems
+        for module, problems in failures.items():
+            print(f"\n{module}:")
+            for problem in problems:
+                print(f"  {problem}")
+        return 1 if failures else 0
+
+    bare = startup('sys', BACKEND_DIR, args.repeat)
+    print(f"{'entry point':<24} {'startup':>9} {'imports':>9}")
+    print(f"{'(bare interpreter)':<24} {bare * 1000:>7.0f}ms")
+    for module, (cwd, _) in entry_points.items():
+        try:
+            seconds = startup(module, cwd, args.repeat)
+        except RuntimeError as e:
+            print(f"{module:<24} {e}")
+            continue
+        print(f"{module:<24} {seconds * 1000:>7.0f}ms {(seconds - bare) * 1000:>7.0f}ms")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
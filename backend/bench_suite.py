@@ -0,0 +1,250 @@
+"""Micro-benchmarks for the dashboard loaders, route handlers and categorizer, with tracked baselines.
+
+A synthetic output tree (see ``synthetic_data.py``) is written to a temporary
+folder, and the app is imported from there. Each case is timed ``--repeat``
+times (median reported), then run once more under ``tracemalloc`` for its
+peak Python memory. Loader cases start cold (fresh caches). Route cases run
+warm, like a busy worker: the data caches are kept, but the HTTP body cache is
+cleared so the handler itself runs.
+
+Results are compared with ``bench_baselines.json`` for the chosen size. A
+case regresses when its fastest time exceeds the baseline by more than
+``--tolerance`` or its peak memory by more than ``--memory-tolerance``. The
+exit status is 1 when anything regressed::
+
+    python bench_suite.py                        # small size, compare with the baseline
+    python bench_suite.py --size medium --only api
+    python bench_suite.py --save-baseline        # record the current numbers
+
+Baselines are machine-specific: record them on the machine that runs the
+comparison.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Tuple
+
+import synthetic_data
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_baselines.json')
+
+SIZES = {
+    'small': dict(statements=12, transactions=200, receipts=1000, invoices=200, csv_pairs=4),
+    'medium': dict(statements=48, transactions=1000, receipts=10000, invoices=2000, csv_pairs=12),
+    'large': dict(statements=120, transactions=4000, receipts=50000, invoices=10000, csv_pairs=24),
+}
+
+# Differences below these are noise, whatever the ratio
+MIN_TIME_DELTA = 0.002
+MIN_MEMORY_DELTA = 1.0  # MB
+
+Case = Tuple[str, Callable[[], None], Optional[Callable[[], None]]]
+
+
+def _route(client, url) -> Callable[[], None]:
+    def run():
+        response = client.get(url)
+        if response.status_code != 200 or b'"error"' in response.data[:200]:
+            raise RuntimeError(f'{url} failed: {response.status_code} {response.data[:200]!r}')
+    return run
+
+
+def build_cases(app_module, csv_root: str, data_root: str) -> List[Case]:
+    """``(name, run, setup)`` for every benchmark; ``setup`` runs untimed before each repeat."""
+    import categorize
+    from downsample import balance_series
+    from http_cache import BODY_CACHE
+    from json_folder import JsonFolder
+    from ledger import Ledger
+    from receipt_items import ReceiptItems
+
+    def fresh_receipts():
+        app_module.RECEIPTS = JsonFolder('output/receipts', '_receipt.json', label='receipt file')
+        app_module._receipt_cache.update(generation=None, index=None)
+        app_module.RECEIPT_ITEMS = ReceiptItems(app_module.RECEIPTS)
+
+    def fresh_invoices():
+        app_module.INVOICES = JsonFolder('output/invoices', '_invoice.json', label='invoice file')
+
+    def fresh_ledger():
+        app_module.LEDGER = Ledger('output/bank_statements', fallback_loader=app_module.load_bank_statements)
+
+    def csv_loader():
+        os.chdir(csv_root)
+        try:
+            if not app_module.load_bank_statements():
+                raise RuntimeError('CSV fallback found no statements')
+        finally:
+            os.chdir(data_root)
+
+    statements = app_module.load_bank_statements()
+    transactions = [
+        {'description': tx['description'], 'deposits': tx['deposit'], 'withdrawals': tx['withdrawal']}
+        for s in statements for a in s['accounts'] for tx in a['transactions']
+    ]
+    ledger = app_module.load_ledger()
+    series = balance_series(ledger.store, mask=ledger.unique_mask(), width=2000)
+
+    client = app_module.app.test_client()
+    clear = BODY_CACHE.clear
+    routes = [
+        '/api/bank-statements',
+        '/api/bank-statements/summary?start_date=2024-03-01&end_date=2024-09-30',
+        '/api/bank-statements/rollup?freq=weekly',
+        '/api/bank-statements/balance-trend?start_date=2024-02-01&end_date=2024-04-30',
+        '/api/receipts',
+        '/api/receipts?merchant=star&min_total=5&start_date=2024-03-01',
+        '/api/receipt-items',
+        '/api/receipt-items?item=coffee&start_month=2024-03&end_month=2024-04',
+        '/api/invoices',
+        '/api/reconciliation',
+        '/api/matches',
+        '/api/export/transactions',
+        '/api/export/receipts?start_date=2024-03-01',
+    ]
+    cases: List[Case] = [
+        ('load_bank_statements.json', app_module.load_bank_statements, None),
+        ('load_bank_statements.csv', csv_loader, None),
+        ('load_ledger.cold', app_module.load_ledger, fresh_ledger),
+        ('load_receipts.cold', app_module.load_receipts, fresh_receipts),
+        ('load_receipt_index.cold', app_module.load_receipt_index, fresh_receipts),
+        ('load_receipt_items.cold', app_module.load_receipt_items, fresh_receipts),
+        ('load_invoices.cold', app_module.load_invoices, fresh_invoices),
+        ('categorize_transactions', lambda: categorize.categorize_transactions(transactions), None),
+        ('balance_trend_figure', lambda: app_module.balance_trend_figure(series).to_json(), None),
+    ]
+    for url in routes:
+        run = _route(client, url)
+        run()  # warm the data caches
+        cases.append((f'api {url}', run, clear))
+    return cases
+
+
+def measure(run: Callable[[], None], setup: Optional[Callable[[], None]], repeat: int) -> Dict[str, float]:
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        gc.collect()
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    if setup is not None:
+        setup()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        run()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {'median_s': round(statistics.median(times), 5), 'min_s': round(min(times), 5),
+            'peak_mb': round(peak / 1e6, 2)}
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+            tolerance: float, memory_tolerance: float) -> List[str]:
+    """Descriptions of the cases that regressed against ``baseline``."""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        # The fastest repeat is the least disturbed by other load on the machine
+        if (result['min_s'] > base['min_s'] * (1 + tolerance)
+                and result['min_s'] - base['min_s'] > MIN_TIME_DELTA):
+            regressions.append(f"{name}: time {base['min_s'] * 1000:.1f}ms -> {result['min_s'] * 1000:.1f}ms")
+        if (result['peak_mb'] > base['peak_mb'] * (1 + memory_tolerance)
+                and result['peak_mb'] - base['peak_mb'] > MIN_MEMORY_DELTA):
+            regressions.append(f"{name}: peak memory {base['peak_mb']:.1f}MB -> {result['peak_mb']:.1f}MB")
+    return regressions
+
+
+def load_baselines(path: str = BASELINE_FILE) -> Dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def save_baselines(baselines: Dict, path: str = BASELINE_FILE):
+    with open(path, 'w') as f:
+        json.dump(baselines, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size', choices=sorted(SIZES), default='small')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--only', default='', help='run only cases whose name contains this text')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed relative slowdown')
+    parser.add_argument('--memory-tolerance', type=float, default=0.25, help='allowed relative peak memory growth')
+    parser.add_argument('--baseline', default=BASELINE_FILE)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    cwd = os.getcwd()
+    workdir = tempfile.mkdtemp(prefix='bench_suite_')
+    data_root = os.path.join(workdir, 'data')
+    csv_root = os.path.join(workdir, 'csv')
+    sizes = SIZES[args.size]
+    try:
+        synthetic_data.generate(os.path.join(data_root, 'output'), seed=args.seed, **dict(sizes, csv_pairs=0))
+        synthetic_data.generate(os.path.join(csv_root, 'output'), statements=0, transactions=sizes['transactions'],
+                                receipts=0, invoices=0, csv_pairs=sizes['csv_pairs'], seed=args.seed)
+
+        # The app resolves output/ relative to the working directory
+        os.chdir(data_root)
+        os.environ.setdefault('LEDGER_SNAPSHOT_DIR', os.path.join(data_root, 'output', 'snapshots'))
+        os.environ['OUTPUT_WATCHER'] = '0'
+        sys.path.insert(0, here)
+        import app as app_module
+
+        results = {}
+        print(f"{'case':<72} {'median':>9} {'min':>9} {'peak':>9}")
+        for name, run, setup in build_cases(app_module, csv_root, data_root):
+            if args.only and args.only not in name:
+                continue
+            result = results[name] = measure(run, setup, args.repeat)
+            print(f"{name:<72} {result['median_s'] * 1000:>7.1f}ms {result['min_s'] * 1000:>7.1f}ms "
+                  f"{result['peak_mb']:>7.1f}MB")
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    baselines = load_baselines(args.baseline)
+    if args.save_baseline:
+        entry = baselines.setdefault(args.size, {'cases': {}})
+        entry['cases'].update(results)
+        entry['machine'] = f'{platform.machine()} {os.cpu_count()} CPU, Python {platform.python_version()}'
+        save_baselines(baselines, args.baseline)
+        print(f"Saved {len(results)} baselines for size '{args.size}' to {args.baseline}")
+        return 0
+
+    baseline = baselines.get(args.size, {}).get('cases', {})
+    if not baseline:
+        print(f"No baseline for size '{args.size}'; record one with --save-baseline")
+        return 0
+    regressions = compare(results, baseline, args.tolerance, args.memory_tolerance)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) against the baseline:")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    print("\nNo regressions against the baseline")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
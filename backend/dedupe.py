@@ -0,0 +1,110 @@
+"""Duplicate transaction detection across overlapping bank statements.
+
+Clients often upload overlapping statements (a monthly and a quarterly
+statement, or the same PDF twice), so identical transactions show up in
+several ``*_bank_statement.json`` files. Each transaction is fingerprinted by
+
+    (account number, date, deposit, withdrawal, normalized description, ordinal)
+
+where *ordinal* counts earlier transactions with the same first five fields
+in the same statement. Two genuine $4.50 coffees on the same day in one
+statement therefore stay distinct, while the same pair re-appearing in an
+overlapping statement matches them one-to-one.
+
+Fingerprints are 64-bit hashes computed column-wise with NumPy and kept in a
+dict, so detection is O(n) and new statements are checked against the index
+without revisiting older rows.
+"""
+import re
+from typing import Dict, List
+
+import numpy as np
+
+from ledger_store import TransactionStore
+
+_PUNCTUATION = re.compile(r'[^0-9A-Z]+')
+_MIX = np.uint64(0x100000001B3)
+
+
+def normalize_description(text: str) -> str:
+    """Uppercase and collapse punctuation/whitespace, so cosmetic OCR differences still match."""
+    return _PUNCTUATION.sub(' ', (text or '').upper()).strip()
+
+
+def _mix(h: np.ndarray, column: np.ndarray) -> np.ndarray:
+    h = (h ^ column.astype(np.int64).view(np.uint64)) * _MIX
+    return h ^ (h >> np.uint64(29))
+
+
+class DedupeIndex:
+    """Incrementally maintained duplicate mask for a ``TransactionStore``.
+
+    Call ``update()`` after appending statements to the store; only rows added
+    since the previous call are fingerprinted. ``duplicates`` is a boolean
+    array (True for every occurrence after the first) aligned with the store.
+    """
+
+    def __init__(self, store: TransactionStore):
+        self.store = store
+        self._seen: Dict[int, int] = {}
+        self._normalized: List[int] = []
+        self._normalized_ids: Dict[str, int] = {}
+        self._duplicates = np.zeros(0, dtype=bool)
+        self._processed = 0
+
+    @property
+    def duplicates(self) -> np.ndarray:
+        return self._duplicates[:self._processed]
+
+    @property
+    def duplicate_count(self) -> int:
+        return int(self.duplicates.sum())
+
+    def _normalized_codes(self) -> np.ndarray:
+        """Map description codes to normalized-description ids (computed once per distinct string)."""
+        pool = self.store.description_pool
+        for code in range(len(self._normalized), len(pool)):
+            norm = normalize_description(pool[code])
+            self._normalized.append(self._normalized_ids.setdefault(norm, len(self._normalized_ids)))
+        return np.asarray(self._normalized, dtype=np.int64)
+
+    def update(self) -> np.ndarray:
+        """Fingerprint rows appended since the last call; returns the full duplicate mask."""
+        store = self.store
+        start, end = self._processed, len(store)
+        if end > len(self._duplicates):
+            grown = np.zeros(max(end, len(self._duplicates) * 3 // 2), dtype=bool)
+            grown[:start] = self._duplicates[:start]
+            self._duplicates = grown
+        if end == start:
+            return self.duplicates
+
+        rows = slice(start, end)
+        slots = store.slots[rows]
+        statement = store.slot_statement[slots].astype(np.int64)
+        days = store.dates[rows].astype(np.int64)  # NaT maps to a fixed sentinel, fine for hashing
+        import pandas as pd
+        key = pd.DataFrame({
+            'statement': statement,
+            'account': store.slot_account[slots],
+            'day': days,
+            'deposit': np.rint(store.deposits[rows] * 100).astype(np.int64),
+            'withdrawal': np.rint(store.withdrawals[rows] * 100).astype(np.int64),
+            'description': self._normalized_codes()[store.description_codes[rows]],
+        })
+        ordinal = key.groupby(list(key.columns), sort=False).cumcount().to_numpy()
+
+        h = np.full(end - start, 0xCBF29CE484222325, dtype=np.uint64)
+        for column in ('account', 'day', 'deposit', 'withdrawal', 'description'):
+            h = _mix(h, key[column].to_numpy())
+        h = _mix(h, ordinal)
+
+        seen = self._seen
+        duplicates = self._duplicates
+        for offset, fingerprint in enumerate(h.tolist(), start):
+            if fingerprint in seen:
+                duplicates[offset] = True
+            else:
+                seen[fingerprint] = offset
+        self._processed = end
+        return self.duplicates
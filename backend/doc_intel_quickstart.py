@@ -2,21 +2,57 @@
 import os
 import csv
 from datetime import datetime
-from azure.core.credentials import AzureKeyCredential
-from azure.ai.documentintelligence import DocumentIntelligenceClient
-from azure.ai.documentintelligence.models import AnalyzeResult
-from azure.ai.documentintelligence.models import AnalyzeDocumentRequest
-from dotenv import load_dotenv
 import base64
 import json
+from batch_telemetry import lap
+from segments import SEGMENT_PREFIXES, SegmentWriter
 
-# set `<your-endpoint>` and `<your-key>` variables with the values from the Azure portal
-load_dotenv()
-endpoint = os.getenv("AZURE_DOC_ENDPOINT")
-key = os.getenv("AZURE_DOC_KEY")
+# The Azure SDK and .env are loaded on first use (see _client), so importing
+# this module, e.g. through batch_processor, stays fast
+_env_loaded = False
+_clients = {}
 
 # helper functions
 
+def _client():
+    """Shared Document Intelligence client for the configured endpoint.
+
+    Set ``AZURE_DOC_ENDPOINT`` and ``AZURE_DOC_KEY`` (or put them in ``.env``)
+    to the values from the Azure portal.
+    """
+    global _env_loaded
+    if not _env_loaded:
+        from dotenv import load_dotenv
+        load_dotenv()
+        _env_loaded = True
+    endpoint = os.getenv("AZURE_DOC_ENDPOINT")
+    key = os.getenv("AZURE_DOC_KEY")
+    client = _clients.get((endpoint, key))
+    if client is None:
+        from azure.core.credentials import AzureKeyCredential
+        from azure.ai.documentintelligence import DocumentIntelligenceClient
+        client = _clients[(endpoint, key)] = DocumentIntelligenceClient(
+            endpoint=endpoint, credential=AzureKeyCredential(key)
+        )
+    return client
+
+
+def _save_results(data, output_dir, base_filename, suffix, output_format=None):
+    """Write one document's results to ``<base_filename><suffix>``, or append them to an NDJSON segment.
+
+    ``output_format`` is ``json`` (default) or ``ndjson``; it falls back to the
+    ``ANALYZER_OUTPUT_FORMAT`` environment variable.
+    """
+    output_format = output_format or os.getenv("ANALYZER_OUTPUT_FORMAT", "json")
+    if output_format == "ndjson":
+        segment, _ = SegmentWriter(output_dir, SEGMENT_PREFIXES[suffix]).append(base_filename, data)
+        return segment
+    results_file = os.path.join(output_dir, f"{base_filename}{suffix}")
+    with open(results_file, 'w') as f:
+        json.dump(data, f, indent=2)
+    return results_file
+
+
 def get_words(page, line):
     result = []
     for word in page.words:
@@ -33,27 +69,36 @@ def _in_span(word, spans):
             return True
     return False
 
-def analyze_bank_statement(input_file=None, output_dir=None):
-    """Analyze bank statement with configurable input/output"""
+def analyze_bank_statement(input_file=None, output_dir=None, output_format=None, timings=None):
+    """Analyze bank statement with configurable input/output
+
+    ``timings`` (a ``batch_telemetry.DocumentTimings``) receives the time
+    spent per stage and the bytes uploaded.
+    """
     filepath = input_file or "07312025_SScotiabank.pdf"
     output_dir = output_dir or "output"
     
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
     
-    document_intelligence_client = DocumentIntelligenceClient(
-        endpoint=endpoint, credential=AzureKeyCredential(key)
-    )
+    document_intelligence_client = _client()
 
     # Read and process the PDF
     with open(filepath, "rb") as file_stream:
         base64_data = base64.b64encode(file_stream.read()).decode("utf-8")
+        lap(timings, "read")
         poller = document_intelligence_client.begin_analyze_document(
             "prebuilt-bankStatement.us", analyze_request={"base64Source": base64_data}
         )
+        lap(timings, "upload", len(base64_data))
     bankstatements = poller.result()
-    
-    base_filename = os.path.splitext(os.path.basename(filepath))[0]
+    lap(timings, "service_wait")
+    return structure_bank_statement(bankstatements, filepath, output_dir, output_format, timings)
+
+def structure_bank_statement(bankstatements, input_file, output_dir="output", output_format=None, timings=None):
+    """Turn a bank statement analyze result into records and save them (the structuring stage)"""
+    os.makedirs(output_dir, exist_ok=True)
+    base_filename = os.path.splitext(os.path.basename(input_file))[0]
     
     # Create structured data
     statement_data = []
@@ -104,44 +149,62 @@ def analyze_bank_statement(input_file=None, output_dir=None):
         
         statement_data.append(statement_info)
     
-    # Save to JSON file
-    results_file = os.path.join(output_dir, f"{base_filename}_bank_statement.json")
-    with open(results_file, 'w') as f:
-        json.dump(statement_data, f, indent=2)
+    # Save to JSON file (or NDJSON segment)
+    lap(timings, "structure")
+    results_file = _save_results(statement_data, output_dir, base_filename, "_bank_statement.json", output_format)
+    lap(timings, "write")
+
+    # Flag unusual withdrawals in the same pass (see anomaly.py; imported here, it pulls in NumPy)
+    try:
+        from anomaly import observe_statements
+        flags = observe_statements(output_dir, base_filename, statement_data)
+        if flags:
+            print(f"Flagged {len(flags)} unusual withdrawal(s); see /api/anomalies")
+    except Exception as e:
+        print(f"Error running anomaly detection: {e}")
+    lap(timings, "anomalies")
     
     print(f"Created bank statement analysis file: {results_file}")
     print("--------------------------------------")
     return results_file
 
-def analyze_receipt(input_file=None, output_dir=None):
-    """Analyze receipt with configurable input/output"""
+def analyze_receipt(input_file=None, output_dir=None, output_format=None, timings=None):
+    """Analyze receipt with configurable input/output (``timings``: see analyze_bank_statement)"""
     output_dir = output_dir or "output"
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
     
-    document_intelligence_client = DocumentIntelligenceClient(
-        endpoint=endpoint, credential=AzureKeyCredential(key)
-    )
+    document_intelligence_client = _client()
 
     if input_file:
         # Process local file
         with open(input_file, "rb") as file_stream:
             base64_data = base64.b64encode(file_stream.read()).decode("utf-8")
+            lap(timings, "read")
             poller = document_intelligence_client.begin_analyze_document(
                 "prebuilt-receipt", analyze_request={"base64Source": base64_data}
             )
+            lap(timings, "upload", len(base64_data))
     else:
         # Use sample receipt URL as fallback
+        from azure.ai.documentintelligence.models import AnalyzeDocumentRequest
         receiptUrl = "https://raw.githubusercontent.com/Azure/azure-sdk-for-python/main/sdk/formrecognizer/azure-ai-formrecognizer/tests/sample_forms/receipt/contoso-receipt.png"
         poller = document_intelligence_client.begin_analyze_document(
             "prebuilt-receipt", AnalyzeDocumentRequest(url_source=receiptUrl)
         )
+        lap(timings, "upload")
     
     receipts = poller.result()
+    lap(timings, "service_wait")
+    return structure_receipt(receipts, input_file, output_dir, output_format, timings)
+
+def structure_receipt(receipts, input_file=None, output_dir="output", output_format=None, timings=None):
+    """Turn a receipt analyze result into records and save them (the structuring stage)"""
+    os.makedirs(output_dir, exist_ok=True)
     base_filename = os.path.splitext(os.path.basename(input_file))[0] if input_file else "sample_receipt"
+    from receipt_items import normalize_receipt  # pulls in NumPy through dedupe
     
-    # Save results to JSON file
-    results_file = os.path.join(output_dir, f"{base_filename}_receipt.json")
+    # Save results to JSON file (or NDJSON segment)
     receipt_data = []
     
     for idx, receipt in enumerate(receipts.documents):
@@ -166,45 +229,55 @@ def analyze_receipt(input_file=None, output_dir=None):
                     "total_price": item.value_object.get("TotalPrice", {}).value_currency.amount if item.value_object.get("TotalPrice") else 0.0
                 }
                 receipt_info["items"].append(item_info)
+        normalize_receipt(receipt_info)
         
         receipt_data.append(receipt_info)
     
-    with open(results_file, 'w') as f:
-        json.dump(receipt_data, f, indent=2)
+    lap(timings, "structure")
+    results_file = _save_results(receipt_data, output_dir, base_filename, "_receipt.json", output_format)
+    lap(timings, "write")
     
     print(f"Created receipt analysis file: {results_file}")
     print("--------------------------------------")
     return results_file
 
-def analyze_invoice(input_file=None, output_dir=None):
-    """Analyze invoice with configurable input/output"""
+def analyze_invoice(input_file=None, output_dir=None, output_format=None, timings=None):
+    """Analyze invoice with configurable input/output (``timings``: see analyze_bank_statement)"""
     output_dir = output_dir or "output"
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
     
-    document_intelligence_client = DocumentIntelligenceClient(
-        endpoint=endpoint, credential=AzureKeyCredential(key)
-    )
+    document_intelligence_client = _client()
 
     if input_file:
         # Process local file
         with open(input_file, "rb") as file_stream:
             base64_data = base64.b64encode(file_stream.read()).decode("utf-8")
+            lap(timings, "read")
             poller = document_intelligence_client.begin_analyze_document(
                 "prebuilt-invoice", analyze_request={"base64Source": base64_data}
             )
+            lap(timings, "upload", len(base64_data))
     else:
         # Use sample invoice URL as fallback
+        from azure.ai.documentintelligence.models import AnalyzeDocumentRequest
         invoiceUrl = "https://raw.githubusercontent.com/Azure-Samples/cognitive-services-REST-api-samples/master/curl/form-recognizer/sample-invoice.pdf"
         poller = document_intelligence_client.begin_analyze_document(
             "prebuilt-invoice", AnalyzeDocumentRequest(url_source=invoiceUrl)
         )
+        lap(timings, "upload")
     
     invoices = poller.result()
+    lap(timings, "service_wait")
+    return structure_invoice(invoices, input_file, output_dir, output_format, timings)
+
+def structure_invoice(invoices, input_file=None, output_dir="output", output_format=None, timings=None):
+    """Turn an invoice analyze result into records and save them (the structuring stage)"""
+    os.makedirs(output_dir, exist_ok=True)
     base_filename = os.path.splitext(os.path.basename(input_file))[0] if input_file else "sample_invoice"
+    from payables import normalize_invoice  # pulls in NumPy through dedupe
     
-    # Save results to JSON file
-    results_file = os.path.join(output_dir, f"{base_filename}_invoice.json")
+    # Save results to JSON file (or NDJSON segment)
     invoice_data = []
     
     if invoices.documents:
@@ -220,7 +293,8 @@ def analyze_invoice(input_file=None, output_dir=None):
                 "items": [],
                 "subtotal": invoice.fields.get("SubTotal", {}).get('content') if invoice.fields.get("SubTotal") else "",
                 "total_tax": invoice.fields.get("TotalTax", {}).get('content') if invoice.fields.get("TotalTax") else "",
-                "invoice_total": invoice.fields.get("InvoiceTotal", {}).get('content') if invoice.fields.get("InvoiceTotal") else ""
+                "invoice_total": invoice.fields.get("InvoiceTotal", {}).get('content') if invoice.fields.get("InvoiceTotal") else "",
+                "amount_due": invoice.fields.get("AmountDue", {}).get('content') if invoice.fields.get("AmountDue") else ""
             }
             
             if invoice.fields.get("Items"):
@@ -233,10 +307,18 @@ def analyze_invoice(input_file=None, output_dir=None):
                     }
                     invoice_info["items"].append(item_info)
             
+            # Numeric amounts and ISO dates next to the raw strings (see payables.py);
+            # the service's own date values are preferred over parsing the content
+            for field, key in (("InvoiceDate", "invoice_date_iso"), ("DueDate", "due_date_iso")):
+                if invoice.fields.get(field) and invoice.fields.get(field).get("valueDate"):
+                    invoice_info[key] = str(invoice.fields.get(field).get("valueDate"))
+            normalize_invoice(invoice_info)
+
             invoice_data.append(invoice_info)
     
-    with open(results_file, 'w') as f:
-        json.dump(invoice_data, f, indent=2)
+    lap(timings, "structure")
+    results_file = _save_results(invoice_data, output_dir, base_filename, "_invoice.json", output_format)
+    lap(timings, "write")
     
     print(f"Created invoice analysis file: {results_file}")
     print("--------------------------------------")
@@ -244,11 +326,11 @@ def analyze_invoice(input_file=None, output_dir=None):
 
 def analyze_layout():
     # sample document
+    from azure.ai.documentintelligence.models import AnalyzeDocumentRequest, AnalyzeResult
+
     formUrl = "https://raw.githubusercontent.com/Azure-Samples/cognitive-services-REST-api-samples/master/curl/form-recognizer/sample-layout.pdf"
 
-    document_intelligence_client = DocumentIntelligenceClient(
-        endpoint=endpoint, credential=AzureKeyCredential(key)
-    )
+    document_intelligence_client = _client()
 
     poller = document_intelligence_client.begin_analyze_document(
         "prebuilt-layout", AnalyzeDocumentRequest(url_source=formUrl
@@ -0,0 +1,101 @@
+"""Server-side downsampling of per-account balance series.
+
+Busy accounts have hundreds of thousands of balance points, far more than a
+chart can show. ``balance_series`` groups all rows by account in one sort
+and reduces each account to roughly the chart width with
+Largest-Triangle-Three-Buckets (keeps the visual shape) or min/max per
+bucket (keeps every extreme).
+"""
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from ledger_store import TransactionStore
+
+DEFAULT_WIDTH = 1200
+MAX_WIDTH = 10000
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Indices of the points kept by Largest-Triangle-Three-Buckets."""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = x.astype(np.float64)
+    y = y.astype(np.float64)
+    every = (n - 2) / (threshold - 2)
+    edges = (np.arange(threshold - 1) * every).astype(np.int64) + 1
+    edges[-1] = n - 1
+    keep = np.empty(threshold, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        keep[i + 1] = a
+    return keep
+
+
+def minmax(y: np.ndarray, threshold: int) -> np.ndarray:
+    """Indices of the min and max point of each of ``threshold // 2`` equal-count buckets."""
+    n = len(y)
+    buckets = max(1, threshold // 2)
+    if threshold >= n:
+        return np.arange(n)
+    bucket = np.arange(n) * buckets // n
+    order = np.lexsort((y, bucket))
+    starts = np.searchsorted(bucket[order], np.arange(buckets))
+    ends = np.append(starts[1:], n) - 1
+    return np.unique(np.concatenate([order[starts], order[ends], [0, n - 1]]))
+
+
+def balance_series(store: TransactionStore, mask: Optional[np.ndarray] = None, width: int = DEFAULT_WIDTH,
+                   method: str = 'lttb', start_date: Optional[str] = None, end_date: Optional[str] = None,
+                   account: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Per-account date/running-balance series, each downsampled to about ``width`` points.
+
+    ``width=0`` returns every point (used for zoomed, narrow date windows).
+    """
+    dates = store.dates
+    keep = ~np.isnat(dates)
+    if mask is not None:
+        keep &= mask
+    if start_date:
+        keep &= dates >= np.datetime64(start_date, 'D')
+    if end_date:
+        keep &= dates <= np.datetime64(end_date, 'D')
+    accounts = store.account_codes
+    if account:
+        code = store.account_pool.lookup(account)
+        if code is None:
+            return []
+        keep &= accounts == code
+
+    rows = np.flatnonzero(keep)
+    # One stable sort groups rows by account and orders each account by date
+    order = np.lexsort((dates[rows], accounts[rows]))
+    rows = rows[order]
+    row_accounts = accounts[rows]
+    row_days = dates[rows].astype(np.int64)
+    balances = store.running_balances[rows]
+    boundaries = np.flatnonzero(np.diff(row_accounts)) + 1
+
+    series = []
+    for group in np.split(np.arange(len(rows)), boundaries):
+        if not len(group):
+            continue
+        x, y = row_days[group], balances[group]
+        if width and len(group) > width:
+            picked = minmax(y, width) if method == 'minmax' else lttb(x, y, width)
+            x, y = x[picked], y[picked]
+        series.append({
+            'account_number': store.account_pool[row_accounts[group[0]]],
+            'points': int(len(group)),
+            'dates': x.astype('datetime64[D]').astype(str).tolist(),
+            'balances': y.tolist(),
+        })
+    return series
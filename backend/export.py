@@ -0,0 +1,235 @@
+"""Streaming CSV and XLSX exports of transactions, receipts and invoices.
+
+Rows come from generators over the data the dashboard already holds (the
+columnar transaction store, the cached receipt and invoice documents), so an
+export never materializes its result:
+
+- CSV is written row by row into a small buffer that is handed out every
+  ``CHUNK_BYTES``, so the first bytes leave right after the filters are
+  applied;
+- XLSX uses openpyxl's write-only workbook (optional dependency), which
+  writes rows to a temporary file as they are appended. The finished file is
+  then streamed in chunks. Sheets roll over at Excel's row limit.
+
+Receipts and invoices are exported one row per line item, with the
+document's fields repeated on each of its items. Text that a spreadsheet
+would run as a formula (OCR'd names and descriptions starting with ``=``,
+``+``, ``-`` or ``@``) is written with a leading ``'``.
+"""
+import csv
+import importlib.util
+import io
+import re
+import tempfile
+from datetime import date
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+HAVE_OPENPYXL = importlib.util.find_spec('openpyxl') is not None  # optional dependency
+
+CHUNK_BYTES = 64 * 1024
+TRANSACTION_CHUNK = 8192
+XLSX_MAX_ROWS = 1048576  # per sheet, including the header
+
+DATASETS = ('transactions', 'receipts', 'invoices')
+FORMATS = {
+    'csv': 'text/csv',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+TRANSACTION_COLUMNS = ['date', 'account_holder', 'bank_name', 'account_number', 'description', 'deposit',
+                       'withdrawal', 'running_balance', 'check_number', 'category']
+RECEIPT_COLUMNS = ['receipt_id', 'merchant_name', 'transaction_date', 'subtotal', 'tax', 'tip', 'total',
+                   'item_description', 'item_quantity', 'item_price', 'item_total_price']
+INVOICE_COLUMNS = ['invoice_key', 'invoice_id', 'vendor_name', 'customer_name', 'invoice_date', 'due_date',
+                   'subtotal', 'total_tax', 'invoice_total', 'item_description', 'item_quantity',
+                   'item_unit_price', 'item_amount']
+
+Row = Sequence[Any]
+
+# Leading characters that make a spreadsheet treat a text cell as a formula
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def parse_day(value: Optional[str]) -> Optional[np.datetime64]:
+    """``YYYY-MM-DD`` (or any ISO date prefix) as a day, None when empty; ValueError when invalid."""
+    if not value:
+        return None
+    return np.datetime64(date.fromisoformat(str(value).strip()[:10]), 'D')
+
+
+def _amount(value: Any) -> Any:
+    """Numbers as floats, including strings like ``"$1,234.56"``; anything else unchanged."""
+    if isinstance(value, (int, float)) or value is None:
+        return value
+    cleaned = re.sub(r'[^0-9\.\-]', '', str(value))
+    try:
+        return float(cleaned)
+    except ValueError:
+        return value
+
+
+def _in_range(value: Any, start: Optional[np.datetime64], end: Optional[np.datetime64]) -> bool:
+    if start is None and end is None:
+        return True
+    try:
+        day = parse_day(value)
+    except (TypeError, ValueError):
+        return False
+    return day is not None and (start is None or day >= start) and (end is None or day <= end)
+
+
+# ----------------------------------------------------------------------
+# Row generators
+# ----------------------------------------------------------------------
+
+def transaction_rows(view, start_date: Optional[np.datetime64] = None, end_date: Optional[np.datetime64] = None,
+                     account: str = '', merchant: str = '', dedupe: bool = True) -> Iterator[Row]:
+    """Transactions of a ledger view in load order, filtered on the columns before any row is built."""
+    store = view.store
+    dates = store.dates
+    keep = view.unique_mask().copy() if dedupe else np.ones(len(store), dtype=bool)
+    if start_date is not None or end_date is not None:
+        keep &= ~np.isnat(dates)
+        if start_date is not None:
+            keep &= dates >= start_date
+        if end_date is not None:
+            keep &= dates <= end_date
+    if account:
+        code = store.account_pool.lookup(account)
+        if code is None:
+            return
+        keep &= store.account_codes == code
+    if merchant:
+        needle = merchant.lower()
+        codes = [i for i, text in enumerate(store.description_pool.values()) if needle in text.lower()]
+        keep &= np.isin(store.description_codes, codes)
+    positions = np.flatnonzero(keep)
+
+    # Decode through the string pools one chunk at a time
+    date_text = np.array(store.date_pool.values(), dtype=object)
+    descriptions = np.array(store.description_pool.values(), dtype=object)
+    accounts = np.array(store.account_pool.values(), dtype=object)
+    text = np.array(store.text_pool.values(), dtype=object)
+    metadata = [s.get('metadata') or {} for s in store.statements] or [{}]
+    holders = np.array([m.get('account_holder') or '' for m in metadata], dtype=object)
+    banks = np.array([m.get('bank_name') or '' for m in metadata], dtype=object)
+    for offset in range(0, len(positions), TRANSACTION_CHUNK):
+        rows = positions[offset:offset + TRANSACTION_CHUNK]
+        slots = store.slots[rows]
+        statements = store.slot_statement[slots]
+        yield from zip(
+            date_text[store.date_codes[rows]].tolist(),
+            holders[statements].tolist(),
+            banks[statements].tolist(),
+            accounts[store.slot_account[slots]].tolist(),
+            descriptions[store.description_codes[rows]].tolist(),
+            store.deposits[rows].tolist(),
+            store.withdrawals[rows].tolist(),
+            store.running_balances[rows].tolist(),
+            text[store.check_codes[rows]].tolist(),
+            text[store.category_codes[rows]].tolist(),
+        )
+
+
+def receipt_rows(documents: Iterable[Tuple[str, List[Dict[str, Any]]]],
+                 start_date: Optional[np.datetime64] = None, end_date: Optional[np.datetime64] = None,
+                 merchant: str = '') -> Iterator[Row]:
+    """One row per receipt item (or per receipt without items); ids match parquet_store's ``receipt_id``."""
+    needle = merchant.lower()
+    for doc_id, records in documents:
+        for i, receipt in enumerate(records):
+            if needle and needle not in str(receipt.get('merchant_name') or '').lower():
+                continue
+            if not _in_range(receipt.get('transaction_date'), start_date, end_date):
+                continue
+            head = [f'{doc_id}#{i}', receipt.get('merchant_name'), receipt.get('transaction_date'),
+                    _amount(receipt.get('subtotal')), _amount(receipt.get('tax')), _amount(receipt.get('tip')),
+                    _amount(receipt.get('total'))]
+            items = receipt.get('items') or [{}]
+            for item in items:
+                yield head + [item.get('description'), _amount(item.get('quantity')), _amount(item.get('price')),
+                              _amount(item.get('total_price'))]
+
+
+def invoice_rows(documents: Iterable[Tuple[str, List[Dict[str, Any]]]],
+                 start_date: Optional[np.datetime64] = None, end_date: Optional[np.datetime64] = None,
+                 merchant: str = '') -> Iterator[Row]:
+    """One row per invoice line item (or per invoice without items); ``merchant`` matches the vendor.
+
+    ``invoice_key`` matches parquet_store's key; ``invoice_id`` is the extracted invoice number.
+    """
+    needle = merchant.lower()
+    for doc_id, records in documents:
+        for i, invoice in enumerate(records):
+            if needle and needle not in str(invoice.get('vendor_name') or '').lower():
+                continue
+            if not _in_range(invoice.get('invoice_date'), start_date, end_date):
+                continue
+            head = [f'{doc_id}#{i}', invoice.get('invoice_id'), invoice.get('vendor_name'),
+                    invoice.get('customer_name'), invoice.get('invoice_date'), invoice.get('due_date'),
+                    _amount(invoice.get('subtotal')), _amount(invoice.get('total_tax')),
+                    _amount(invoice.get('invoice_total'))]
+            items = invoice.get('items') or [{}]
+            for item in items:
+                yield head + [item.get('description'), _amount(item.get('quantity')),
+                              _amount(item.get('unit_price')), _amount(item.get('amount'))]
+
+
+# ----------------------------------------------------------------------
+# Encoders
+# ----------------------------------------------------------------------
+
+def _safe_row(row: Row) -> List[Any]:
+    """``row`` with formula-like text cells prefixed by ``'`` so they open as plain text."""
+    return ["'" + value if isinstance(value, str) and value.startswith(FORMULA_PREFIXES) else value
+            for value in row]
+
+
+def csv_chunks(columns: Sequence[str], rows: Iterable[Row], chunk_bytes: int = CHUNK_BYTES) -> Iterator[bytes]:
+    """UTF-8 CSV of ``rows`` in chunks of about ``chunk_bytes``; only one chunk is held at a time."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for row in rows:
+        writer.writerow(_safe_row(row))
+        if buffer.tell() >= chunk_bytes:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+
+
+def xlsx_chunks(sheet: str, columns: Sequence[str], rows: Iterable[Row],
+                chunk_bytes: int = CHUNK_BYTES) -> Iterator[bytes]:
+    """XLSX workbook of ``rows`` built with constant memory in a temporary file, then read out in chunks."""
+    from openpyxl import Workbook
+
+    with tempfile.TemporaryFile() as f:
+        workbook = Workbook(write_only=True)
+        sheets = 1
+        worksheet = workbook.create_sheet(sheet)
+        worksheet.append(list(columns))
+        filled = 1
+        for row in rows:
+            if filled == XLSX_MAX_ROWS:
+                sheets += 1
+                worksheet = workbook.create_sheet(f'{sheet} ({sheets})')
+                worksheet.append(list(columns))
+                filled = 1
+            worksheet.append(_safe_row(row))
+            filled += 1
+        workbook.save(f)
+        f.seek(0)
+        while True:
+            chunk = f.read(chunk_bytes)
+            if not chunk:
+                break
+            yield chunk
+
+
+def encode(fmt: str, dataset: str, columns: Sequence[str], rows: Iterable[Row]) -> Iterator[bytes]:
+    if fmt == 'xlsx':
+        return xlsx_chunks(dataset, columns, rows)
+    return csv_chunks(columns, rows)
@@ -0,0 +1,149 @@
+"""Conditional GET and compressed, per-version cached responses for the dashboard APIs.
+
+Each API response gets an ETag derived from the version of the data it reads
+and from the request's path and query parameters. The data version is a
+hash of the names, sizes and mtimes of the source files, so checking it
+needs only a directory listing. A matching ``If-None-Match`` is answered
+with 304 before the view runs; otherwise the rendered body is compressed
+with the best encoding the client accepts (brotli when installed, else gzip)
+and cached for that ETag, so repeated polls of unchanged data cost neither
+loading, rendering nor compression.
+"""
+import gzip
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from functools import wraps
+from typing import Iterable, Optional, Tuple
+
+from flask import Response, request
+
+from perf import stage
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+MIN_COMPRESS_BYTES = 500
+
+
+def source_signature(path: str, suffix: str) -> tuple:
+    """Names, sizes and mtimes of files in ``path`` ending with ``suffix`` (or of the file ``path``)."""
+    if os.path.isfile(path):
+        st = os.stat(path)
+        return ((os.path.basename(path), st.st_size, st.st_mtime_ns),)
+    if not os.path.isdir(path):
+        return ()
+    entries = []
+    for e in os.scandir(path):
+        if e.name.endswith(suffix):
+            st = e.stat()
+            entries.append((e.name, st.st_size, st.st_mtime_ns))
+    return tuple(sorted(entries))
+
+
+def data_version(sources: Iterable[Tuple[str, str]]) -> str:
+    digest = hashlib.sha1()
+    for path, suffix in sources:
+        digest.update(repr((path, suffix, source_signature(path, suffix))).encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+class BodyCache:
+    """Byte-bounded LRU of rendered (and compressed) bodies keyed by (etag, encoding)."""
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries: 'OrderedDict[tuple, Tuple[bytes, str, str]]' = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key) -> Optional[Tuple[bytes, str, str]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, body: bytes, mimetype: str, encoding: str):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old[0])
+            self._entries[key] = (body, mimetype, encoding)
+            self._size += len(body)
+            while self._size > self.max_bytes:
+                _, (evicted, _, _) = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+
+BODY_CACHE = BodyCache()
+
+
+def _negotiate_encoding() -> str:
+    accepted = request.accept_encodings
+    if brotli is not None and accepted.quality('br') > 0:
+        return 'br'
+    if accepted.quality('gzip') > 0:
+        return 'gzip'
+    return 'identity'
+
+
+def _compress(body: bytes, encoding: str) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(body, quality=5)
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=6)
+    return body
+
+
+def _etag(version: str) -> str:
+    params = '&'.join(f'{k}={v}' for k, v in sorted(request.args.items(multi=True)))
+    return hashlib.sha1(f'{request.path}?{params}|{version}'.encode('utf-8')).hexdigest()[:24]
+
+
+def conditional(*sources: Tuple[str, str], version_fn=None):
+    """Decorate a Flask JSON view with ETag/304 handling and cached compressed bodies.
+
+    ``sources`` are ``(directory, filename suffix)`` pairs the view reads; any
+    change to them changes the ETag. ``version_fn`` may supply the data
+    version directly instead; when it returns None the sources are used.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            with stage('etag'):
+                version = version_fn() if version_fn is not None else None
+                if version is None:
+                    version = data_version(sources)
+                etag = _etag(version)
+            headers = {'ETag': f'"{etag}"', 'Cache-Control': 'no-cache', 'Vary': 'Accept-Encoding'}
+            if request.if_none_match.contains(etag):
+                return Response(status=304, headers=headers)
+
+            negotiated = _negotiate_encoding()
+            cached = BODY_CACHE.get((etag, negotiated))
+            if cached is None:
+                response = view(*args, **kwargs)
+                if not isinstance(response, Response) or response.status_code != 200:
+                    return response
+                body = response.get_data()
+                encoding = negotiated if len(body) >= MIN_COMPRESS_BYTES else 'identity'
+                with stage('compress'):
+                    cached = (_compress(body, encoding), response.mimetype, encoding)
+                BODY_CACHE.put((etag, negotiated), *cached)
+            body, mimetype, encoding = cached
+            if encoding != 'identity':
+                headers['Content-Encoding'] = encoding
+            return Response(body, mimetype=mimetype, headers=headers)
+        return wrapper
+    return decorator
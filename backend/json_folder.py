@@ -0,0 +1,213 @@
+"""Parallel loading and per-file caching of analyzer JSON outputs.
+
+``load_many`` reads a list of files with a thread pool (file I/O releases the
+GIL) and, in single-threaded callers, hands large files, whose parsing is
+CPU-bound, to a process pool. It parses with ``orjson`` when installed
+(several times faster than the stdlib ``json``) and returns results in the
+order the paths were given.
+
+``JsonFolder`` remembers each ``*<suffix>`` file's mtime and size together
+with its parsed records, and how far it has read each NDJSON segment (see
+``segments.py``), so a refresh only parses new or changed files and the
+lines appended to segments since the last refresh.
+"""
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from segments import SEGMENT_PREFIXES, SEGMENT_SUFFIX, parse_json, read_segment
+
+# Files at least this large are parsed in worker processes
+LARGE_FILE_BYTES = 4 * 1024 * 1024
+IO_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+
+
+def read_records(path: str) -> List[Dict[str, Any]]:
+    """Records in one analyzer output file (a list of records or a single record)."""
+    with open(path, 'rb') as f:
+        payload = parse_json(f.read())
+    if isinstance(payload, list):
+        return payload
+    if isinstance(payload, dict):
+        return [payload]
+    return []
+
+
+def _read_chunk(paths: Sequence[str]) -> List[Tuple[bool, Any]]:
+    out = []
+    for path in paths:
+        try:
+            out.append((True, read_records(path)))
+        except Exception as e:
+            out.append((False, e))
+    return out
+
+
+def _read_all(paths: Sequence[str], positions: Sequence[int], pool, chunk_size: int,
+              results: List, errors: Dict[int, Exception]):
+    if pool is None:
+        outcomes = [(positions, _read_chunk([paths[i] for i in positions]))]
+    else:
+        # Files are submitted in chunks so per-task overhead stays small next to the reads
+        chunks = [positions[k:k + chunk_size] for k in range(0, len(positions), chunk_size)]
+        futures = [(chunk, pool.submit(_read_chunk, [paths[i] for i in chunk])) for chunk in chunks]
+        outcomes = ((chunk, future.result()) for chunk, future in futures)
+    for chunk, outcome in outcomes:
+        for i, (ok, value) in zip(chunk, outcome):
+            if ok:
+                results[i] = value
+            else:
+                errors[i] = value
+
+
+def load_many(paths: Sequence[str], label: str = 'file', workers: Optional[int] = None,
+              large_file_bytes: int = LARGE_FILE_BYTES) -> List[Optional[List[Dict[str, Any]]]]:
+    """Records of each file in ``paths``, in the same order; None for files that failed.
+
+    Failures are printed (in path order) as ``Error reading <label> <name>: <error>``.
+    """
+    results: List[Optional[List[Dict[str, Any]]]] = [None] * len(paths)
+    errors: Dict[int, Exception] = {}
+    if not paths:
+        return results
+
+    large, small = [], []
+    cpus = os.cpu_count() or 1
+    for i, path in enumerate(paths):
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            size = 0
+        (large if size >= large_file_bytes else small).append(i)
+    if len(large) < 2 or cpus < 2 or threading.active_count() > 1:
+        # Worker processes only pay off for several large files on several cores. They are
+        # forked only from single-threaded callers (CLIs, benches): forking a server that runs
+        # threads (watcher, requests) can copy a lock another thread holds and hang the child
+        small, large = sorted(small + large), []
+
+    if large:
+        try:
+            with ProcessPoolExecutor(max_workers=min(len(large), cpus)) as procs:
+                _read_all(paths, large, procs, 1, results, errors)
+        except Exception as e:
+            # e.g. no multiprocessing support here: parse them on threads instead
+            print(f"Parsing large files in-process: {e}")
+            small = sorted(small + large)
+    if small:
+        workers = min(workers or IO_WORKERS, len(small))
+        chunk_size = max(1, min(64, len(small) // workers))
+        if workers == 1:
+            _read_all(paths, small, None, len(small), results, errors)
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as threads:
+                _read_all(paths, small, threads, chunk_size, results, errors)
+
+    for i in sorted(errors):
+        print(f"Error reading {label} {os.path.basename(paths[i])}: {errors[i]}")
+    return results
+
+
+class JsonFolder:
+    """Incrementally refreshed records of ``directory/*suffix`` plus its NDJSON segments.
+
+    Legacy files are keyed by their name without ``suffix``; segment documents
+    by their id, and a segment document replaces a legacy file or earlier
+    document with the same id. After ``refresh()``, ``appended`` lists the new
+    records when the change only added documents, or is None when existing
+    records changed or disappeared (callers with derived state rebuild then).
+    """
+
+    def __init__(self, directory: str, suffix: str, label: str = 'file'):
+        self.directory = directory
+        self.suffix = suffix
+        self.label = label
+        self.prefix = SEGMENT_PREFIXES.get(suffix)
+        self.generation = 0
+        self.appended: Optional[List[Dict[str, Any]]] = None
+        self._lock = threading.Lock()
+        self._clear()
+
+    def _clear(self):
+        self._files: Dict[str, Tuple[int, int]] = {}
+        self._segments: Dict[str, Tuple[int, int]] = {}  # name -> (inode, bytes read)
+        self._docs: Dict[str, List[Dict[str, Any]]] = {}
+        self._records: List[Dict[str, Any]] = []
+
+    def _scan(self) -> Tuple[Dict[str, Tuple[int, int]], Dict[str, Tuple[int, int]]]:
+        files, segments = {}, {}
+        if not os.path.exists(self.directory):
+            return files, segments
+        segment_start = f'{self.prefix}-' if self.prefix else None
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(self.suffix):
+                st = entry.stat()
+                files[entry.name] = (st.st_mtime_ns, st.st_size)
+            elif segment_start and entry.name.startswith(segment_start) and entry.name.endswith(SEGMENT_SUFFIX):
+                st = entry.stat()
+                segments[entry.name] = (st.st_ino, st.st_size)
+        return files, segments
+
+    def signature(self) -> Dict[str, List[int]]:
+        """Stat signature of the folder's files and segments (nothing is parsed), for staleness checks."""
+        files, segments = self._scan()
+        return {name: list(sig) for name, sig in {**files, **segments}.items()}
+
+    def _add(self, doc_id: str, records: List[Dict[str, Any]]):
+        if doc_id in self._docs:
+            self.appended = None
+        elif self.appended is not None:
+            self.appended.extend(records)
+        self._docs[doc_id] = records
+
+    def refresh(self) -> bool:
+        """Parse new or changed files and segment tails, forget removed files; True if anything changed."""
+        with self._lock:
+            files, segments = self._scan()
+            rebuild = (
+                any(files.get(name) != sig for name, sig in self._files.items())
+                or any(name not in segments or segments[name][0] != ino or segments[name][1] < read
+                       for name, (ino, read) in self._segments.items())
+            )
+            if rebuild:
+                self._clear()
+            new_files = sorted(set(files) - set(self._files))
+            grown = sorted(name for name, (ino, size) in segments.items()
+                           if name not in self._segments or size > self._segments[name][1])
+            if not rebuild and not new_files and not grown:
+                self.appended = []
+                return False
+
+            self.appended = None if rebuild else []
+            added = len(new_files)
+            loaded = load_many([os.path.join(self.directory, name) for name in new_files], label=self.label)
+            for name, records in zip(new_files, loaded):
+                self._files[name] = files[name]
+                self._add(name[:-len(self.suffix)], records or [])
+            for name in grown:
+                start = self._segments.get(name, (0, 0))[1]
+                try:
+                    documents, end = read_segment(os.path.join(self.directory, name), start)
+                except Exception as e:
+                    print(f"Error reading {self.label} {name}: {e}")
+                    continue
+                self._segments[name] = (segments[name][0], end)
+                for doc_id, records in documents:
+                    self._add(doc_id, records)
+                added += len(documents)
+            if not rebuild and not added:
+                return False  # only a partially written line so far
+            self._records = [r for records in self._docs.values() for r in records]
+            self.generation += 1
+            return True
+
+    def records(self, refresh: bool = True) -> List[Dict[str, Any]]:
+        if refresh:
+            self.refresh()
+        return self._records
+
+    def documents(self, refresh: bool = True) -> List[Tuple[str, List[Dict[str, Any]]]]:
+        """``(document id, records)`` pairs in the same order as ``records()``."""
+        if refresh:
+            self.refresh()
+        return list(self._docs.items())
@@ -0,0 +1,86 @@
+"""In-process ledger kept up to date incrementally from ``output/bank_statements``.
+
+Instead of re-reading every ``*_bank_statement.json`` on each request, the
+ledger remembers which files (and how much of each NDJSON segment) it has
+ingested and only parses new ones, appending them to a ``TransactionStore``
+and updating the derived indexes. A changed or deleted file, or a statement
+re-analyzed under the same id, triggers a rebuild from the cached records.
+"""
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from dedupe import DedupeIndex
+from json_folder import JsonFolder
+from ledger_store import TransactionStore
+from rollups import Rollups, RollupTable
+
+
+class LedgerView:
+    """Consistent, read-only view of the ledger handed to request handlers."""
+
+    def __init__(self, store: TransactionStore, duplicates: np.ndarray, rollups: RollupTable):
+        self.store = store
+        self.duplicates = duplicates
+        self.rollups = rollups
+
+    def unique_mask(self) -> np.ndarray:
+        return ~self.duplicates
+
+
+def build_view(store: TransactionStore) -> LedgerView:
+    """Compute derived indexes for a complete store (e.g. a memory-mapped snapshot)."""
+    duplicates = DedupeIndex(store).update()
+    return LedgerView(store, duplicates, Rollups(store).update(duplicates))
+
+
+class Ledger:
+    """Bank statement ledger with incrementally maintained derived indexes."""
+
+    def __init__(self, json_dir: str = 'output/bank_statements',
+                 fallback_loader: Optional[Callable[[], List[Dict[str, Any]]]] = None):
+        self.json_dir = json_dir
+        self.fallback_loader = fallback_loader
+        self.folder = JsonFolder(json_dir, '_bank_statement.json')
+        self._lock = threading.Lock()
+        self.view: Optional[LedgerView] = None
+        self._reset()
+
+    def _reset(self):
+        self.store = TransactionStore()
+        self.dedupe = DedupeIndex(self.store)
+        self.rollups = Rollups(self.store)
+        self._from_fallback = False
+
+    def _ingest(self, statements: List[Dict[str, Any]]):
+        for statement in statements:
+            self.store.append_statement(statement)
+
+    def refresh(self) -> Optional[LedgerView]:
+        """Ingest new statement files and segment lines and return a view, or None when there is no data.
+
+        The view is also kept as ``self.view`` for callers that do not need to rescan.
+        """
+        with self._lock:
+            changed = self.folder.refresh()
+            statements = self.folder.records(refresh=False)
+            if not statements:
+                # No structured JSON: rebuild from the CSV fallback every time
+                self._reset()
+                if self.fallback_loader is not None:
+                    self._ingest(self.fallback_loader() or [])
+                self._from_fallback = True
+            elif self._from_fallback or (changed and self.folder.appended is None):
+                # Existing statements changed or disappeared: rebuild from the cached records
+                self._reset()
+                self._ingest(statements)
+            elif changed:
+                self._ingest(self.folder.appended)
+
+            if not self.store.statements:
+                self.view = None
+                return None
+            duplicates = self.dedupe.update()
+            self.view = LedgerView(self.store.view(), duplicates, self.rollups.update(duplicates))
+            return self.view
@@ -0,0 +1,382 @@
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+if TYPE_CHECKING:  # pandas is imported where first needed, not at import time
+    import pandas as pd
+
+
+class StringPool:
+    """Dictionary encoder: each distinct string is stored once and referenced by an int code."""
+
+    def __init__(self, values: Optional[Iterable[str]] = None):
+        self._values: List[str] = []
+        self._codes: Dict[str, int] = {}
+        for value in values or ():
+            self.encode(value)
+
+    def encode(self, value: Any) -> int:
+        value = '' if value is None else str(value)
+        code = self._codes.get(value)
+        if code is None:
+            code = len(self._values)
+            self._codes[value] = code
+            self._values.append(value)
+        return code
+
+    def lookup(self, value: str) -> Optional[int]:
+        """Code of ``value`` if present, without adding it."""
+        return self._codes.get(value)
+
+    def __getitem__(self, code: int) -> str:
+        return self._values[code]
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def values(self) -> List[str]:
+        return self._values
+
+
+class TransactionRow:
+    """Read-only view of one transaction; fields are decoded on access."""
+
+    __slots__ = ('_store', '_index')
+
+    def __init__(self, store: 'TransactionStore', index: int):
+        self._store = store
+        self._index = index
+
+    @property
+    def date(self) -> str:
+        return self._store.date_pool[self._store.date_codes[self._index]]
+
+    @property
+    def account_number(self) -> str:
+        slot = self._store.slots[self._index]
+        return self._store.account_pool[self._store.slot_account[slot]]
+
+    @property
+    def description(self) -> str:
+        return self._store.description_pool[self._store.description_codes[self._index]]
+
+    @property
+    def deposit(self) -> float:
+        return float(self._store.deposits[self._index])
+
+    @property
+    def withdrawal(self) -> float:
+        return float(self._store.withdrawals[self._index])
+
+    @property
+    def running_balance(self) -> float:
+        return float(self._store.running_balances[self._index])
+
+    @property
+    def check_number(self) -> str:
+        return self._store.text_pool[self._store.check_codes[self._index]]
+
+    @property
+    def category(self) -> str:
+        return self._store.text_pool[self._store.category_codes[self._index]]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Same shape as a transaction in ``*_bank_statement.json``."""
+        return {
+            'date': self.date,
+            'description': self.description,
+            'deposit': self.deposit,
+            'withdrawal': self.withdrawal,
+            'running_balance': self.running_balance,
+            'check_number': self.check_number,
+            'category': self.category,
+        }
+
+
+class TransactionStore:
+    """Columnar in-memory store for bank statement transactions.
+
+    Transactions live in parallel NumPy arrays (about 44 bytes per row) instead
+    of one dict per row. Dates, descriptions, account numbers, check numbers and
+    categories are dictionary-encoded; each transaction points at a "slot", i.e.
+    one account within one statement, which carries the account number and the
+    statement's beginning/ending balances. Rows of a slot are stored contiguously
+    in statement order.
+    """
+
+    _INITIAL_CAPACITY = 1024
+
+    def __init__(self):
+        self.statements: List[Dict[str, Any]] = []
+        self.date_pool = StringPool()
+        self.description_pool = StringPool()
+        self.account_pool = StringPool()
+        self.text_pool = StringPool([''])
+
+        # Per-slot (statement account) columns
+        self.slot_statement = np.empty(0, dtype=np.int32)
+        self.slot_account = np.empty(0, dtype=np.int32)
+        self.slot_account_type = np.empty(0, dtype=np.int32)
+        self.slot_beginning = np.empty(0, dtype=np.float64)
+        self.slot_ending = np.empty(0, dtype=np.float64)
+
+        # Per-transaction columns (over-allocated; only the first ``_size`` rows are valid)
+        self._size = 0
+        self._capacity = 0
+        self._date_codes = np.empty(0, dtype=np.int32)
+        self._description_codes = np.empty(0, dtype=np.int32)
+        self._check_codes = np.empty(0, dtype=np.int32)
+        self._category_codes = np.empty(0, dtype=np.int32)
+        self._slots = np.empty(0, dtype=np.int32)
+        self._deposits = np.empty(0, dtype=np.float64)
+        self._withdrawals = np.empty(0, dtype=np.float64)
+        self._running_balances = np.empty(0, dtype=np.float64)
+
+        self._date_values: Optional[np.ndarray] = None
+
+    @classmethod
+    def from_columns(cls, statements: List[Dict[str, Any]], pools: Dict[str, Any],
+                     slot_columns: Dict[str, np.ndarray], columns: Dict[str, np.ndarray]) -> 'TransactionStore':
+        """Wrap existing column arrays (e.g. memory-mapped snapshot files) without copying."""
+        store = cls.__new__(cls)
+        store.statements = statements
+        store.date_pool = pools['date']
+        store.description_pool = pools['description']
+        store.account_pool = pools['account']
+        store.text_pool = pools['text']
+        for name, array in slot_columns.items():
+            setattr(store, f'slot_{name}', array)
+        for name, array in columns.items():
+            setattr(store, f'_{name}', array)
+        store._size = store._capacity = len(store._slots)
+        store._date_values = None
+        return store
+
+    @classmethod
+    def from_statements(cls, statements: Iterable[Dict[str, Any]]) -> 'TransactionStore':
+        store = cls()
+        for statement in statements:
+            store.append_statement(statement)
+        return store
+
+    def view(self) -> 'TransactionStore':
+        """Consistent read-only view of the rows appended so far.
+
+        Later appends either write past the view's rows or reallocate the
+        arrays, so the view is unaffected; pools only ever grow, so its codes
+        stay valid.
+        """
+        view = TransactionStore.from_columns(
+            list(self.statements),
+            {'date': self.date_pool, 'description': self.description_pool,
+             'account': self.account_pool, 'text': self.text_pool},
+            self.slot_columns(), self.columns(),
+        )
+        view._date_values = self._date_values
+        return view
+
+    # ------------------------------------------------------------------
+    # Ingest
+    # ------------------------------------------------------------------
+    def _reserve(self, extra: int):
+        needed = self._size + extra
+        if needed <= self._capacity:
+            return
+        capacity = max(self._INITIAL_CAPACITY, self._capacity + self._capacity // 2, needed)
+        for name in ('_date_codes', '_description_codes', '_check_codes', '_category_codes',
+                     '_slots', '_deposits', '_withdrawals', '_running_balances'):
+            old = getattr(self, name)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[:self._size] = old[:self._size]
+            setattr(self, name, new)
+        self._capacity = capacity
+
+    def append_statement(self, statement: Dict[str, Any]) -> int:
+        """Append one statement dict (analyzer JSON shape); returns its statement index."""
+        statement_idx = len(self.statements)
+        self.statements.append({'metadata': statement.get('metadata', {})})
+
+        accounts = statement.get('accounts', []) or []
+        slot_base = len(self.slot_account)
+        slot_account = np.empty(len(accounts), dtype=np.int32)
+        slot_account_type = np.empty(len(accounts), dtype=np.int32)
+        slot_beginning = np.empty(len(accounts), dtype=np.float64)
+        slot_ending = np.empty(len(accounts), dtype=np.float64)
+
+        for i, account in enumerate(accounts):
+            slot_account[i] = self.account_pool.encode(account.get('account_number'))
+            slot_account_type[i] = self.text_pool.encode(account.get('account_type'))
+            slot_beginning[i] = account.get('beginning_balance') or 0.0
+            slot_ending[i] = account.get('ending_balance') or 0.0
+
+            transactions = account.get('transactions', []) or []
+            n = len(transactions)
+            self._reserve(n)
+            start, end = self._size, self._size + n
+            self._slots[start:end] = slot_base + i
+            date_codes = self._date_codes
+            description_codes = self._description_codes
+            check_codes = self._check_codes
+            category_codes = self._category_codes
+            deposits = self._deposits
+            withdrawals = self._withdrawals
+            running_balances = self._running_balances
+            for row, tx in enumerate(transactions, start):
+                date_codes[row] = self.date_pool.encode(tx.get('date'))
+                description_codes[row] = self.description_pool.encode(tx.get('description'))
+                check_codes[row] = self.text_pool.encode(tx.get('check_number'))
+                category_codes[row] = self.text_pool.encode(tx.get('category'))
+                deposits[row] = tx.get('deposit') or 0.0
+                withdrawals[row] = tx.get('withdrawal') or 0.0
+                running_balances[row] = tx.get('running_balance') or 0.0
+            self._size = end
+
+        self.slot_statement = np.concatenate([self.slot_statement, np.full(len(accounts), statement_idx, dtype=np.int32)])
+        self.slot_account = np.concatenate([self.slot_account, slot_account])
+        self.slot_account_type = np.concatenate([self.slot_account_type, slot_account_type])
+        self.slot_beginning = np.concatenate([self.slot_beginning, slot_beginning])
+        self.slot_ending = np.concatenate([self.slot_ending, slot_ending])
+        self._date_values = None
+        return statement_idx
+
+    # ------------------------------------------------------------------
+    # Column access
+    # ------------------------------------------------------------------
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def date_codes(self) -> np.ndarray:
+        return self._date_codes[:self._size]
+
+    @property
+    def description_codes(self) -> np.ndarray:
+        return self._description_codes[:self._size]
+
+    @property
+    def check_codes(self) -> np.ndarray:
+        return self._check_codes[:self._size]
+
+    @property
+    def category_codes(self) -> np.ndarray:
+        return self._category_codes[:self._size]
+
+    @property
+    def slots(self) -> np.ndarray:
+        return self._slots[:self._size]
+
+    @property
+    def deposits(self) -> np.ndarray:
+        return self._deposits[:self._size]
+
+    @property
+    def withdrawals(self) -> np.ndarray:
+        return self._withdrawals[:self._size]
+
+    @property
+    def running_balances(self) -> np.ndarray:
+        return self._running_balances[:self._size]
+
+    @property
+    def account_codes(self) -> np.ndarray:
+        """Account-number code per transaction (index into ``account_pool``)."""
+        return self.slot_account[self.slots]
+
+    def date_values(self) -> np.ndarray:
+        """Parsed date of every distinct date string (NaT when unparseable), indexed by date code."""
+        if self._date_values is None or len(self._date_values) != len(self.date_pool):
+            import pandas as pd
+            parsed = pd.to_datetime(pd.Series(self.date_pool.values(), dtype=object), errors='coerce')
+            self._date_values = parsed.to_numpy(dtype='datetime64[ns]').astype('datetime64[D]')
+        return self._date_values
+
+    @property
+    def dates(self) -> np.ndarray:
+        """Parsed transaction dates as ``datetime64[D]``; each distinct string is parsed once."""
+        return self.date_values()[self.date_codes]
+
+    # ------------------------------------------------------------------
+    # Row views and export
+    # ------------------------------------------------------------------
+    def row(self, index: int) -> TransactionRow:
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError('transaction index out of range')
+        return TransactionRow(self, index)
+
+    def __getitem__(self, index: int) -> TransactionRow:
+        return self.row(index)
+
+    def __iter__(self) -> Iterator[TransactionRow]:
+        for i in range(self._size):
+            yield TransactionRow(self, i)
+
+    def slot_bounds(self) -> np.ndarray:
+        """Start offset of every slot's rows, plus a final end offset (length ``n_slots + 1``)."""
+        counts = np.bincount(self.slots, minlength=len(self.slot_account))
+        bounds = np.zeros(len(counts) + 1, dtype=np.int64)
+        np.cumsum(counts, out=bounds[1:])
+        return bounds
+
+    def to_frame(self, mask: Optional[np.ndarray] = None) -> 'pd.DataFrame':
+        """DataFrame of the dashboard columns, built straight from the arrays.
+
+        Rows with unparseable dates are dropped, matching the previous
+        ``pd.to_datetime(..., errors='coerce')`` + ``dropna`` behaviour.
+        """
+        import pandas as pd
+        dates = self.dates
+        keep = ~np.isnat(dates)
+        if mask is not None:
+            keep &= mask
+        account = pd.Categorical.from_codes(self.account_codes[keep], categories=pd.Index(self.account_pool.values(), dtype=object))
+        description = pd.Categorical.from_codes(self.description_codes[keep], categories=pd.Index(self.description_pool.values(), dtype=object))
+        return pd.DataFrame({
+            'date': dates[keep].astype('datetime64[ns]'),
+            'account_number': account,
+            'description': description,
+            'deposit': self.deposits[keep],
+            'withdrawal': self.withdrawals[keep],
+            'running_balance': self.running_balances[keep],
+        })
+
+    def to_statements(self) -> List[Dict[str, Any]]:
+        """Rebuild the nested statement/account/transaction dicts (analyzer JSON shape)."""
+        out = [{'metadata': s['metadata'], 'accounts': []} for s in self.statements]
+        bounds = self.slot_bounds()
+        for slot in range(len(self.slot_account)):
+            out[self.slot_statement[slot]]['accounts'].append({
+                'account_number': self.account_pool[self.slot_account[slot]],
+                'account_type': self.text_pool[self.slot_account_type[slot]],
+                'beginning_balance': float(self.slot_beginning[slot]),
+                'ending_balance': float(self.slot_ending[slot]),
+                'transactions': [TransactionRow(self, i).to_dict() for i in range(bounds[slot], bounds[slot + 1])],
+            })
+        return out
+
+    def slot_columns(self) -> Dict[str, np.ndarray]:
+        return {
+            'statement': self.slot_statement,
+            'account': self.slot_account,
+            'account_type': self.slot_account_type,
+            'beginning': self.slot_beginning,
+            'ending': self.slot_ending,
+        }
+
+    def columns(self) -> Dict[str, np.ndarray]:
+        return {
+            'date_codes': self.date_codes,
+            'description_codes': self.description_codes,
+            'check_codes': self.check_codes,
+            'category_codes': self.category_codes,
+            'slots': self.slots,
+            'deposits': self.deposits,
+            'withdrawals': self.withdrawals,
+            'running_balances': self.running_balances,
+        }
+
+    def nbytes(self) -> int:
+        """Approximate resident size of the array columns (excluding string pools)."""
+        arrays = list(self.columns().values()) + list(self.slot_columns().values())
+        return int(sum(a.nbytes for a in arrays))
@@ -0,0 +1,290 @@
+"""Load-test driver: ramps concurrent clients and reports throughput and latency percentiles.
+
+Targets:
+
+- ``fastapi``: the ``/upload`` -> ``/extract/<file_id>`` flow of ``main.py``;
+- ``flask``: GET requests round-robin over dashboard routes (``--paths``);
+- ``analyze``: the Document Intelligence analyze/poll protocol itself, against
+  ``mock_doc_intel.py`` or a real endpoint (``AZURE_DOC_KEY`` is sent);
+- ``batch``: ``DocumentBatchProcessor`` over ``--input-dir`` with
+  ``concurrency`` = clients. It needs the Azure SDK, and ``AZURE_DOC_ENDPOINT``
+  should point at the mock.
+
+Each ramp step runs its clients for ``--duration`` seconds::
+
+    uvicorn backend.main:app --port 8000 &
+    python load_test.py fastapi --url http://127.0.0.1:8000 --clients 1,4,16 --duration 10
+
+    python mock_doc_intel.py --latency lognormal:1.5:0.4 --capacity 15 &
+    python load_test.py analyze --url http://127.0.0.1:8765 --model prebuilt-receipt --clients 5,20,50
+"""
+import argparse
+import base64
+import http.client
+import json
+import os
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from batch_telemetry import percentile
+
+DEFAULT_FLASK_PATHS = ['/api/bank-statements/summary', '/api/receipts', '/api/invoices', '/api/matches']
+API_VERSION = '2024-11-30'
+DEFAULT_OUTPUT_DIR = 'output/load_test'  # batch target output, kept apart from the real output
+
+
+def sample_pdf(pages: int = 1) -> bytes:
+    """Minimal PDF-like payload with ``pages`` page objects (enough for page counting)."""
+    body = b''.join(b'%d 0 obj << /Type /Page >> endobj\n' % (n + 1) for n in range(pages))
+    return b'%PDF-1.4\n' + body + b'%%EOF\n'
+
+
+class Client:
+    """One keep-alive HTTP connection per load-test client."""
+
+    def __init__(self, base_url: str, timeout: float = 60.0):
+        url = urlparse(base_url)
+        self.host = url.hostname
+        self.port = url.port or (443 if url.scheme == 'https' else 80)
+        self.https = url.scheme == 'https'
+        self.prefix = url.path.rstrip('/')
+        self.timeout = timeout
+        self._conn = None
+
+    def request(self, method: str, path: str, body: bytes = None,
+                headers: Optional[Dict[str, str]] = None) -> Tuple[int, Dict[str, str], bytes]:
+        for attempt in (1, 2):
+            if self._conn is None:
+                cls = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+                self._conn = cls(self.host, self.port, timeout=self.timeout)
+            try:
+                self._conn.request(method, self.prefix + path, body=body, headers=headers or {})
+                response = self._conn.getresponse()
+                data = response.read()
+                return response.status, {k.lower(): v for k, v in response.getheaders()}, data
+            except (http.client.HTTPException, ConnectionError):
+                # Server closed the kept-alive connection: reconnect once
+                self._conn.close()
+                self._conn = None
+                if attempt == 2:
+                    raise
+
+
+class Step:
+    """Latencies and errors of one ramp step."""
+
+    def __init__(self, clients: int):
+        self.clients = clients
+        self.latencies: List[float] = []
+        self.errors: Dict[str, int] = {}
+        self.calls: Dict[str, List[float]] = {}
+        self.elapsed = 0.0
+        self._lock = threading.Lock()
+
+    def ok(self, seconds: float, calls: Optional[Dict[str, float]] = None):
+        with self._lock:
+            self.latencies.append(seconds)
+            for name, value in (calls or {}).items():
+                self.calls.setdefault(name, []).append(value)
+
+    def error(self, reason: str):
+        with self._lock:
+            self.errors[reason] = self.errors.get(reason, 0) + 1
+
+    def summary(self) -> Dict[str, Any]:
+        ms = lambda values, q: round(percentile(values, q) * 1000, 1)
+        return {
+            'clients': self.clients,
+            'ok': len(self.latencies),
+            'errors': sum(self.errors.values()),
+            'error_reasons': self.errors,
+            'per_minute': round(len(self.latencies) / self.elapsed * 60, 1) if self.elapsed else 0.0,
+            'p50_ms': ms(self.latencies, 50),
+            'p95_ms': ms(self.latencies, 95),
+            'p99_ms': ms(self.latencies, 99),
+            'calls': {name: {'p50_ms': ms(v, 50), 'p95_ms': ms(v, 95)} for name, v in self.calls.items()},
+        }
+
+
+# ----------------------------------------------------------------------
+# Scenarios: one iteration per call, recording into the step
+# ----------------------------------------------------------------------
+
+def fastapi_flow(client: Client, step: Step, document: bytes, filename: str):
+    boundary = uuid.uuid4().hex
+    body = (f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+            f'Content-Type: application/pdf\r\n\r\n').encode() + document + f'\r\n--{boundary}--\r\n'.encode()
+    start = time.perf_counter()
+    status, _, data = client.request('POST', '/upload', body, {'Content-Type': f'multipart/form-data; boundary={boundary}'})
+    uploaded = time.perf_counter()
+    if status != 200:
+        return step.error(f'upload {status}')
+    file_id = json.loads(data)['file_id']
+    status, _, _ = client.request('POST', f'/extract/{file_id}')
+    done = time.perf_counter()
+    if status != 200:
+        return step.error(f'extract {status}')
+    step.ok(done - start, {'upload': uploaded - start, 'extract': done - uploaded})
+
+
+def flask_get(client: Client, step: Step, paths: List[str], counter: List[int]):
+    path = paths[counter[0] % len(paths)]
+    counter[0] += 1
+    start = time.perf_counter()
+    status, _, data = client.request('GET', path)
+    elapsed = time.perf_counter() - start
+    if status not in (200, 304) or b'"error"' in data[:200]:
+        return step.error(f'{path} {status}')
+    step.ok(elapsed, {path: elapsed})
+
+
+def _retry_after(headers: Dict[str, str], default: float = 1.0) -> float:
+    if 'retry-after-ms' in headers:
+        return int(headers['retry-after-ms']) / 1000.0
+    try:
+        return float(headers.get('retry-after', default))
+    except ValueError:
+        return default
+
+
+def analyze_document(client: Client, step: Step, model: str, document: bytes, key: str, deadline: float):
+    body = json.dumps({'base64Source': base64.b64encode(document).decode('ascii')}).encode()
+    headers = {'Content-Type': 'application/json', 'Ocp-Apim-Subscription-Key': key}
+    path = f'/documentintelligence/documentModels/{model}:analyze?api-version={API_VERSION}'
+    start = time.perf_counter()
+    while True:
+        status, response_headers, _ = client.request('POST', path, body, headers)
+        if status != 429:
+            break
+        step.error('throttled (retried)')
+        time.sleep(_retry_after(response_headers))
+    submitted = time.perf_counter()
+    if status != 202:
+        return step.error(f'submit {status}')
+    location = urlparse(response_headers['operation-location'])
+    poll_path = f'{location.path}?{location.query}'
+    while True:
+        time.sleep(_retry_after(response_headers))
+        status, response_headers, data = client.request('GET', poll_path, headers={'Ocp-Apim-Subscription-Key': key})
+        if status != 200:
+            return step.error(f'poll {status}')
+        state = json.loads(data).get('status')
+        if state == 'succeeded':
+            done = time.perf_counter()
+            return step.ok(done - start, {'submit': submitted - start, 'service_wait': done - submitted})
+        if state == 'failed':
+            return step.error('operation failed')
+        if time.monotonic() > deadline + 300:
+            return step.error('poll timeout')
+
+
+# ----------------------------------------------------------------------
+# Driver
+# ----------------------------------------------------------------------
+
+def run_step(clients: int, duration: float, make_iteration: Callable[[Client, Step, float], Callable[[], None]],
+             base_url: str) -> Step:
+    """Run ``clients`` threads, each looping over its iteration until ``duration`` has passed."""
+    step = Step(clients)
+    deadline = time.monotonic() + duration
+
+    def worker():
+        client = Client(base_url)
+        iteration = make_iteration(client, step, deadline)
+        while time.monotonic() < deadline:
+            try:
+                iteration()
+            except Exception as e:
+                step.error(type(e).__name__)
+                time.sleep(0.05)
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(clients)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    step.elapsed = time.perf_counter() - start
+    return step
+
+
+def run_batch_step(clients: int, input_dir: str, output_dir: str) -> Step:
+    from batch_processor import DocumentBatchProcessor
+
+    step = Step(clients)
+    start = time.perf_counter()
+    processor = DocumentBatchProcessor(input_dir, output_dir, concurrency=clients)
+    for document_type in ('bank_statements', 'receipts', 'invoices'):
+        results = processor.process_batch(document_type)
+        for entry in results['processed']:
+            stages = entry['timings']['stages']
+            step.ok(sum(stages.values()), stages)
+        for entry in results['failed']:
+            step.error(entry['error'][:60])
+    step.elapsed = time.perf_counter() - start
+    return step
+
+
+def format_steps(target: str, steps: List[Dict[str, Any]], header: bool = True) -> str:
+    lines = [f"{target}: {'clients':>7} {'ok':>7} {'errors':>7} {'per min':>9} {'p50':>9} {'p95':>9} {'p99':>9}"] if header else []
+    for s in steps:
+        lines.append(f"{'':{len(target) + 1}} {s['clients']:>7} {s['ok']:>7} {s['errors']:>7} {s['per_minute']:>9.1f} "
+                     f"{s['p50_ms']:>7.1f}ms {s['p95_ms']:>7.1f}ms {s['p99_ms']:>7.1f}ms")
+        for name, call in s['calls'].items():
+            lines.append(f"{'':{len(target) + 10}}{name}: p50 {call['p50_ms']:.1f}ms, p95 {call['p95_ms']:.1f}ms")
+        if s['error_reasons']:
+            lines.append(f"{'':{len(target) + 10}}errors: {s['error_reasons']}")
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('target', choices=['fastapi', 'flask', 'analyze', 'batch'])
+    parser.add_argument('--url', default='http://127.0.0.1:8000', help='server (or Document Intelligence endpoint) URL')
+    parser.add_argument('--clients', default='1,2,4,8', help='comma-separated concurrency ramp')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds per ramp step')
+    parser.add_argument('--file', help='document to upload/analyze (default: a generated PDF)')
+    parser.add_argument('--pages', type=int, default=1, help='pages in the generated PDF')
+    parser.add_argument('--paths', default=','.join(DEFAULT_FLASK_PATHS), help='flask: comma-separated paths')
+    parser.add_argument('--model', default='prebuilt-receipt', help='analyze: model id')
+    parser.add_argument('--input-dir', default='input', help='batch: input folder')
+    parser.add_argument('--output-dir', default=DEFAULT_OUTPUT_DIR, help='batch: output folder')
+    parser.add_argument('--json', help='also write the step summaries to this file')
+    args = parser.parse_args()
+
+    if args.file:
+        with open(args.file, 'rb') as f:
+            document = f.read()
+        filename = os.path.basename(args.file)
+    else:
+        document, filename = sample_pdf(args.pages), 'load_test.pdf'
+    key = os.getenv('AZURE_DOC_KEY', 'local')
+    paths = [p.strip() for p in args.paths.split(',') if p.strip()]
+
+    def make_iteration(client, step, deadline):
+        if args.target == 'fastapi':
+            return lambda: fastapi_flow(client, step, document, filename)
+        if args.target == 'flask':
+            counter = [0]
+            return lambda: flask_get(client, step, paths, counter)
+        return lambda: analyze_document(client, step, args.model, document, key, deadline)
+
+    steps = []
+    for clients in [int(c) for c in args.clients.split(',')]:
+        if args.target == 'batch':
+            step = run_batch_step(clients, args.input_dir, args.output_dir)
+        else:
+            step = run_step(clients, args.duration, make_iteration, args.url)
+        steps.append(step.summary())
+        print(format_steps(args.target, steps[-1:], header=len(steps) == 1))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'target': args.target, 'url': args.url, 'steps': steps}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
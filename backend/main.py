@@ -1,5 +1,6 @@
 from fastapi import FastAPI, UploadFile, File, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 import os
@@ -7,6 +8,7 @@ import uuid
 
 from . import extract as extract_mod
 from . import categorize as categorize_mod
+from . import perf
 
 
 class CategorizeRequest(BaseModel):
@@ -45,6 +47,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-route/stage latency histograms (see /debug/perf and /metrics)
+perf.init_fastapi(app)
+
 
 @app.get("/health")
 def health() -> Dict[str, str]:
@@ -58,9 +63,11 @@ async def upload(file: UploadFile = File(...)) -> Dict[str, str]:
     file_id = str(uuid.uuid4())
     # Save as-is locally (for MVP). Replace with Azure Blob in production.
     dest_path = os.path.join(UPLOAD_DIR, f"{file_id}_{file.filename}")
-    data = await file.read()
-    with open(dest_path, "wb") as f:
-        f.write(data)
+    with perf.stage("read"):
+        data = await file.read()
+    with perf.stage("write"):
+        with open(dest_path, "wb") as f:
+            f.write(data)
     return {"file_id": file_id, "filename": file.filename}
 
 
@@ -71,19 +78,38 @@ def extract(file_id: str) -> Dict[str, Any]:
     if not matches:
         raise HTTPException(status_code=404, detail="File not found")
     file_path = os.path.join(UPLOAD_DIR, matches[0])
-    transactions = extract_mod.extract_transactions(file_path)
+    with perf.stage("extract"):
+        transactions = extract_mod.extract_transactions(file_path)
     return {"file_id": file_id, "transactions": transactions}
 
 
 @app.post("/categorize", response_model=CategorizeResponse)
 def categorize(req: CategorizeRequest) -> CategorizeResponse:
-    results = categorize_mod.categorize_transactions(
-        req.transactions, categories=req.categories, use_llm=req.use_llm
-    )
+    with perf.stage("categorize"):
+        results = categorize_mod.categorize_transactions(
+            req.transactions, categories=req.categories, use_llm=req.use_llm
+        )
     response_items = [CategorizeResponseItem(**r) for r in results]
     return CategorizeResponse(results=response_items)
 
 
+@app.get("/debug/perf")
+def debug_perf(reset: bool = False) -> Dict[str, Any]:
+    snapshot = perf.PERF.snapshot()
+    if reset:
+        perf.PERF.reset()
+    return {
+        "routes": snapshot,
+        "profiling_enabled": perf.profiling_enabled(),
+        "recent_profiles": perf.PERF.profiles,
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics() -> str:
+    return perf.PERF.prometheus()
+
+
 # To run locally:
 #   uvicorn AI-Book-Keeping.backend.main:app --reload
 
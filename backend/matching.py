@@ -0,0 +1,208 @@
+"""Match receipts to bank withdrawals.
+
+Withdrawals are indexed by (amount bucket, date) in one sorted key array,
+where a bucket is ``amount_tolerance`` wide. A receipt can then only match
+withdrawals in its own bucket or the two neighbouring ones, and within each
+bucket the date window is a contiguous range found with ``searchsorted``.
+Candidate lookup is vectorized over a chunk of receipts at a time;
+candidates are scored by merchant/description similarity (computed once per
+distinct merchant/description pair), amount distance and date distance, and
+only those above ``min_score`` are kept. Assignment is greedy by score, one
+withdrawal per receipt.
+"""
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from dedupe import normalize_description
+from ledger_store import TransactionStore
+
+# Keys are bucket * _DAY_SPAN + day, so days must fit in the span (covers years 1700-2250)
+_DAY_SPAN = 1 << 18
+_DAY_OFFSET = 1 << 17
+_CHUNK = 50_000
+
+
+def name_similarity(merchant: str, description: str) -> float:
+    """Similarity in [0, 1] between a receipt merchant and a bank description (both normalized).
+
+    1.0 when the merchant name appears in the description (ignoring spaces),
+    otherwise the fraction of merchant tokens that prefix-match a description
+    token of three or more letters, so truncated descriptions still count.
+    """
+    if not merchant or not description:
+        return 0.0
+    if merchant.replace(' ', '') in description.replace(' ', ''):
+        return 1.0
+    description_tokens = description.split()
+    merchant_tokens = merchant.split()
+    hits = 0
+    for m in merchant_tokens:
+        for d in description_tokens:
+            if (len(d) >= 3 and m.startswith(d)) or (len(m) >= 3 and d.startswith(m)):
+                hits += 1
+                break
+    return hits / len(merchant_tokens)
+
+
+def _receipt_columns(receipts: List[Dict[str, Any]]):
+    import pandas as pd
+    totals = pd.to_numeric(pd.Series([r.get('total') for r in receipts], dtype=object), errors='coerce')
+    dates = pd.to_datetime(pd.Series([r.get('transaction_date') for r in receipts], dtype=object), errors='coerce')
+    days = dates.to_numpy(dtype='datetime64[ns]').astype('datetime64[D]')
+    return totals.to_numpy(dtype=np.float64, na_value=np.nan), days
+
+
+def _greedy_assignment(owner: np.ndarray, pos: np.ndarray, scores: np.ndarray) -> np.ndarray:
+    """Greedy one-to-one assignment by descending score, vectorized.
+
+    Each round accepts every candidate that is the best remaining one for both
+    its receipt and its transaction (ties broken by position). Such "locally
+    dominant" pairs are exactly the ones a sequential greedy pass would pick,
+    and the global best is always among them, so every round makes progress.
+    """
+    order = np.lexsort((np.arange(len(scores)), -scores))
+    accepted = []
+    while len(order):
+        _, first_owner = np.unique(owner[order], return_index=True)
+        _, first_pos = np.unique(pos[order], return_index=True)
+        winners = np.intersect1d(order[first_owner], order[first_pos], assume_unique=True)
+        accepted.append(winners)
+        alive = ~np.isin(owner[order], owner[winners]) & ~np.isin(pos[order], pos[winners])
+        order = order[alive]
+    return np.concatenate(accepted) if accepted else np.empty(0, dtype=np.int64)
+
+
+def match_receipts(receipts: List[Dict[str, Any]], store: TransactionStore, mask: Optional[np.ndarray] = None,
+                   date_window: int = 3, amount_tolerance: float = 0.50, min_score: float = 0.5) -> Dict[str, Any]:
+    """Match each receipt to at most one withdrawal.
+
+    ``date_window`` is in days either side of the receipt date and
+    ``amount_tolerance`` is in dollars. ``mask`` restricts the candidate
+    transactions (e.g. the deduplicated rows of the ledger).
+    """
+    tol = max(1, int(round(amount_tolerance * 100)))
+
+    # Withdrawal index: sorted (bucket, day) keys
+    dates = store.dates
+    withdrawal_cents = np.rint(store.withdrawals * 100).astype(np.int64)
+    usable = (withdrawal_cents > 0) & ~np.isnat(dates)
+    if mask is not None:
+        usable &= mask
+    tx_rows = np.flatnonzero(usable)
+    tx_cents = withdrawal_cents[tx_rows]
+    tx_days = dates[tx_rows].astype(np.int64) + _DAY_OFFSET
+    del dates, withdrawal_cents, usable
+    tx_keys = (tx_cents // tol) * _DAY_SPAN + tx_days
+    order = np.argsort(tx_keys, kind='stable')
+    tx_rows, tx_cents, tx_days, tx_keys = tx_rows[order], tx_cents[order], tx_days[order], tx_keys[order]
+    del order
+    tx_desc = store.description_codes[tx_rows]
+
+    totals, receipt_dates = _receipt_columns(receipts)
+    valid = ~np.isnan(totals) & (totals > 0) & ~np.isnat(receipt_dates)
+    receipt_idx = np.flatnonzero(valid)
+    r_cents = np.rint(totals[receipt_idx] * 100).astype(np.int64)
+    r_days = receipt_dates[receipt_idx].astype(np.int64) + _DAY_OFFSET
+    r_bucket = r_cents // tol
+
+    merchant_ids: Dict[str, int] = {}
+    r_merchant = np.array([
+        merchant_ids.setdefault(normalize_description(receipts[i].get('merchant_name')), len(merchant_ids))
+        for i in receipt_idx
+    ], dtype=np.int64)
+    merchant_names = list(merchant_ids)
+    pool = store.description_pool
+    n_codes = max(1, len(pool))
+    similarity: Dict[int, float] = {}
+    normalized_desc: Dict[int, str] = {}
+
+    kept_owner, kept_pos, kept_score = [], [], []
+    for chunk_start in range(0, len(receipt_idx), _CHUNK):
+        chunk = np.arange(chunk_start, min(chunk_start + _CHUNK, len(receipt_idx)))
+        for shift in (-1, 0, 1):
+            base = (r_bucket[chunk] + shift) * _DAY_SPAN + r_days[chunk]
+            lo = np.searchsorted(tx_keys, base - date_window, side='left')
+            hi = np.searchsorted(tx_keys, base + date_window, side='right')
+            counts = hi - lo
+            total = int(counts.sum())
+            if total == 0:
+                continue
+            owner = np.repeat(chunk, counts)
+            pos = np.repeat(lo - np.cumsum(counts) + counts, counts) + np.arange(total)
+
+            amount_diff = np.abs(tx_cents[pos] - r_cents[owner])
+            keep = amount_diff <= tol
+            owner, pos, amount_diff = owner[keep], pos[keep], amount_diff[keep]
+            day_diff = np.abs(tx_days[pos] - r_days[owner])
+
+            # Similarity is computed once per distinct (merchant, description) pair
+            unique_pairs, pair_index = np.unique(r_merchant[owner] * n_codes + tx_desc[pos], return_inverse=True)
+            pair_sim = np.empty(len(unique_pairs), dtype=np.float64)
+            for j, pair in enumerate(unique_pairs.tolist()):
+                sim = similarity.get(pair)
+                if sim is None:
+                    merchant_id, code = divmod(pair, n_codes)
+                    desc = normalized_desc.get(code)
+                    if desc is None:
+                        desc = normalized_desc[code] = normalize_description(pool[code])
+                    sim = similarity[pair] = name_similarity(merchant_names[merchant_id], desc)
+                pair_sim[j] = sim
+            scores = (0.5 * pair_sim[pair_index]
+                      + 0.3 * (1 - amount_diff / (tol + 1))
+                      + 0.2 * (1 - day_diff / (date_window + 1)))
+
+            good = scores >= min_score
+            kept_owner.append(owner[good])
+            kept_pos.append(pos[good])
+            kept_score.append(scores[good])
+
+    matches: List[Dict[str, Any]] = []
+    matched_positions = set()
+    if kept_owner:
+        owner = np.concatenate(kept_owner)
+        pos = np.concatenate(kept_pos)
+        scores = np.concatenate(kept_score)
+        for k in _greedy_assignment(owner, pos, scores).tolist():
+            receipt_pos = int(receipt_idx[owner[k]])
+            matched_positions.add(receipt_pos)
+            receipt = receipts[receipt_pos]
+            tx = store.row(int(tx_rows[pos[k]]))
+            matches.append({
+                'receipt_index': receipt_pos,
+                'merchant_name': receipt.get('merchant_name', ''),
+                'receipt_date': receipt.get('transaction_date', ''),
+                'receipt_total': float(totals[receipt_pos]),
+                'account_number': tx.account_number,
+                'transaction_date': tx.date,
+                'description': tx.description,
+                'withdrawal': tx.withdrawal,
+                'score': round(float(scores[k]), 4),
+            })
+
+    unmatched = []
+    for i, receipt in enumerate(receipts):
+        if i in matched_positions:
+            continue
+        unmatched.append({
+            'receipt_index': i,
+            'merchant_name': receipt.get('merchant_name', ''),
+            'transaction_date': receipt.get('transaction_date', ''),
+            'total': receipt.get('total'),
+            'reason': 'no candidate' if valid[i] else 'missing date or total',
+        })
+
+    matches.sort(key=lambda m: m['receipt_index'])
+    return {
+        'matches': matches,
+        'unmatched_receipts': unmatched,
+        'summary': {
+            'receipts': len(receipts),
+            'withdrawals_indexed': int(len(tx_rows)),
+            'matched': len(matches),
+            'unmatched': len(unmatched),
+            'date_window': date_window,
+            'amount_tolerance': amount_tolerance,
+            'min_score': min_score,
+        },
+    }
@@ -0,0 +1,388 @@
+"""Local stand-in for the Azure Document Intelligence analyze/poll REST protocol.
+
+Serves the three prebuilt models the analyzers use (``prebuilt-bankStatement.us``,
+``prebuilt-receipt`` and ``prebuilt-invoice``):
+
+- ``POST /documentintelligence/documentModels/<model>:analyze`` answers 202 with
+  an ``Operation-Location`` header;
+- ``GET  /documentintelligence/documentModels/<model>/analyzeResults/<id>``
+  reports ``running`` until the simulated processing time has passed, then
+  ``succeeded`` with synthetic documents (see ``synthetic_data.py``) in the
+  service's field format, or ``failed``.
+
+Processing time is a base latency drawn from a configurable distribution plus
+a per-page cost. Pages are counted in the uploaded PDF, and one page is
+assumed for images and URL sources. ``--capacity`` limits how many documents
+are processed at once, so queueing shows up as it would under a service
+quota. Errors can be injected as throttling (429 with ``Retry-After``),
+server errors (500) on submit, or failed operations.
+
+Point the analyzers at it with the real SDK::
+
+    python mock_doc_intel.py --port 8765 --latency lognormal:2.0:0.4 --per-page 0.5 --throttle-rate 0.05
+    AZURE_DOC_ENDPOINT=http://127.0.0.1:8765 AZURE_DOC_KEY=local python batch_processor.py
+
+``GET /mock/stats`` returns request and outcome counters.
+"""
+import argparse
+import base64
+import heapq
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import synthetic_data
+from operation_poller import count_pages
+
+ANALYZE_PATH = re.compile(r'^/documentintelligence/documentModels/([^/:]+):analyze$')
+RESULT_PATH = re.compile(r'^/documentintelligence/documentModels/([^/]+)/analyzeResults/([^/]+)$')
+DEFAULT_API_VERSION = '2024-11-30'
+
+# Transactions per statement page
+TRANSACTIONS_PER_PAGE = 25
+
+
+# ----------------------------------------------------------------------
+# Latency model
+# ----------------------------------------------------------------------
+
+class Latency:
+    """Base processing time distribution, parsed from ``kind:param[:param]``.
+
+    ``fixed:S``, ``uniform:LOW:HIGH``, ``exponential:MEAN`` or
+    ``lognormal:MEDIAN:SIGMA`` (all in seconds).
+    """
+
+    def __init__(self, spec: str = 'lognormal:1.0:0.5'):
+        kind, *params = spec.split(':')
+        try:
+            values = [float(p) for p in params]
+        except ValueError:
+            raise ValueError(f'Invalid latency spec: {spec}')
+        expected = {'fixed': 1, 'uniform': 2, 'exponential': 1, 'lognormal': 2}
+        if kind not in expected or len(values) != expected[kind]:
+            raise ValueError(f'Invalid latency spec: {spec}')
+        self.kind = kind
+        self.values = values
+        self.spec = spec
+
+    def sample(self, rng: random.Random) -> float:
+        v = self.values
+        if self.kind == 'fixed':
+            return v[0]
+        if self.kind == 'uniform':
+            return rng.uniform(v[0], v[1])
+        if self.kind == 'exponential':
+            return rng.expovariate(1.0 / v[0]) if v[0] > 0 else 0.0
+        return rng.lognormvariate(math.log(v[0]), v[1]) if v[0] > 0 else 0.0
+
+
+# ----------------------------------------------------------------------
+# Synthetic results in the service's field format
+# ----------------------------------------------------------------------
+
+def _string(value: str) -> Dict[str, Any]:
+    return {'type': 'string', 'valueString': value, 'content': value}
+
+
+def _date(value: str) -> Dict[str, Any]:
+    return {'type': 'date', 'valueDate': value, 'content': value}
+
+
+def _number(value: float) -> Dict[str, Any]:
+    return {'type': 'number', 'valueNumber': value, 'content': f'{value:.2f}'}
+
+
+def _currency(value: float) -> Dict[str, Any]:
+    return {'type': 'currency', 'valueCurrency': {'amount': value, 'currencyCode': 'USD'},
+            'content': f'${value:,.2f}'}
+
+
+def _content(value: str, kind: str = 'string') -> Dict[str, Any]:
+    return {'type': kind, 'content': value}
+
+
+def _array(items: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {'type': 'array', 'valueArray': items}
+
+
+def _object(fields: Dict[str, Any]) -> Dict[str, Any]:
+    return {'type': 'object', 'valueObject': fields}
+
+
+def bank_statement_document(rng: random.Random, pages: int) -> Dict[str, Any]:
+    statement = synthetic_data.make_statement(rng, rng.randrange(24), TRANSACTIONS_PER_PAGE * pages)
+    meta = statement['metadata']
+    accounts = []
+    for account in statement['accounts']:
+        transactions = []
+        for tx in account['transactions']:
+            fields = {'Date': _date(tx['date']), 'Description': _string(tx['description'])}
+            if tx['deposit']:
+                fields['DepositAmount'] = _number(tx['deposit'])
+            if tx['withdrawal']:
+                fields['WithdrawalAmount'] = _number(tx['withdrawal'])
+            transactions.append(_object(fields))
+        accounts.append(_object({
+            'AccountNumber': _string(account['account_number']),
+            'AccountType': _string(account['account_type']),
+            'BeginningBalance': _number(account['beginning_balance']),
+            'EndingBalance': _number(account['ending_balance']),
+            'Transactions': _array(transactions),
+        }))
+    return {'docType': 'bankStatement.us', 'fields': {
+        'AccountHolderName': _string(meta['account_holder']),
+        'BankName': _string(meta['bank_name']),
+        'StatementStartDate': _date(meta['statement_period']['start_date']),
+        'StatementEndDate': _date(meta['statement_period']['end_date']),
+        'Accounts': _array(accounts),
+    }}
+
+
+def receipt_document(rng: random.Random, pages: int) -> Dict[str, Any]:
+    receipt = synthetic_data.make_receipt(rng)
+    items = [_object({
+        'Description': _string(item['description']),
+        'Quantity': _number(item['quantity']),
+        'Price': _currency(item['price']),
+        'TotalPrice': _currency(item['total_price']),
+    }) for item in receipt['items']]
+    return {'docType': receipt['type'], 'fields': {
+        'MerchantName': _string(receipt['merchant_name']),
+        'TransactionDate': _date(receipt['transaction_date']),
+        'Items': _array(items),
+        'Subtotal': _currency(receipt['subtotal']),
+        'TotalTax': _currency(receipt['tax']),
+        'Tip': _currency(receipt['tip']),
+        'Total': _currency(receipt['total']),
+    }}
+
+
+def invoice_document(rng: random.Random, pages: int) -> Dict[str, Any]:
+    invoice = synthetic_data.make_invoice(rng, rng.randrange(100000))
+    items = [_object({
+        'Description': _content(item['description']),
+        'Quantity': _content(item['quantity'], 'number'),
+        'UnitPrice': _content(item['unit_price'], 'currency'),
+        'Amount': _content(item['amount'], 'currency'),
+    }) for item in invoice['items']]
+    fields = {name: _content(invoice[key], kind) for name, key, kind in (
+        ('VendorName', 'vendor_name', 'string'),
+        ('VendorAddress', 'vendor_address', 'address'),
+        ('CustomerName', 'customer_name', 'string'),
+        ('InvoiceId', 'invoice_id', 'string'),
+        ('InvoiceDate', 'invoice_date', 'date'),
+        ('DueDate', 'due_date', 'date'),
+        ('SubTotal', 'subtotal', 'currency'),
+        ('TotalTax', 'total_tax', 'currency'),
+        ('InvoiceTotal', 'invoice_total', 'currency'),
+    )}
+    fields['Items'] = _array(items)
+    return {'docType': 'invoice', 'fields': fields}
+
+
+MODELS = {
+    'prebuilt-bankStatement.us': bank_statement_document,
+    'prebuilt-receipt': receipt_document,
+    'prebuilt-invoice': invoice_document,
+}
+
+
+def analyze_result(model_id: str, pages: int, rng: random.Random) -> Dict[str, Any]:
+    document = MODELS[model_id](rng, pages)
+    document.update(confidence=round(rng.uniform(0.8, 0.99), 3), boundingRegions=[], spans=[])
+    return {
+        'apiVersion': DEFAULT_API_VERSION,
+        'modelId': model_id,
+        'content': '',
+        'pages': [{'pageNumber': n + 1, 'words': [], 'lines': [], 'spans': []} for n in range(pages)],
+        'documents': [document],
+    }
+
+
+# ----------------------------------------------------------------------
+# Service simulation
+# ----------------------------------------------------------------------
+
+class MockService:
+    """Operation bookkeeping: processing times, capacity queueing and injected errors."""
+
+    def __init__(self, latency: Latency, per_page: float = 0.2, capacity: int = 0,
+                 throttle_rate: float = 0.0, server_error_rate: float = 0.0, fail_rate: float = 0.0,
+                 poll_interval_ms: int = 250, seed: int = 0):
+        self.latency = latency
+        self.per_page = per_page
+        self.capacity = capacity
+        self.throttle_rate = throttle_rate
+        self.server_error_rate = server_error_rate
+        self.fail_rate = fail_rate
+        self.poll_interval_ms = poll_interval_ms
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._slots: List[float] = []  # heap of times at which busy slots free up
+        self._operations: Dict[str, Dict[str, Any]] = {}
+        self.stats = {'submitted': 0, 'throttled': 0, 'server_errors': 0, 'polls': 0,
+                      'succeeded': 0, 'failed': 0, 'pages': 0}
+
+    def submit(self, model_id: str, document: bytes) -> Tuple[int, Optional[str]]:
+        """``(status, operation id)``; the id is None when the submit is rejected."""
+        with self._lock:
+            draw = self._rng.random()
+            if draw < self.throttle_rate:
+                self.stats['throttled'] += 1
+                return 429, None
+            if draw < self.throttle_rate + self.server_error_rate:
+                self.stats['server_errors'] += 1
+                return 500, None
+            pages = count_pages(document)
+            now = time.monotonic()
+            start = now
+            if self.capacity:
+                while self._slots and self._slots[0] <= now:
+                    heapq.heappop(self._slots)
+                if len(self._slots) >= self.capacity:
+                    start = heapq.heappop(self._slots)
+            done = start + self.latency.sample(self._rng) + self.per_page * pages
+            if self.capacity:
+                heapq.heappush(self._slots, done)
+            op_id = str(uuid.uuid4())
+            self._operations[op_id] = {
+                'model': model_id, 'pages': pages, 'created': time.time(), 'done': done,
+                'fail': self._rng.random() < self.fail_rate, 'seed': self._rng.random(),
+            }
+            self.stats['submitted'] += 1
+            self.stats['pages'] += pages
+            return 202, op_id
+
+    def poll(self, op_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self.stats['polls'] += 1
+            op = self._operations.get(op_id)
+            if op is None:
+                return None
+            stamp = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(op['created']))
+            body = {'status': 'running', 'createdDateTime': stamp, 'lastUpdatedDateTime': stamp}
+            if time.monotonic() < op['done']:
+                return body
+            del self._operations[op_id]
+            if op['fail']:
+                self.stats['failed'] += 1
+                body.update(status='failed', error={'code': 'InternalServerError',
+                                                    'message': 'Injected analysis failure.'})
+                return body
+            self.stats['succeeded'] += 1
+        body.update(status='succeeded', analyzeResult=analyze_result(op['model'], op['pages'], random.Random(op['seed'])))
+        return body
+
+
+def _error(code: str, message: str) -> Dict[str, Any]:
+    return {'error': {'code': code, 'message': message}}
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    service: MockService = None
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass  # keep load tests quiet
+
+    def _send(self, status: int, body: Optional[Dict[str, Any]] = None, headers: Optional[Dict[str, str]] = None):
+        data = json.dumps(body).encode('utf-8') if body is not None else b''
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _retry_headers(self) -> Dict[str, str]:
+        ms = self.service.poll_interval_ms
+        return {'retry-after-ms': str(ms), 'Retry-After': str(max(1, math.ceil(ms / 1000)))}
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        match = ANALYZE_PATH.match(url.path)
+        length = int(self.headers.get('Content-Length') or 0)
+        payload = self.rfile.read(length) if length else b''
+        if not match:
+            return self._send(404, _error('NotFound', f'Unknown path {url.path}'))
+        model_id = match.group(1)
+        if model_id not in MODELS:
+            return self._send(404, _error('ModelNotFound', f'Model {model_id} not found.'))
+
+        document = payload
+        if 'json' in (self.headers.get('Content-Type') or ''):
+            try:
+                request = json.loads(payload or b'{}')
+            except ValueError:
+                return self._send(400, _error('InvalidRequest', 'Request body is not valid JSON.'))
+            source = request.get('base64Source')
+            document = base64.b64decode(source) if source else b''
+
+        status, op_id = self.service.submit(model_id, document)
+        if status == 429:
+            return self._send(429, _error('429', 'Rate limit exceeded.'), self._retry_headers())
+        if status == 500:
+            return self._send(500, _error('InternalServerError', 'Injected server error.'))
+        host = self.headers.get('Host') or f'{self.server.server_address[0]}:{self.server.server_address[1]}'
+        location = (f'http://{host}/documentintelligence/documentModels/{model_id}/analyzeResults/{op_id}'
+                    f'?api-version={DEFAULT_API_VERSION}')
+        self._send(202, None, dict(self._retry_headers(), **{'Operation-Location': location,
+                                                             'apim-request-id': op_id}))
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == '/mock/stats':
+            with self.service._lock:
+                return self._send(200, dict(self.service.stats, in_progress=len(self.service._operations)))
+        match = RESULT_PATH.match(url.path)
+        if not match:
+            return self._send(404, _error('NotFound', f'Unknown path {url.path}'))
+        body = self.service.poll(match.group(2))
+        if body is None:
+            return self._send(404, _error('NotFound', 'Unknown operation.'))
+        headers = self._retry_headers() if body['status'] == 'running' else None
+        self._send(200, body, headers)
+
+
+def serve(service: MockService, host: str = '127.0.0.1', port: int = 8765) -> ThreadingHTTPServer:
+    """Start the mock on a background thread; ``server.shutdown()`` stops it."""
+    handler = type('BoundMockHandler', (MockHandler,), {'service': service})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='mock-doc-intel', daemon=True).start()
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local Document Intelligence stand-in.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', default='lognormal:1.0:0.5', help='base processing time distribution')
+    parser.add_argument('--per-page', type=float, default=0.2, help='extra seconds per page')
+    parser.add_argument('--capacity', type=int, default=0, help='documents processed at once (0 = unlimited)')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='fraction of submits answered 429')
+    parser.add_argument('--server-error-rate', type=float, default=0.0, help='fraction of submits answered 500')
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='fraction of operations that end failed')
+    parser.add_argument('--poll-interval-ms', type=int, default=250, help='retry-after-ms sent to pollers')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    mock = MockService(Latency(args.latency), args.per_page, args.capacity, args.throttle_rate,
+                       args.server_error_rate, args.fail_rate, args.poll_interval_ms, args.seed)
+    server = serve(mock, args.host, args.port)
+    print(f"Mock Document Intelligence on http://{args.host}:{args.port} "
+          f"(latency {args.latency} + {args.per_page}s/page, capacity {args.capacity or 'unlimited'})")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,320 @@
+"""One polling loop for all outstanding Document Intelligence analyze operations.
+
+``begin_analyze_document`` hands back an SDK poller per document, and each
+``poller.result()`` polls on its own schedule from the thread that waits on
+it. ``OperationPoller`` instead submits the analyze request itself, keeps
+the operations it is waiting for keyed by their ``Operation-Location``, and
+polls all of them from a single background thread:
+
+- the first poll of an operation is scheduled shortly before its expected
+  completion, from a ``CompletionModel`` fitted to earlier operations of the
+  same model (``base + per_page x pages``), so a one-page receipt is checked
+  after about a second while a 30-page statement is not polled while it
+  cannot be done yet;
+- later polls back off with the time already spent and the model's spread;
+- throttled polls (429) wait for ``Retry-After``.
+
+``submit`` returns a ``concurrent.futures.Future`` with the raw
+``analyzeResult`` JSON; callbacks added to it run on the polling thread, so
+they should only hand the result on (``batch_processor`` queues the
+structuring stage). The learned model is saved as ``poll_model.json`` in the
+output folder so the next batch starts from it.
+"""
+import heapq
+import json
+import math
+import os
+import re
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+API_VERSION = '2024-11-30'
+MODEL_FILE = 'poll_model.json'
+PDF_PAGE = re.compile(rb'/Type\s*/Page(?![a-zA-Z])')
+
+# (status, lowercased headers, JSON body or None) for a request relative to the endpoint
+Send = Callable[[str, str, Optional[Dict[str, Any]]], Tuple[int, Dict[str, str], Optional[Dict[str, Any]]]]
+
+
+def count_pages(document: bytes) -> int:
+    """Pages in a PDF (by its page objects); 1 for anything else."""
+    if not document.startswith(b'%PDF'):
+        return 1
+    return max(1, len(PDF_PAGE.findall(document)))
+
+
+def _retry_after(headers: Dict[str, str], default: float) -> float:
+    """Seconds to wait from ``retry-after-ms`` or ``retry-after``; ``default`` when missing or malformed."""
+    try:
+        if 'retry-after-ms' in headers:
+            return float(headers['retry-after-ms']) / 1000.0
+        return float(headers.get('retry-after', default))
+    except (TypeError, ValueError):
+        return default
+
+
+class SdkTransport:
+    """``Send`` over a ``DocumentIntelligenceClient`` pipeline (auth, retries, connection reuse)."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def __call__(self, method: str, url: str, body: Optional[Dict[str, Any]] = None):
+        from azure.core.rest import HttpRequest
+
+        response = self.client.send_request(HttpRequest(method, url, json=body))
+        try:
+            payload = response.json() if response.content else None
+        except ValueError:
+            payload = None
+        return response.status_code, {k.lower(): v for k, v in response.headers.items()}, payload
+
+
+class CompletionModel:
+    """Expected processing seconds per model id, ``base + per_page x pages``.
+
+    Fitted by exponentially weighted least squares (older operations fade by
+    ``decay`` per new one), starting from a prior worth ``prior_weight``
+    operations. ``models`` holds the weighted sums ``[w, x, y, xx, xy]`` and
+    the residual variance per model id.
+    """
+
+    def __init__(self, base: float = 2.0, per_page: float = 0.5, decay: float = 0.97, prior_weight: float = 2.0):
+        self.base = base
+        self.per_page = per_page
+        self.decay = decay
+        self.prior_weight = prior_weight
+        self.models: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def _sums(self, model_id: str) -> List[float]:
+        sums = self.models.get(model_id)
+        if sums is None:
+            # Two prior points on the default line, at 1 and 10 pages
+            w = self.prior_weight / 2
+            y1, y10 = self.base + self.per_page, self.base + 10 * self.per_page
+            sums = self.models[model_id] = [2 * w, 11 * w, (y1 + y10) * w, 101 * w, (y1 + 10 * y10) * w,
+                                            (0.25 * self.base) ** 2]
+        return sums
+
+    def _line(self, sums: List[float]) -> Tuple[float, float]:
+        w, x, y, xx, xy, _ = sums
+        mean_x, mean_y = x / w, y / w
+        var_x = xx / w - mean_x * mean_x
+        slope = (xy / w - mean_x * mean_y) / var_x if var_x > 1e-6 else self.per_page
+        slope = max(slope, 0.0)
+        return max(mean_y - slope * mean_x, 0.0), slope
+
+    def expected(self, model_id: str, pages: int) -> Tuple[float, float]:
+        """``(expected seconds, spread)`` for a document of ``pages`` pages."""
+        with self._lock:
+            sums = self._sums(model_id)
+            base, slope = self._line(sums)
+            return base + slope * pages, math.sqrt(sums[5])
+
+    def observe(self, model_id: str, pages: int, seconds: float):
+        with self._lock:
+            sums = self._sums(model_id)
+            base, slope = self._line(sums)
+            residual = seconds - (base + slope * pages)
+            d = self.decay
+            for i, value in enumerate((1.0, pages, seconds, pages * pages, pages * seconds)):
+                sums[i] = sums[i] * d + value
+            sums[5] = d * sums[5] + (1 - d) * residual * residual
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            fitted = {m: dict(zip(('base', 'per_page'), (round(v, 3) for v in self._line(s))),
+                              spread=round(math.sqrt(s[5]), 3)) for m, s in self.models.items()}
+            return {'models': self.models, 'fitted': fitted}
+
+    def load(self, path: str):
+        try:
+            with open(path, 'r') as f:
+                self.models = {m: [float(v) for v in s] for m, s in json.load(f).get('models', {}).items()}
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Error reading poll model {path}: {e}")
+
+    def save(self, path: str):
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+        os.replace(tmp, path)
+
+
+class _Operation:
+    __slots__ = ('location', 'model_id', 'pages', 'submitted', 'expected', 'lead', 'last_running', 'polls',
+                 'errors', 'future')
+
+    def __init__(self, location: str, model_id: str, pages: int, submitted: float, expected: float, lead: float):
+        self.location = location
+        self.model_id = model_id
+        self.pages = pages
+        self.submitted = submitted
+        self.expected = expected
+        self.lead = lead
+        self.last_running: Optional[float] = None
+        self.polls = 0
+        self.errors = 0
+        self.future: Future = Future()
+
+
+class OperationPoller:
+    """Submits analyze requests and polls every outstanding operation from one thread.
+
+    ``send`` is a ``Send`` such as ``SdkTransport(client)``. Polls are never
+    closer than ``min_interval`` nor further apart than ``max_interval``
+    seconds; an operation fails after ``max_errors`` consecutive poll errors.
+    """
+
+    def __init__(self, send: Send, model: Optional[CompletionModel] = None, min_interval: float = 0.25,
+                 max_interval: float = 15.0, max_errors: int = 5, api_version: str = API_VERSION):
+        self.send = send
+        self.model = model or CompletionModel()
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.max_errors = max_errors
+        self.api_version = api_version
+        self.operations: Dict[str, _Operation] = {}
+        self.stats = {'submitted': 0, 'polls': 0, 'succeeded': 0, 'failed': 0, 'throttled': 0}
+        self._absolute_error = 0.0  # sum of |observed - expected| seconds over succeeded operations
+        self._schedule: List[Tuple[float, int, str]] = []  # (due, sequence, operation location)
+        self._sequence = 0
+        self._wake = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='analyze-poller', daemon=True)
+        self._thread.start()
+
+    def submit(self, model_id: str, document: Optional[bytes] = None, url_source: Optional[str] = None,
+               pages: Optional[int] = None) -> Future:
+        """Send an analyze request (base64 ``document`` or ``url_source``) and track its operation."""
+        import base64
+
+        if document is not None:
+            body = {'base64Source': base64.b64encode(document).decode('ascii')}
+            pages = pages or count_pages(document)
+        else:
+            body = {'urlSource': url_source}
+        path = f'/documentModels/{model_id}:analyze?api-version={self.api_version}'
+        for attempt in range(self.max_errors):
+            status, headers, payload = self.send('POST', path, body)
+            if status != 429:
+                break
+            with self._wake:
+                self.stats['throttled'] += 1
+            time.sleep(_retry_after(headers, 1.0))
+        if status != 202 or 'operation-location' not in headers:
+            message = ((payload or {}).get('error') or {}).get('message', '')
+            raise RuntimeError(f"Analyze request for {model_id} failed with status {status}: {message}")
+        return self.track(headers['operation-location'], model_id, pages or 1)
+
+    def track(self, location: str, model_id: str, pages: int = 1, submitted: Optional[float] = None) -> Future:
+        """Start polling an operation that was already submitted."""
+        expected, spread = self.model.expected(model_id, pages)
+        lead = max(spread, 0.1 * expected)
+        op = _Operation(location, model_id, pages, submitted or time.monotonic(), expected, lead)
+        with self._wake:
+            if self._closed:
+                raise RuntimeError('OperationPoller is closed')
+            self.operations[location] = op
+            self.stats['submitted'] += 1
+            self._push(op.submitted + max(self.min_interval, expected - lead), location)
+        return op.future
+
+    def _push(self, due: float, location: str):
+        self._sequence += 1
+        heapq.heappush(self._schedule, (due, self._sequence, location))
+        self._wake.notify()
+
+    def _run(self):
+        while True:
+            with self._wake:
+                while not self._closed and (not self._schedule or self._schedule[0][0] > time.monotonic()):
+                    self._wake.wait(self._schedule[0][0] - time.monotonic() if self._schedule else None)
+                if self._closed:
+                    return
+                _, _, location = heapq.heappop(self._schedule)
+                op = self.operations.get(location)
+            if op is not None:
+                try:
+                    self._poll(op)
+                except Exception as e:
+                    # Fail this operation only: the loop keeps polling the others
+                    self._fail(op, e)
+
+    def _fail(self, op: _Operation, error: Exception):
+        with self._wake:
+            if self.operations.pop(op.location, None) is not None:
+                self.stats['failed'] += 1
+        if not op.future.done():
+            op.future.set_exception(RuntimeError(f"Polling analyze operation failed: {error}"))
+
+    def _poll(self, op: _Operation):
+        try:
+            status, headers, payload = self.send('GET', op.location, None)
+        except Exception as e:
+            status, headers, payload = None, {}, {'error': {'message': str(e)}}
+        if not isinstance(payload, dict):
+            payload = None  # e.g. a JSON list or string from a proxy
+        now = time.monotonic()
+        op.polls += 1
+        state = (payload or {}).get('status') if status == 200 else None
+        with self._wake:
+            self.stats['polls'] += 1
+            if state == 'running' or state == 'notStarted':
+                op.last_running = now
+                op.errors = 0
+                # Back off with the time already spent; never beyond the configured bounds
+                interval = max(0.5 * op.lead, 0.15 * (now - op.submitted))
+                return self._push(now + min(max(interval, self.min_interval), self.max_interval), op.location)
+            if status == 429:
+                self.stats['throttled'] += 1
+                return self._push(now + _retry_after(headers, 1.0), op.location)
+            if state is None and (status is None or status >= 500):
+                op.errors += 1
+                if op.errors < self.max_errors:
+                    return self._push(now + min(self.min_interval * 2 ** op.errors, self.max_interval), op.location)
+            del self.operations[op.location]
+            self.stats['succeeded' if state == 'succeeded' else 'failed'] += 1
+
+        if state == 'succeeded':
+            # Done somewhere between the last 'running' poll and now; a first poll that already
+            # finds the result counts as finishing one lead earlier, so the estimate can come down
+            started = op.last_running if op.last_running is not None else now - 2 * op.lead
+            seconds = max((started + now) / 2 - op.submitted, 0.0)
+            self.model.observe(op.model_id, op.pages, seconds)
+            with self._wake:
+                self._absolute_error += abs(seconds - op.expected)
+            op.future.set_result(payload.get('analyzeResult') or {})
+            return
+        error = (payload or {}).get('error') or {}
+        message = error.get('message') or f'status {status}'
+        op.future.set_exception(RuntimeError(f"Analyze operation failed: {error.get('code', '')} {message}".strip()))
+
+    def summary(self) -> Dict[str, Any]:
+        """Poll counts and how well completion times were predicted."""
+        with self._wake:
+            stats = dict(self.stats)
+            outstanding = len(self.operations)
+            error = self._absolute_error
+        finished = stats['succeeded'] + stats['failed']
+        stats['mean_prediction_error'] = round(error / stats['succeeded'], 3) if stats['succeeded'] else None
+        stats['polls_per_operation'] = round(stats['polls'] / finished, 2) if finished else None
+        stats['outstanding'] = outstanding
+        stats['model'] = self.model.to_dict()['fitted']
+        return stats
+
+    def close(self, message: str = 'OperationPoller closed before the operation finished'):
+        """Stop the polling thread; operations still outstanding fail with ``message``."""
+        with self._wake:
+            self._closed = True
+            outstanding = list(self.operations.values())
+            self.operations.clear()
+            self._wake.notify()
+        self._thread.join()
+        for op in outstanding:
+            op.future.set_exception(RuntimeError(message))
@@ -0,0 +1,307 @@
+"""Columnar Parquet datasets compacted from the analyzer outputs.
+
+``compact()`` flattens everything under ``output/`` into five tables,
+``transactions``, ``receipts``, ``receipt_items``, ``invoices`` and
+``invoice_items``. Each table is written as a hive-partitioned Parquet
+dataset (``month=YYYY-MM/client=<name>/``) under ``output/parquet/``, with a
+``_manifest.json`` recording when it was built and how many rows each table
+holds. Rows without a parseable date go to ``month=unknown``.
+
+``query()`` reads a table with column projection and predicate pushdown. A
+date range prunes whole month partitions before any file is opened, and the
+remaining filters are evaluated inside the Parquet scan.
+
+Requires ``pyarrow`` (optional; ``HAVE_PYARROW`` is False without it).
+Run ``python parquet_store.py`` after a batch to refresh the datasets.
+"""
+import importlib.util
+import json
+import os
+import shutil
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from dedupe import DedupeIndex
+from json_folder import JsonFolder
+from ledger_store import TransactionStore
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# pandas and pyarrow are imported where first needed, so the dashboard can
+# import this module without paying for them at startup
+HAVE_PYARROW = importlib.util.find_spec('pyarrow') is not None  # optional dependency
+
+DEFAULT_DATASET_DIR = 'output/parquet'
+MANIFEST_FILE = '_manifest.json'
+UNKNOWN = 'unknown'
+
+# Column holding each table's date (used for month partitioning and date filters)
+DATE_COLUMNS = {
+    'transactions': 'date',
+    'receipts': 'transaction_date',
+    'receipt_items': 'transaction_date',
+    'invoices': 'invoice_date',
+    'invoice_items': 'invoice_date',
+}
+TABLES = tuple(DATE_COLUMNS)
+
+
+def _require_pyarrow():
+    if not HAVE_PYARROW:
+        raise RuntimeError('pyarrow is required for Parquet datasets (pip install pyarrow)')
+
+
+def _money(values: 'pd.Series') -> 'pd.Series':
+    """Amounts that may be strings like "$1,234.56" as floats (0.0 when unparseable)."""
+    import pandas as pd
+    if not pd.api.types.is_numeric_dtype(values):
+        values = values.astype(str).str.replace(r'[^0-9\.\-]', '', regex=True)
+    return pd.to_numeric(values, errors='coerce').fillna(0.0)
+
+
+def _text(values: 'pd.Series') -> 'pd.Series':
+    return values.fillna('').astype(str)
+
+
+def _partition_keys(frame: 'pd.DataFrame', date_column: str, client: 'pd.Series') -> 'pd.DataFrame':
+    import pandas as pd
+    dates = pd.to_datetime(frame[date_column], errors='coerce')
+    frame[date_column] = dates
+    frame['month'] = dates.dt.strftime('%Y-%m').fillna(UNKNOWN)
+    client = _text(client).str.strip()
+    frame['client'] = client.where(client != '', UNKNOWN)
+    return frame
+
+
+def transactions_frame(statements: List[Dict[str, Any]]) -> 'pd.DataFrame':
+    """One row per transaction, with account, statement metadata and a duplicate flag."""
+    import pandas as pd
+    store = TransactionStore.from_statements(statements)
+    duplicates = DedupeIndex(store).update()
+    slots = store.slots
+    statement_of_row = store.slot_statement[slots]
+    holders = np.array([(s['metadata'] or {}).get('account_holder') or '' for s in store.statements] or [''], dtype=object)
+    banks = np.array([(s['metadata'] or {}).get('bank_name') or '' for s in store.statements] or [''], dtype=object)
+    text = np.array(store.text_pool.values(), dtype=object)
+    frame = pd.DataFrame({
+        'statement': statement_of_row,
+        'bank_name': banks[statement_of_row],
+        'account_number': np.array(store.account_pool.values(), dtype=object)[store.account_codes],
+        'account_type': text[store.slot_account_type[slots]],
+        'date': store.dates.astype('datetime64[ns]'),
+        'description': np.array(store.description_pool.values(), dtype=object)[store.description_codes],
+        'deposit': store.deposits,
+        'withdrawal': store.withdrawals,
+        'running_balance': store.running_balances,
+        'check_number': text[store.check_codes],
+        'category': text[store.category_codes],
+        'is_duplicate': duplicates,
+    })
+    return _partition_keys(frame, 'date', pd.Series(holders[statement_of_row]))
+
+
+def receipt_frames(documents) -> Dict[str, 'pd.DataFrame']:
+    receipts, items = [], []
+    for doc_id, records in documents:
+        for i, receipt in enumerate(records):
+            receipt_id = f'{doc_id}#{i}'
+            receipts.append({
+                'receipt_id': receipt_id,
+                'document': doc_id,
+                'merchant_name': receipt.get('merchant_name'),
+                'transaction_date': receipt.get('transaction_date'),
+                'subtotal': receipt.get('subtotal'),
+                'tax': receipt.get('tax'),
+                'tip': receipt.get('tip'),
+                'total': receipt.get('total'),
+                'client': receipt.get('client') or '',
+            })
+            for item in receipt.get('items') or []:
+                items.append({
+                    'receipt_id': receipt_id,
+                    'transaction_date': receipt.get('transaction_date'),
+                    'description': item.get('description'),
+                    'quantity': item.get('quantity'),
+                    'price': item.get('price'),
+                    'total_price': item.get('total_price'),
+                    'client': receipt.get('client') or '',
+                })
+    import pandas as pd
+    receipts = pd.DataFrame(receipts, columns=['receipt_id', 'document', 'merchant_name', 'transaction_date',
+                                               'subtotal', 'tax', 'tip', 'total', 'client'])
+    items = pd.DataFrame(items, columns=['receipt_id', 'transaction_date', 'description', 'quantity',
+                                         'price', 'total_price', 'client'])
+    for col in ('subtotal', 'tax', 'tip', 'total'):
+        receipts[col] = _money(receipts[col])
+    for col in ('quantity', 'price', 'total_price'):
+        items[col] = _money(items[col])
+    receipts['merchant_name'] = _text(receipts['merchant_name'])
+    items['description'] = _text(items['description'])
+    return {
+        'receipts': _partition_keys(receipts, 'transaction_date', receipts.pop('client')),
+        'receipt_items': _partition_keys(items, 'transaction_date', items.pop('client')),
+    }
+
+
+def invoice_frames(documents) -> Dict[str, 'pd.DataFrame']:
+    invoices, items = [], []
+    for doc_id, records in documents:
+        for i, invoice in enumerate(records):
+            invoice_key = f'{doc_id}#{i}'
+            invoices.append({
+                'invoice_key': invoice_key,
+                'document': doc_id,
+                'invoice_id': invoice.get('invoice_id'),
+                'vendor_name': invoice.get('vendor_name'),
+                'customer_name': invoice.get('customer_name'),
+                'invoice_date': invoice.get('invoice_date'),
+                'due_date': invoice.get('due_date'),
+                'subtotal': invoice.get('subtotal'),
+                'total_tax': invoice.get('total_tax'),
+                'invoice_total': invoice.get('invoice_total'),
+            })
+            for item in invoice.get('items') or []:
+                items.append({
+                    'invoice_key': invoice_key,
+                    'invoice_date': invoice.get('invoice_date'),
+                    'customer_name': invoice.get('customer_name'),
+                    'description': item.get('description'),
+                    'quantity': item.get('quantity'),
+                    'unit_price': item.get('unit_price'),
+                    'amount': item.get('amount'),
+                })
+    import pandas as pd
+    invoices = pd.DataFrame(invoices, columns=['invoice_key', 'document', 'invoice_id', 'vendor_name', 'customer_name',
+                                               'invoice_date', 'due_date', 'subtotal', 'total_tax', 'invoice_total'])
+    items = pd.DataFrame(items, columns=['invoice_key', 'invoice_date', 'customer_name', 'description',
+                                         'quantity', 'unit_price', 'amount'])
+    for col in ('subtotal', 'total_tax', 'invoice_total'):
+        invoices[col] = _money(invoices[col])
+    for col in ('quantity', 'unit_price', 'amount'):
+        items[col] = _money(items[col])
+    for frame, cols in ((invoices, ('invoice_id', 'vendor_name', 'customer_name', 'due_date')), (items, ('description',))):
+        for col in cols:
+            frame[col] = _text(frame[col])
+    return {
+        'invoices': _partition_keys(invoices, 'invoice_date', invoices['customer_name']),
+        'invoice_items': _partition_keys(items, 'invoice_date', items.pop('customer_name')),
+    }
+
+
+def _partitioning():
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    return ds.partitioning(pa.schema([('month', pa.string()), ('client', pa.string())]), flavor='hive')
+
+
+def write_table(frame: 'pd.DataFrame', root: str, name: str) -> int:
+    """Write ``frame`` as dataset ``root/name``, replacing the previous one; returns the row count."""
+    _require_pyarrow()
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    target = os.path.join(root, name)
+    staging = os.path.join(root, f'.{name}.tmp')
+    shutil.rmtree(staging, ignore_errors=True)
+    ds.write_dataset(
+        pa.Table.from_pandas(frame, preserve_index=False), staging, format='parquet',
+        partitioning=_partitioning(), existing_data_behavior='overwrite_or_ignore',
+    )
+    retired = os.path.join(root, f'.{name}.old')
+    shutil.rmtree(retired, ignore_errors=True)
+    if os.path.exists(target):
+        os.replace(target, retired)
+    os.replace(staging, target)
+    shutil.rmtree(retired, ignore_errors=True)
+    return len(frame)
+
+
+def compact(statements: List[Dict[str, Any]], receipt_documents, invoice_documents,
+            root: str = DEFAULT_DATASET_DIR) -> Dict[str, Any]:
+    """Rewrite all five datasets from the given documents; returns the manifest."""
+    _require_pyarrow()
+    os.makedirs(root, exist_ok=True)
+    frames = {'transactions': transactions_frame(statements)}
+    frames.update(receipt_frames(receipt_documents))
+    frames.update(invoice_frames(invoice_documents))
+    manifest = {
+        'compacted_at': datetime.now().isoformat(),
+        'rows': {name: write_table(frame, root, name) for name, frame in frames.items()},
+    }
+    tmp = os.path.join(root, MANIFEST_FILE + '.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, os.path.join(root, MANIFEST_FILE))
+    return manifest
+
+
+def compact_output(root: str = DEFAULT_DATASET_DIR) -> Dict[str, Any]:
+    """Compact the analyzer outputs currently under ``output/``."""
+    # Imported lazily so the batch processors do not pull in Flask at import time
+    from app import load_bank_statements
+
+    return compact(
+        load_bank_statements(),
+        JsonFolder('output/receipts', '_receipt.json', label='receipt file').documents(),
+        JsonFolder('output/invoices', '_invoice.json', label='invoice file').documents(),
+        root,
+    )
+
+
+def read_manifest(root: str = DEFAULT_DATASET_DIR) -> Optional[Dict[str, Any]]:
+    try:
+        with open(os.path.join(root, MANIFEST_FILE), 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def query(table: str, columns: Optional[Sequence[str]] = None, start_date: Optional[str] = None,
+          end_date: Optional[str] = None, client: Optional[str] = None, root: str = DEFAULT_DATASET_DIR,
+          limit: Optional[int] = None) -> 'pd.DataFrame':
+    """Rows of ``table`` within the (inclusive) date range and client, restricted to ``columns``."""
+    _require_pyarrow()
+    if table not in DATE_COLUMNS:
+        raise ValueError(f'Unknown dataset {table!r}; expected one of {", ".join(TABLES)}')
+    import pandas as pd
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    dataset = ds.dataset(os.path.join(root, table), format='parquet', partitioning=_partitioning())
+    if columns:
+        unknown = [c for c in columns if c not in dataset.schema.names]
+        if unknown:
+            raise ValueError(f'Unknown column(s) for {table}: {", ".join(unknown)}')
+
+    date_col = DATE_COLUMNS[table]
+    month, date = ds.field('month'), ds.field(date_col)
+    predicate = None
+
+    def both(expr):
+        return expr if predicate is None else predicate & expr
+
+    if start_date or end_date:
+        predicate = both(month != UNKNOWN)
+    if start_date:
+        start = pd.Timestamp(start_date)
+        predicate = both((month >= start.strftime('%Y-%m')) & (date >= pa.scalar(start, pa.timestamp('ns'))))
+    if end_date:
+        end = pd.Timestamp(end_date)
+        # Whole end day included: compare against the next midnight
+        predicate = both((month <= end.strftime('%Y-%m')) & (date < pa.scalar(end + pd.Timedelta(days=1), pa.timestamp('ns'))))
+    if client:
+        predicate = both(ds.field('client') == client)
+
+    scanner_columns = list(columns) if columns else None
+    if limit is not None:
+        result = dataset.head(limit, columns=scanner_columns, filter=predicate)
+    else:
+        result = dataset.to_table(columns=scanner_columns, filter=predicate)
+    return result.to_pandas()
+
+
+if __name__ == '__main__':
+    manifest = compact_output()
+    print(f"Compacted Parquet datasets into {DEFAULT_DATASET_DIR}: " +
+          ', '.join(f'{name}={rows}' for name, rows in manifest['rows'].items()))
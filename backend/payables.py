@@ -0,0 +1,229 @@
+"""Vendor-level invoice aggregates and accounts-payable aging.
+
+Invoices are normalized once, when they are ingested: ``normalize_invoice``
+adds numeric ``*_value`` amounts and ISO ``*_iso`` dates next to the raw
+strings the analyzer extracted (``"$1,234.56"``, ``"Nov 10, 2024"``). Files
+written before this existed are parsed when first loaded, into the aggregates
+only: the loaded records are shared with the invoice routes and stay as read.
+
+``VendorAggregates`` keeps per-vendor totals, counts and open balances and is
+updated incrementally as invoice documents are appended. Each vendor's open
+invoices are kept sorted by due date with prefix sums, so the aging buckets
+(current, 0-30, 31-60, 61-90 and 90+ days past due) for any as-of date take
+a few binary searches per vendor instead of a pass over every invoice.
+"""
+import re
+import threading
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime
+from itertools import accumulate
+from typing import Any, Dict, List, Optional, Tuple
+
+from dedupe import normalize_description
+
+DEFAULT_TERMS_DAYS = 30  # due date assumed for invoices that do not state one
+AGING_BUCKETS = ('current', '0-30', '31-60', '61-90', '90+')
+
+_DATE_FORMATS = ('%Y-%m-%d', '%m/%d/%Y', '%d/%m/%Y', '%m/%d/%y', '%b %d, %Y', '%B %d, %Y', '%d %b %Y',
+                 '%d %B %Y', '%b %d %Y', '%B %d %Y', '%Y/%m/%d', '%d-%b-%Y')
+_CORPORATE_SUFFIXES = {'INC', 'LTD', 'LLC', 'CORP', 'CORPORATION', 'CO', 'COMPANY', 'LIMITED', 'PLC', 'GMBH'}
+
+
+def parse_amount(value: Any) -> float:
+    """Amounts such as ``1234.5`` or ``"$1,234.50"`` as floats (0.0 when unparseable)."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = re.sub(r'[^0-9\.\-]', '', str(value or ''))
+    try:
+        return float(text)
+    except ValueError:
+        return 0.0
+
+
+def parse_date(value: Any) -> str:
+    """A date string in one of the common invoice formats as ``YYYY-MM-DD``, or '' when unparseable."""
+    text = re.sub(r'\s+', ' ', str(value or '')).strip()
+    if not text:
+        return ''
+    if len(text) == 10 and text[4] == '-':
+        try:
+            return date.fromisoformat(text).isoformat()
+        except ValueError:
+            pass
+    for fmt in _DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date().isoformat()
+        except ValueError:
+            continue
+    return ''
+
+
+def vendor_key(name: str) -> str:
+    """Grouping key for a vendor name: ``"Contoso, Ltd."`` and ``"CONTOSO LTD"`` -> ``CONTOSO``."""
+    tokens = normalize_description(name).split()
+    while len(tokens) > 1 and tokens[-1] in _CORPORATE_SUFFIXES:
+        tokens.pop()
+    return ' '.join(tokens) or 'UNKNOWN'
+
+
+def invoice_values(invoice: Dict[str, Any]) -> Tuple[float, float, float, str, str]:
+    """``(total, tax, amount due, invoice date, due date)`` of an invoice, parsed unless already normalized."""
+    if 'invoice_total_value' in invoice:
+        return (invoice['invoice_total_value'], invoice.get('total_tax_value', 0.0),
+                invoice.get('amount_due_value', invoice['invoice_total_value']),
+                invoice.get('invoice_date_iso', ''), invoice.get('due_date_iso', ''))
+    total = parse_amount(invoice.get('invoice_total'))
+    # Without an extracted amount due the whole total is treated as open
+    due = invoice.get('amount_due')
+    return (total, parse_amount(invoice.get('total_tax')), parse_amount(due) if due not in (None, '') else total,
+            invoice.get('invoice_date_iso') or parse_date(invoice.get('invoice_date')),
+            invoice.get('due_date_iso') or parse_date(invoice.get('due_date')))
+
+
+def normalize_invoice(invoice: Dict[str, Any]) -> Dict[str, Any]:
+    """Add parsed amounts and dates to a new invoice record (in place), before it is saved."""
+    if 'invoice_total_value' in invoice:
+        return invoice
+    total, tax, due, issued, due_date = invoice_values(invoice)
+    invoice['subtotal_value'] = parse_amount(invoice.get('subtotal'))
+    invoice['total_tax_value'] = tax
+    invoice['invoice_total_value'] = total
+    invoice['amount_due_value'] = due
+    invoice['invoice_date_iso'] = issued
+    invoice['due_date_iso'] = due_date
+    return invoice
+
+
+class _Vendor:
+    __slots__ = ('name', 'invoices', 'total', 'tax', 'open', 'first_date', 'last_date',
+                 'due_days', 'due_amounts', '_prefix')
+
+    def __init__(self, name: str):
+        self.name = name
+        self.invoices = 0
+        self.total = 0.0
+        self.tax = 0.0
+        self.open = 0.0
+        self.first_date = ''
+        self.last_date = ''
+        self.due_days: List[int] = []  # sorted due dates (ordinals) of open invoices
+        self.due_amounts: List[float] = []
+        self._prefix: Optional[List[float]] = None
+
+    def add(self, invoice: Dict[str, Any]):
+        total, tax, open_amount, issued, due = invoice_values(invoice)
+        self.invoices += 1
+        self.total += total
+        self.tax += tax
+        if issued:
+            self.first_date = min(self.first_date or issued, issued)
+            self.last_date = max(self.last_date, issued)
+        if open_amount <= 0:
+            return
+        self.open += open_amount
+        if due:
+            day = date.fromisoformat(due).toordinal()
+        elif issued:
+            day = date.fromisoformat(issued).toordinal() + DEFAULT_TERMS_DAYS
+        else:
+            day = 0  # no dates at all: always in the oldest bucket
+        position = bisect_right(self.due_days, day)
+        self.due_days.insert(position, day)
+        self.due_amounts.insert(position, open_amount)
+        self._prefix = None
+
+    def _open_between(self, first_day: int, last_day: int) -> float:
+        """Open amount due on days ``first_day`` .. ``last_day`` (inclusive)."""
+        if self._prefix is None:
+            self._prefix = [0.0] + list(accumulate(self.due_amounts))
+        lo = bisect_left(self.due_days, first_day)
+        hi = bisect_right(self.due_days, last_day)
+        return self._prefix[hi] - self._prefix[lo] if hi > lo else 0.0
+
+    def aging(self, as_of: int) -> Dict[str, float]:
+        far = 10 ** 7
+        return {
+            'current': round(self._open_between(as_of + 1, far), 2),
+            '0-30': round(self._open_between(as_of - 30, as_of), 2),
+            '31-60': round(self._open_between(as_of - 60, as_of - 31), 2),
+            '61-90': round(self._open_between(as_of - 90, as_of - 61), 2),
+            '90+': round(self._open_between(-far, as_of - 91), 2),
+        }
+
+
+class VendorAggregates:
+    """Incrementally maintained per-vendor invoice aggregates over a ``JsonFolder`` of invoices."""
+
+    def __init__(self, folder):
+        self.folder = folder
+        self.generation = None
+        self.vendors: Dict[str, _Vendor] = {}
+        self._documents: Dict[str, list] = {}  # document id -> the records list folded in
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key_of(invoice: Dict[str, Any]) -> str:
+        return vendor_key(invoice.get('vendor_name') or 'Unknown')
+
+    def _add(self, invoices: List[Dict[str, Any]]):
+        for invoice in invoices:
+            key = self.key_of(invoice)
+            vendor = self.vendors.get(key)
+            if vendor is None:
+                vendor = self.vendors[key] = _Vendor(invoice.get('vendor_name') or 'Unknown')
+            vendor.add(invoice)
+
+    def update(self, refresh: bool = True) -> 'VendorAggregates':
+        """Fold in invoice documents added since the last update; rebuild when earlier ones changed.
+
+        Documents are compared by identity, so this holds however many times
+        the folder was refreshed in between (e.g. by the invoice loader).
+        """
+        with self._lock:
+            if refresh:
+                self.folder.refresh()
+            if self.folder.generation == self.generation:
+                return self
+            documents = self.folder.documents(refresh=False)
+            current = dict(documents)
+            if any(current.get(doc_id) is not records for doc_id, records in self._documents.items()):
+                self.vendors = {}
+                self._documents = {}
+            for doc_id, records in documents:
+                if doc_id not in self._documents:
+                    self._add(records)
+            self._documents = current
+            self.generation = self.folder.generation
+            return self
+
+    def summary(self, as_of: Optional[date] = None, vendor: str = '') -> List[Dict[str, Any]]:
+        """Per-vendor totals and aging as of ``as_of`` (default today), largest total first."""
+        day = (as_of or date.today()).toordinal()
+        needle = vendor.strip().upper()
+        rows = []
+        for key, v in self.vendors.items():
+            if needle and needle not in key:
+                continue
+            rows.append({
+                'vendor_key': key,
+                'vendor_name': v.name,
+                'invoice_count': v.invoices,
+                'total_amount': round(v.total, 2),
+                'total_tax': round(v.tax, 2),
+                'open_balance': round(v.open, 2),
+                'first_invoice_date': v.first_date,
+                'last_invoice_date': v.last_date,
+                'aging': v.aging(day),
+            })
+        rows.sort(key=lambda r: r['total_amount'], reverse=True)
+        return rows
+
+    @staticmethod
+    def aging_totals(rows: List[Dict[str, Any]]) -> Dict[str, float]:
+        return {bucket: round(sum(r['aging'][bucket] for r in rows), 2) for bucket in AGING_BUCKETS}
+
+
+def as_of_date(value: str) -> date:
+    """``YYYY-MM-DD`` (ValueError otherwise), or today when empty."""
+    value = (value or '').strip()
+    return date.fromisoformat(value) if value else date.today()
@@ -0,0 +1,339 @@
+"""Per-request stage timings, latency histograms and an opt-in sampling profiler.
+
+Request handlers mark stages with ``with stage('load'):`` (or the ``timed``
+decorator). Each stage records its self time, excluding nested stages, so
+the stages of one request add up to its total. Whatever is not covered by
+a stage is recorded as ``other``. At the end of a request every stage and
+the ``total`` go into a log-linear (HDR-style) histogram per route and
+stage. These are served as JSON by ``/debug/perf`` and in Prometheus text
+format by ``/metrics``.
+
+The sampling profiler is off unless ``PERF_PROFILING=1``. With it on, a
+request carrying ``?profile=1`` is sampled every ``PERF_SAMPLE_INTERVAL``
+seconds. Its stacks are saved in collapsed ("folded") format, which
+flamegraph.pl and speedscope turn into a flamegraph.
+
+Only the standard library is used, so both the Flask app and the FastAPI
+app can import this module.
+"""
+import contextvars
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+from typing import Dict, List, Optional, Tuple
+
+SUB_BUCKET_BITS = 7  # 64 linear sub-buckets per power of two: <1.6% relative error
+_HALF = 1 << (SUB_BUCKET_BITS - 1)
+
+# Prometheus bucket boundaries (seconds)
+PROMETHEUS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+PROFILE_DIR = os.getenv('PERF_PROFILE_DIR', 'output/profiles')
+
+
+class LatencyHistogram:
+    """Log-linear histogram of durations in microseconds (HdrHistogram-style bucketing)."""
+
+    def __init__(self):
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    @staticmethod
+    def _bucket(us: int) -> int:
+        shift = max(0, us.bit_length() - SUB_BUCKET_BITS)
+        return shift * _HALF + (us >> shift)
+
+    @staticmethod
+    def _upper(bucket: int) -> int:
+        """Largest microsecond value that falls in ``bucket``."""
+        shift = max(0, bucket // _HALF - 1)
+        return ((bucket - shift * _HALF + 1) << shift) - 1
+
+    def record(self, seconds: float):
+        us = max(0, int(seconds * 1e6))
+        bucket = self._bucket(us)
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, q: float) -> float:
+        """Upper bound (seconds) of the bucket holding the ``q``-th percentile."""
+        if not self.count:
+            return 0.0
+        target = max(1, int(round(q / 100.0 * self.count)))
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= target:
+                return min(self._upper(bucket) / 1e6, self.max)
+        return self.max
+
+    def count_le(self, seconds: float) -> int:
+        limit = seconds * 1e6
+        return sum(n for b, n in self.counts.items() if self._upper(b) <= limit)
+
+    def summary(self) -> Dict[str, float]:
+        ms = lambda s: round(s * 1000, 3)
+        return {
+            'count': self.count,
+            'mean_ms': ms(self.total / self.count) if self.count else 0.0,
+            'p50_ms': ms(self.percentile(50)),
+            'p90_ms': ms(self.percentile(90)),
+            'p99_ms': ms(self.percentile(99)),
+            'max_ms': ms(self.max),
+        }
+
+
+class PerfRegistry:
+    """Histograms keyed by (route, stage)."""
+
+    def __init__(self):
+        self._histograms: Dict[Tuple[str, str], LatencyHistogram] = {}
+        self._lock = threading.Lock()
+        self.profiles: List[str] = []
+
+    def record(self, route: str, stage_name: str, seconds: float):
+        with self._lock:
+            hist = self._histograms.get((route, stage_name))
+            if hist is None:
+                hist = self._histograms[(route, stage_name)] = LatencyHistogram()
+            hist.record(seconds)
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+    def snapshot(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        out: Dict[str, Dict[str, Dict[str, float]]] = {}
+        with self._lock:
+            for (route, stage_name), hist in sorted(self._histograms.items()):
+                out.setdefault(route, {})[stage_name] = hist.summary()
+        return out
+
+    def prometheus(self, prefix: str = 'aibk') -> str:
+        name = f'{prefix}_request_stage_seconds'
+        lines = [f'# HELP {name} Request time per route and stage.', f'# TYPE {name} histogram']
+        with self._lock:
+            for (route, stage_name), hist in sorted(self._histograms.items()):
+                labels = f'route="{_escape(route)}",stage="{_escape(stage_name)}"'
+                for le in PROMETHEUS_BUCKETS:
+                    lines.append(f'{name}_bucket{{{labels},le="{le}"}} {hist.count_le(le)}')
+                lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {hist.count}')
+                lines.append(f'{name}_sum{{{labels}}} {hist.total:.6f}')
+                lines.append(f'{name}_count{{{labels}}} {hist.count}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+PERF = PerfRegistry()
+
+
+class RequestTimer:
+    """Stage timings of one request."""
+
+    def __init__(self, route: str, registry: PerfRegistry = PERF):
+        self.route = route
+        self.registry = registry
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        self._children: List[float] = []  # time spent in nested stages, per open stage
+
+    def add(self, stage_name: str, seconds: float):
+        self.stages[stage_name] = self.stages.get(stage_name, 0.0) + seconds
+
+    def finish(self) -> Dict[str, float]:
+        total = time.perf_counter() - self.started
+        covered = sum(self.stages.values())
+        for stage_name, seconds in self.stages.items():
+            self.registry.record(self.route, stage_name, seconds)
+        self.registry.record(self.route, 'other', max(0.0, total - covered))
+        self.registry.record(self.route, 'total', total)
+        return dict(self.stages, total=total)
+
+
+_current: contextvars.ContextVar[Optional[RequestTimer]] = contextvars.ContextVar('perf_timer', default=None)
+
+
+def begin_request(route: str) -> contextvars.Token:
+    return _current.set(RequestTimer(route))
+
+
+def end_request(token: Optional[contextvars.Token]) -> Optional[Dict[str, float]]:
+    timer = _current.get()
+    if token is not None:
+        _current.reset(token)
+    return timer.finish() if timer is not None else None
+
+
+@contextmanager
+def stage(name: str):
+    """Time a block as stage ``name`` of the current request (no-op outside a request)."""
+    timer = _current.get()
+    if timer is None:
+        yield
+        return
+    timer._children.append(0.0)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        nested = timer._children.pop()
+        timer.add(name, elapsed - nested)
+        if timer._children:
+            timer._children[-1] += elapsed
+
+
+def timed(name: str):
+    """Decorator form of ``stage``."""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def server_timing(stages: Dict[str, float]) -> str:
+    """``Server-Timing`` header value, so browser dev tools show the stages."""
+    return ', '.join(f'{name.replace(" ", "_")};dur={seconds * 1000:.2f}' for name, seconds in stages.items())
+
+
+class Sampler:
+    """Samples the stacks of ``thread_ids`` (default: every other thread) into folded-stack counts."""
+
+    def __init__(self, thread_ids: Optional[List[int]] = None, interval: float = 0.001):
+        self.thread_ids = thread_ids
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='perf-sampler', daemon=True)
+
+    def _run(self):
+        me = threading.get_ident()
+        names = {t.ident: t.name for t in threading.enumerate()}
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == me or (self.thread_ids is not None and ident not in self.thread_ids):
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})')
+                    frame = frame.f_back
+                if self.thread_ids is None:
+                    stack.append(names.get(ident, str(ident)))
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def start(self) -> 'Sampler':
+        self._thread.start()
+        return self
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        self._thread.join()
+        return self.samples
+
+    def save(self, route: str, directory: str = PROFILE_DIR, registry: PerfRegistry = PERF) -> str:
+        """Write the samples in folded format; returns the file path."""
+        os.makedirs(directory, exist_ok=True)
+        slug = ''.join(c if c.isalnum() else '_' for c in route).strip('_') or 'root'
+        path = os.path.join(directory, f'{datetime.now().strftime("%Y%m%d_%H%M%S_%f")}_{slug}.folded')
+        with open(path, 'w') as f:
+            for stack, count in self.samples.most_common():
+                f.write(f'{stack} {count}\n')
+        registry.profiles = (registry.profiles + [path])[-20:]
+        return path
+
+
+def profiling_enabled() -> bool:
+    return os.getenv('PERF_PROFILING') == '1'
+
+
+def sample_interval() -> float:
+    try:
+        return float(os.getenv('PERF_SAMPLE_INTERVAL', '0.001'))
+    except ValueError:
+        return 0.001
+
+
+def init_flask(app, registry: PerfRegistry = PERF):
+    """Time every Flask request by route and stage; ``?profile=1`` samples it when profiling is enabled."""
+    from flask import g, request
+
+    @app.before_request
+    def _perf_begin():
+        rule = request.url_rule.rule if request.url_rule is not None else request.path
+        g.perf_token = begin_request(rule)
+        g.perf_sampler = None
+        if profiling_enabled() and request.args.get('profile') == '1':
+            g.perf_sampler = Sampler([threading.get_ident()], sample_interval()).start()
+
+    @app.after_request
+    def _perf_headers(response):
+        timer = _current.get()
+        if timer is not None and timer.stages:
+            response.headers['Server-Timing'] = server_timing(timer.stages)
+        sampler = g.pop('perf_sampler', None)
+        if sampler is not None:
+            sampler.stop()
+            response.headers['X-Profile'] = sampler.save(timer.route if timer else request.path, registry=registry)
+        return response
+
+    @app.teardown_request
+    def _perf_end(exc):
+        sampler = g.pop('perf_sampler', None)
+        if sampler is not None:
+            sampler.stop()
+        end_request(g.pop('perf_token', None))
+
+    # Time response serialization as its own stage
+    provider = app.json
+    original = provider.response
+
+    def response(*args, **kwargs):
+        with stage('jsonify'):
+            return original(*args, **kwargs)
+    provider.response = response
+
+
+def init_fastapi(app, registry: PerfRegistry = PERF):
+    """FastAPI/Starlette counterpart of ``init_flask`` (stages, histograms, optional sampling)."""
+
+    @app.middleware('http')
+    async def _perf_middleware(request, call_next):
+        token = begin_request(request.url.path)
+        sampler = None
+        if profiling_enabled() and request.query_params.get('profile') == '1':
+            # Sync endpoints run on worker threads, so sample every thread
+            sampler = Sampler(None, sample_interval()).start()
+        try:
+            response = await call_next(request)
+        except Exception:
+            if sampler is not None:
+                sampler.stop()
+            end_request(token)
+            raise
+        timer = _current.get()
+        route = request.scope.get('route')
+        if timer is not None and route is not None:
+            timer.route = getattr(route, 'path', timer.route)
+        if timer is not None and timer.stages:
+            response.headers['Server-Timing'] = server_timing(timer.stages)
+        if sampler is not None:
+            sampler.stop()
+            response.headers['X-Profile'] = sampler.save(timer.route if timer else request.url.path, registry=registry)
+        end_request(token)
+        return response
@@ -0,0 +1,551 @@
+"""Local pre-flight inspection of input files before they are sent for analysis.
+
+Every analyze call is billed, so ``DocumentBatchProcessor`` first inspects
+the files under ``input/*`` on a process pool, using only the standard
+library:
+
+- validation: zero-byte files, unsupported formats (by magic bytes, not
+  extension), corrupt PDFs/PNGs/JPEGs/TIFFs, password-protected
+  PDFs (an encrypted PDF that opens without a password, e.g. one with print
+  restrictions only, is fine), and files over the service limits. A PDF
+  without an ``%%EOF`` marker, or an encrypted one whose pages cannot be
+  counted, only gets a warning: readers recover most;
+- pages: counted from the PDF page tree (including compressed object
+  streams) or the TIFF directory chain, and passed on to the polling loop;
+- blank pages (no text, drawing, inline image or non-blank image; an 8-bit
+  Flate or JPEG image counts as blank when it compresses to almost nothing,
+  other encodings such as JBIG2 or CCITT scans always count as content) and
+  duplicate pages (same content and images, or nearly the same text). A
+  document whose pages all look blank is still analyzed, with a warning;
+- a cheap document-type check from keywords in the PDF text, helped by
+  the file name, so a file dropped into the wrong folder is analyzed with
+  the right model (scans without a text layer stay where they are);
+- files with identical bytes in the same batch are analyzed once.
+
+``inspect_files`` returns one report per file and ``route`` splits them into
+viable files per document type and rejected ones, which the batch summary
+lists under ``skipped``::
+
+    python preflight.py                 # inspect input/* and print the reports
+    python preflight.py --input other_input --workers 4
+"""
+import argparse
+import hashlib
+import os
+import re
+import struct
+import threading
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+DOCUMENT_TYPES = ('bank_statements', 'receipts', 'invoices')
+MAX_BYTES = 500 * 1024 * 1024  # service limit per document (paid tier)
+MAX_PAGES = 2000
+NEAR_DUPLICATE = 0.9  # Jaccard similarity of page words
+MIN_WORDS = 20  # pages with fewer words are only compared exactly
+# 8-bit images that compress below this many bytes per pixel are taken as blank
+BLANK_BYTES_PER_PIXEL = {'flate': 0.002, 'jpeg': 0.005}
+
+FORMATS = (
+    (b'%PDF-', 'pdf'),
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'\xff\xd8\xff', 'jpeg'),
+    (b'II*\x00', 'tiff'),
+    (b'MM\x00*', 'tiff'),
+)
+
+TYPE_KEYWORDS = {
+    kind: re.compile(r'\b(?:' + '|'.join(words) + r')\b') for kind, words in {
+        'bank_statements': ('statement period', 'opening balance', 'closing balance', 'beginning balance',
+                            'ending balance', 'account number', 'withdrawals', 'deposits', 'account summary'),
+        'invoices': ('invoice', 'bill to', 'due date', 'amount due', 'remit to', 'payment terms',
+                     'purchase order', 'ship to'),
+        'receipts': ('receipt', 'subtotal', 'cashier', 'change due', 'thank you', 'cash tendered', 'items sold'),
+    }.items()
+}
+NAME_HINTS = {
+    'bank_statements': re.compile(r'statement|estatement|bank', re.I),
+    'invoices': re.compile(r'invoice|inv[_-]?\d', re.I),
+    'receipts': re.compile(r'receipt|rcpt', re.I),
+}
+MIN_SCORE = 3  # distinct keywords needed before a file is routed away from its folder
+NAME_SCORE = 2  # a matching file name counts as this many hits
+
+
+# ----------------------------------------------------------------------
+# PDF objects
+# ----------------------------------------------------------------------
+
+_OBJECT = re.compile(rb'(\d+)\s+\d+\s+obj\b(.*?)\bendobj', re.S)
+_STREAM = re.compile(rb'\bstream\r?\n')
+_REF = re.compile(rb'(\d+)\s+\d+\s+R\b')
+_PAGE = re.compile(rb'/Type\s*/Page(?![a-zA-Z])')
+_PAGES = re.compile(rb'/Type\s*/Pages\b')
+_LITERAL = re.compile(rb'\((?:\\.|[^\\()]|\((?:\\.|[^\\()])*\))*\)', re.S)
+_TEXT_SHOW = re.compile(rb"(?:\bT[jJ]|')\s")
+_PAINT = re.compile(rb'(?:^|\s)(?:f\*?|F|B\*?|b\*?|S|s|sh)(?=\s|$)')
+_INLINE_IMAGE = re.compile(rb'(?:^|\s)BI\s.*?\sID\s', re.S)
+_DO = re.compile(rb'/([^\s/\[\]<>()]+)\s+Do\b')
+_PAD = bytes.fromhex('28BF4E5E4E758A4164004E56FFFA01082E2E00B6D0683E802F0CA9FE6453697A')
+_ESCAPES = {b'n': b'\n', b'r': b'\r', b't': b'\t', b'b': b'\b', b'f': b'\f'}
+
+
+def _unescape(literal: bytes) -> bytes:
+    """Bytes of a PDF literal string without its parentheses."""
+    def replace(match):
+        code = match.group(1)
+        if code[:1].isdigit():
+            return bytes([int(code, 8) & 0xFF])
+        return _ESCAPES.get(code, code if code != b'\n' else b'')
+    return re.sub(rb'\\([0-7]{1,3}|.)', replace, literal[1:-1], flags=re.S)
+
+
+def _string(value: Optional[bytes]) -> bytes:
+    """A PDF string token (``(...)`` or ``<hex>``) as bytes."""
+    if not value:
+        return b''
+    value = value.strip()
+    if value.startswith(b'<'):
+        digits = re.sub(rb'[^0-9A-Fa-f]', b'', value)
+        return bytes.fromhex((digits + b'0' * (len(digits) % 2)).decode())
+    return _unescape(value)
+
+
+def _key(dictionary: bytes, name: bytes) -> Optional[bytes]:
+    """The raw value token of ``/name`` in a dictionary (number, reference, name, string or array)."""
+    match = re.search(rb'/' + name + rb'(?![A-Za-z0-9])\s*(\d+\s+\d+\s+R\b|\[[^\]]*\]|<<|<[^>]*>|'
+                      rb'\((?:\\.|[^\\)])*\)|/[^\s/\[\]<>()]+|[-+]?[\d.]+|true|false)', dictionary, re.S)
+    if not match:
+        return None
+    value = match.group(1)
+    if value == b'<<':
+        # Nested dictionary: up to its matching >>
+        depth, i = 0, match.start(1)
+        while i < len(dictionary) - 1:
+            pair = dictionary[i:i + 2]
+            if pair == b'<<':
+                depth += 1
+                i += 2
+            elif pair == b'>>':
+                depth -= 1
+                i += 2
+                if depth == 0:
+                    return dictionary[match.start(1):i]
+            else:
+                i += 1
+        return dictionary[match.start(1):]
+    return value
+
+
+class _Pdf:
+    """Uncompressed objects of a PDF plus the objects packed in its object streams."""
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self.objects: Dict[int, Tuple[bytes, Optional[bytes]]] = {}  # number -> (dictionary, raw stream)
+        for match in _OBJECT.finditer(data):
+            body = match.group(2)
+            stream = _STREAM.search(body)
+            if stream:
+                end = body.rfind(b'endstream')
+                self.objects[int(match.group(1))] = (body[:stream.start()], body[stream.end():end].rstrip(b'\r\n'))
+            else:
+                self.objects[int(match.group(1))] = (body, None)
+        for dictionary, raw in list(self.objects.values()):
+            if raw is not None and b'/ObjStm' in dictionary:
+                self._unpack(dictionary, raw)
+
+    def _unpack(self, dictionary: bytes, raw: bytes):
+        data = self.decode(dictionary, raw)
+        first = _key(dictionary, b'First')
+        if data is None or first is None:
+            return
+        first = int(first)
+        header = [int(v) for v in data[:first].split()]
+        offsets = list(zip(header[0::2], header[1::2]))
+        for i, (number, offset) in enumerate(offsets):
+            end = first + offsets[i + 1][1] if i + 1 < len(offsets) else len(data)
+            self.objects.setdefault(number, (data[first + offset:end], None))
+
+    @staticmethod
+    def decode(dictionary: bytes, raw: Optional[bytes]) -> Optional[bytes]:
+        """Stream data with FlateDecode undone; None when it cannot be decoded."""
+        if raw is None:
+            return None
+        if b'/FlateDecode' not in dictionary and b'/Fl ' not in dictionary:
+            return raw
+        try:
+            return zlib.decompressobj().decompress(raw)
+        except zlib.error:
+            return None
+
+    def get(self, reference: Optional[bytes]) -> Tuple[bytes, Optional[bytes]]:
+        """The object a ``N 0 R`` token points to, or the token itself when it is a direct value."""
+        if reference is None:
+            return b'', None
+        match = _REF.match(reference)
+        if match:
+            return self.objects.get(int(match.group(1)), (b'', None))
+        return reference, None
+
+    def pages(self) -> List[bytes]:
+        """Page dictionaries in page-tree order (object order when the tree cannot be followed)."""
+        roots = [d for d, _ in self.objects.values() if _PAGES.search(d) and _key(d, b'Parent') is None]
+        ordered: List[bytes] = []
+        if roots:
+            stack, seen = [roots[0]], set()
+            while stack and len(ordered) <= MAX_PAGES:
+                node = stack.pop()
+                if _PAGES.search(node):
+                    kids = [int(n) for n in _REF.findall(_key(node, b'Kids') or b'')]
+                    stack.extend(self.objects.get(n, (b'', None))[0] for n in reversed(kids) if n not in seen)
+                    seen.update(kids)
+                elif _PAGE.search(node):
+                    ordered.append(node)
+        if not ordered:
+            ordered = [d for d, _ in self.objects.values() if _PAGE.search(d) and not _PAGES.search(d)]
+        return ordered
+
+    def declared_pages(self) -> int:
+        counts = [_key(d, b'Count') for d, _ in self.objects.values() if _PAGES.search(d)]
+        return max([int(float(c)) for c in counts if c] or [0])
+
+    def resources(self, page: bytes) -> bytes:
+        """A page's resource dictionary, inherited from its parents when the page has none."""
+        node = page
+        for _ in range(32):
+            value = _key(node, b'Resources')
+            if value is not None:
+                return self.get(value)[0]
+            parent = _key(node, b'Parent')
+            if parent is None:
+                break
+            node = self.get(parent)[0]
+        return b''
+
+
+def _opens_without_password(pdf: _Pdf) -> Optional[bool]:
+    """Whether an encrypted PDF opens with an empty user password (None when it cannot be checked)."""
+    data = pdf.data
+    reference = re.search(rb'/Encrypt\s+(\d+\s+\d+\s+R)', data)
+    encrypt = pdf.get(reference.group(1))[0] if reference else b''
+    if not encrypt or b'/Standard' not in encrypt:
+        return None  # public-key or unknown security handler
+    revision = int(_key(encrypt, b'R') or b'0')
+    owner, user = _string(_key(encrypt, b'O')), _string(_key(encrypt, b'U'))
+    if revision == 5:
+        return hashlib.sha256(user[32:40]).digest() == user[:32]
+    if revision not in (2, 3, 4):
+        return None  # revision 6 needs AES, which the standard library lacks
+    identifier = re.search(rb'/ID\s*\[\s*(<[0-9A-Fa-f\s]*>|\((?:\\.|[^\\)])*\))', data)
+    first_id = _string(identifier.group(1)) if identifier else b''
+    length = int(_key(encrypt, b'Length') or b'40') // 8 if revision > 2 else 5
+    permissions = struct.pack('<I', int(_key(encrypt, b'P') or b'0') & 0xFFFFFFFF)
+    seed = _PAD + owner[:32] + permissions + first_id
+    if revision == 4 and _key(encrypt, b'EncryptMetadata') == b'false':
+        seed += b'\xff\xff\xff\xff'
+    key = hashlib.md5(seed).digest()
+    if revision > 2:
+        for _ in range(50):
+            key = hashlib.md5(key[:length]).digest()
+    key = key[:length]
+    if revision == 2:
+        return _rc4(key, _PAD) == user[:32]
+    check = _rc4(key, hashlib.md5(_PAD + first_id).digest())
+    for i in range(1, 20):
+        check = _rc4(bytes(b ^ i for b in key), check)
+    return check == user[:16]
+
+
+def _rc4(key: bytes, data: bytes) -> bytes:
+    state = list(range(256))
+    j = 0
+    for i in range(256):
+        j = (j + state[i] + key[i % len(key)]) & 0xFF
+        state[i], state[j] = state[j], state[i]
+    out = bytearray()
+    i = j = 0
+    for byte in data:
+        i = (i + 1) & 0xFF
+        j = (j + state[i]) & 0xFF
+        state[i], state[j] = state[j], state[i]
+        out.append(byte ^ state[(state[i] + state[j]) & 0xFF])
+    return bytes(out)
+
+
+def _blank_image(dictionary: bytes, raw: Optional[bytes]) -> bool:
+    """Whether an image XObject compresses to almost nothing; only judged for 8-bit Flate or JPEG images.
+
+    Bilevel scans (JBIG2, CCITT, 1-bit masks) hold a whole page of text in a
+    few bytes per thousand pixels, so they always count as content.
+    """
+    filters = set(re.findall(rb'/([A-Za-z0-9]+)', _key(dictionary, b'Filter') or b''))
+    if not filters or not filters <= {b'FlateDecode', b'Fl', b'DCTDecode', b'DCT'}:
+        return False
+    if _key(dictionary, b'ImageMask') == b'true':
+        return False
+    try:
+        pixels = int(_key(dictionary, b'Width') or 0) * int(_key(dictionary, b'Height') or 0)
+        bits = int(_key(dictionary, b'BitsPerComponent') or 8)
+    except ValueError:
+        return False
+    if not pixels or raw is None or bits < 8:
+        return False
+    kind = 'jpeg' if filters & {b'DCTDecode', b'DCT'} else 'flate'
+    return len(raw) / pixels < BLANK_BYTES_PER_PIXEL[kind]
+
+
+def _inspect_pdf(data: bytes, report: Dict[str, Any]) -> str:
+    """Fill in PDF page details; returns the page text used for the type check."""
+    if data.rfind(b'%%EOF') == -1:
+        # Readers (and the service) recover many such files; only a missing page tree rejects one
+        report['warnings'].append('no %%EOF marker (possibly truncated)')
+    pdf = _Pdf(data)
+    if re.search(rb'/Encrypt\s+\d+\s+\d+\s+R', data):
+        report['encrypted'] = True
+        if _opens_without_password(pdf) is False:
+            report['reason'] = 'password protected'
+            return ''
+    pages = pdf.pages()
+    report['pages'] = len(pages) or pdf.declared_pages()
+    if not report['pages']:
+        if report.get('encrypted'):
+            # e.g. the page tree sits in an encrypted object stream; the service can still read it
+            report['pages'] = 1
+            report['warnings'].append('encrypted page tree: page count unknown')
+        else:
+            report['reason'] = 'corrupt: no pages found'
+        return ''
+    if report.get('encrypted'):
+        return ''  # contents are encrypted; only the page count is known
+
+    texts, fingerprints, words = [], {}, []
+    for number, page in enumerate(pages, start=1):
+        content, readable = b'', True
+        for reference in _REF.findall(_key(page, b'Contents') or b''):
+            dictionary, raw = pdf.objects.get(int(reference), (b'', None))
+            decoded = pdf.decode(dictionary, raw)
+            readable &= decoded is not None
+            content += (decoded or b'') + b'\n'
+        xobjects = pdf.get(_key(pdf.resources(page), b'XObject'))[0]
+        images, blank_images = [], True
+        for name in _DO.findall(content):
+            dictionary, raw = pdf.get(_key(xobjects, name))
+            images.append(hashlib.sha1(raw or dictionary).digest())
+            blank_images &= b'/Image' in dictionary and _blank_image(dictionary, raw)
+        shows_text = bool(_TEXT_SHOW.search(content))
+        text = b' '.join(_unescape(s) for s in _LITERAL.findall(content)) if shows_text else b''
+        page_words = set(text.decode('latin-1').lower().split())
+        if (readable and not shows_text and not _PAINT.search(content) and blank_images
+                and not _INLINE_IMAGE.search(content)):
+            report['blank_pages'].append(number)
+        else:
+            fingerprint = hashlib.sha1(content + b''.join(images)).hexdigest()
+            if fingerprint in fingerprints:
+                report['duplicate_pages'].append([number, fingerprints[fingerprint]])
+            else:
+                fingerprints[fingerprint] = number
+                for other, other_words in words:
+                    if len(page_words) >= MIN_WORDS and len(other_words) >= MIN_WORDS and (
+                            len(page_words & other_words) / len(page_words | other_words) >= NEAR_DUPLICATE):
+                        report['duplicate_pages'].append([number, other])
+                        break
+                words.append((number, page_words))
+        texts.append(text.decode('latin-1'))
+    if len(report['blank_pages']) == report['pages']:
+        report['warnings'].append('every page looks blank')
+    return ' '.join(texts)
+
+
+def _inspect_png(data: bytes, report: Dict[str, Any]):
+    if len(data) < 33 or data[12:16] != b'IHDR' or b'IEND' not in data[-12:]:
+        report['reason'] = 'corrupt: truncated PNG'
+        return
+    width, height = struct.unpack('>II', data[16:24])
+    idat = sum(struct.unpack('>I', data[m.start() - 4:m.start()])[0] for m in re.finditer(b'IDAT', data))
+    # Only 8-bit images: bilevel scans compress to a few bytes per thousand pixels
+    if width * height and data[24] >= 8 and idat / (width * height) < BLANK_BYTES_PER_PIXEL['flate']:
+        report['blank_pages'].append(1)
+        report['warnings'].append('image looks blank')
+
+
+def _inspect_jpeg(data: bytes, report: Dict[str, Any]):
+    if b'\xff\xd9' not in data[-64:]:
+        report['reason'] = 'corrupt: truncated JPEG'
+        return
+    frame = re.search(rb'\xff[\xc0-\xc3\xc5-\xc7\xc9-\xcb\xcd-\xcf]..\x08(..)(..)', data, re.S)
+    if frame:
+        pixels = struct.unpack('>H', frame.group(1))[0] * struct.unpack('>H', frame.group(2))[0]
+        if pixels and len(data) / pixels < BLANK_BYTES_PER_PIXEL['jpeg']:
+            report['blank_pages'].append(1)
+            report['warnings'].append('image looks blank')
+
+
+def _inspect_tiff(data: bytes, report: Dict[str, Any]):
+    endian = '<' if data[:2] == b'II' else '>'
+    offset, pages, seen = struct.unpack(endian + 'I', data[4:8])[0], 0, set()
+    while offset and offset not in seen and pages <= MAX_PAGES:
+        seen.add(offset)
+        if offset + 2 > len(data):
+            report['reason'] = 'corrupt: TIFF directory out of range'
+            return
+        entries = struct.unpack(endian + 'H', data[offset:offset + 2])[0]
+        end = offset + 2 + 12 * entries
+        if end + 4 > len(data):
+            report['reason'] = 'corrupt: TIFF directory out of range'
+            return
+        pages += 1
+        offset = struct.unpack(endian + 'I', data[end:end + 4])[0]
+    report['pages'] = pages
+
+
+def detect_type(text: str, filename: str) -> Tuple[Optional[str], Dict[str, int]]:
+    """Document type suggested by keywords in the text and file name, or None when unclear."""
+    text = text.lower()
+    scores = {kind: len(set(pattern.findall(text))) for kind, pattern in TYPE_KEYWORDS.items()}
+    for kind, hint in NAME_HINTS.items():
+        if hint.search(filename):
+            scores[kind] += NAME_SCORE
+    ranked = sorted(scores, key=scores.get, reverse=True)
+    best, runner_up = scores[ranked[0]], scores[ranked[1]]
+    if best >= MIN_SCORE and best >= 2 * runner_up:
+        return ranked[0], scores
+    return None, scores
+
+
+def inspect_file(path: str, folder_type: Optional[str] = None) -> Dict[str, Any]:
+    """Pre-flight report for one file; ``reason`` is set when it should not be analyzed."""
+    started = time.perf_counter()
+    report: Dict[str, Any] = {
+        'file': path, 'folder_type': folder_type, 'type': folder_type, 'detected_type': None, 'format': None,
+        'bytes': 0, 'sha256': None, 'pages': 0, 'blank_pages': [], 'duplicate_pages': [], 'encrypted': False,
+        'reason': None, 'warnings': [],
+    }
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except OSError as e:
+        report['reason'] = f'unreadable: {e}'
+        return report
+    report['bytes'] = len(data)
+    report['sha256'] = hashlib.sha256(data).hexdigest()
+    report['format'] = next((fmt for magic, fmt in FORMATS if data.startswith(magic)), None)
+    text = ''
+    if not data:
+        report['reason'] = 'empty file'
+    elif report['format'] is None:
+        report['reason'] = 'unsupported format'
+    elif len(data) > MAX_BYTES:
+        report['reason'] = f'too large: {len(data)} bytes'
+    else:
+        report['pages'] = 1
+        try:
+            if report['format'] == 'pdf':
+                text = _inspect_pdf(data, report)
+            elif report['format'] == 'png':
+                _inspect_png(data, report)
+            elif report['format'] == 'jpeg':
+                _inspect_jpeg(data, report)
+            else:
+                _inspect_tiff(data, report)
+        except Exception as e:
+            # A structure these parsers do not follow is left for the service to judge
+            print(f"Error inspecting {path}: {e}")
+        if report['reason'] is None and report['pages'] > MAX_PAGES:
+            report['reason'] = f"too many pages: {report['pages']}"
+    report['detected_type'], report['type_scores'] = detect_type(text, os.path.basename(path))
+    report['seconds'] = round(time.perf_counter() - started, 4)
+    return report
+
+
+def _inspect_item(item: Tuple[str, Optional[str]]) -> Dict[str, Any]:
+    return inspect_file(*item)
+
+
+def inspect_files(items: Sequence[Tuple[str, Optional[str]]], workers: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Reports for ``(path, folder type)`` pairs, inspected in parallel on a process pool.
+
+    Later copies of a file already in the batch (same bytes) are rejected.
+    """
+    workers = workers or os.cpu_count() or 1
+    # As in json_folder.load_many, worker processes are only forked from single-threaded callers
+    if workers == 1 or len(items) < 4 or threading.active_count() > 1:
+        reports = [inspect_file(*item) for item in items]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            reports = list(pool.map(_inspect_item, items, chunksize=max(1, len(items) // (workers * 4))))
+    first: Dict[str, str] = {}
+    for report in reports:
+        digest = report['sha256']
+        if digest and report['reason'] is None:
+            if digest in first:
+                report['reason'] = f"duplicate file: same content as {first[digest]}"
+            else:
+                first[digest] = report['file']
+    return reports
+
+
+def route(reports: List[Dict[str, Any]], reroute: bool = True) -> Tuple[Dict[str, List[Dict[str, Any]]], List[Dict[str, Any]]]:
+    """``({document type: viable reports}, rejected reports)``.
+
+    With ``reroute`` a file whose detected type differs from its folder is
+    analyzed as the detected type.
+    """
+    viable: Dict[str, List[Dict[str, Any]]] = {kind: [] for kind in DOCUMENT_TYPES}
+    rejected = []
+    for report in reports:
+        if report['reason'] is not None:
+            rejected.append(report)
+            continue
+        if reroute and report['detected_type'] and report['detected_type'] != report['folder_type']:
+            report['type'] = report['detected_type']
+        viable.setdefault(report['type'], []).append(report)
+    return viable, rejected
+
+
+def summarize(reports: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Counts for a batch summary: files, pages, blank and duplicate pages, rejections by reason, warnings."""
+    reasons: Dict[str, int] = {}
+    for report in reports:
+        if report['reason']:
+            reason = report['reason'].split(':')[0]
+            reasons[reason] = reasons.get(reason, 0) + 1
+    return {
+        'inspected': len(reports),
+        'viable': sum(1 for r in reports if r['reason'] is None),
+        'rejected': reasons,
+        'rerouted': [{'file': r['file'], 'from': r['folder_type'], 'to': r['type']}
+                     for r in reports if r['reason'] is None and r['type'] != r['folder_type']],
+        'pages': sum(r['pages'] for r in reports if r['reason'] is None),
+        'blank_pages': sum(len(r['blank_pages']) for r in reports),
+        'duplicate_pages': sum(len(r['duplicate_pages']) for r in reports),
+        'warnings': [{'file': r['file'], 'warnings': r['warnings']} for r in reports if r.get('warnings')],
+        'seconds': round(sum(r.get('seconds', 0.0) for r in reports), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--input', default='input')
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    from batch_processor import SUPPORTED_FORMATS
+    items = [(os.path.join(args.input, kind, name), kind) for kind in DOCUMENT_TYPES
+             if os.path.isdir(os.path.join(args.input, kind))
+             for name in sorted(os.listdir(os.path.join(args.input, kind))) if name.lower().endswith(SUPPORTED_FORMATS)]
+    reports = inspect_files(items, args.workers)
+    route(reports)
+    for r in reports:
+        status = r['reason'] or ('-> ' + r['type'] if r['type'] != r['folder_type'] else 'ok')
+        if r.get('warnings'):
+            status += f" ({'; '.join(r['warnings'])})"
+        print(f"{r['file']:<50} {r['format'] or '?':<5} {r['pages']:>4}p  blank {len(r['blank_pages']):<3} "
+              f"dup {len(r['duplicate_pages']):<3} {status}")
+    print(summarize(reports))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+"""Persistent query index for ``/api/receipts`` filters.
+
+Built once per change of ``output/receipts`` instead of on every request:
+
+- a trigram index over lowercased merchant names (merchant -> receipts in
+  CSR form), so a substring search only verifies the few merchants that
+  contain every trigram of the query;
+- receipt positions sorted by ``transaction_date`` and by ``total``, so date
+  and amount ranges are two ``searchsorted`` calls each.
+
+A query starts from the most selective of these candidate sets and checks
+the remaining filters on it, then returns positions in load order.
+"""
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+
+def _trigrams(text: str):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class ReceiptIndex:
+    def __init__(self, receipts: List[Dict[str, Any]]):
+        import pandas as pd
+        self.receipts = receipts
+        df = pd.DataFrame(receipts)
+        # Normalize columns (same rules /api/receipts always applied)
+        if 'merchant_name' not in df.columns:
+            df['merchant_name'] = 'Unknown'
+        if 'total' not in df.columns:
+            df['total'] = 0.0
+        if 'tax' not in df.columns:
+            df['tax'] = 0.0
+        if 'transaction_date' not in df.columns:
+            df['transaction_date'] = ''
+        df['total'] = pd.to_numeric(df['total'], errors='coerce').fillna(0.0)
+        df['tax'] = pd.to_numeric(df['tax'], errors='coerce').fillna(0.0)
+        df['transaction_date'] = pd.to_datetime(df['transaction_date'], errors='coerce')
+        self.frame = df
+
+        n = len(df)
+        self.totals = df['total'].to_numpy(dtype=np.float64)
+        self.dates = df['transaction_date'].to_numpy(dtype='datetime64[ns]').astype('datetime64[D]')
+
+        # Merchant dictionary + CSR posting lists (merchant code -> receipt positions)
+        names = df['merchant_name'].map(lambda v: v.lower() if isinstance(v, str) else '')
+        codes, uniques = pd.factorize(names, sort=False)
+        self.merchant_codes = codes
+        self.merchant_names: List[str] = list(uniques)
+        by_merchant = np.argsort(codes, kind='stable')
+        self._merchant_rows = by_merchant
+        self._merchant_offsets = np.searchsorted(codes[by_merchant], np.arange(len(uniques) + 1))
+
+        trigram_lists: Dict[str, List[int]] = {}
+        for code, name in enumerate(self.merchant_names):
+            for gram in _trigrams(name):
+                trigram_lists.setdefault(gram, []).append(code)
+        self._trigrams = {g: np.asarray(c, dtype=np.int64) for g, c in trigram_lists.items()}
+
+        # Sorted orders for range selection; NaT dates sort to the end and are excluded
+        self._by_date = np.argsort(self.dates, kind='stable')
+        self._sorted_dates = self.dates[self._by_date]
+        self._valid_dates = int((~np.isnat(self.dates)).sum())
+        self._by_total = np.argsort(self.totals, kind='stable')
+        self._sorted_totals = self.totals[self._by_total]
+        self.size = n
+
+    def __len__(self) -> int:
+        return self.size
+
+    def merchants_matching(self, query: str) -> np.ndarray:
+        """Codes of merchants whose lowercased name contains ``query`` (case-insensitive)."""
+        q = query.lower()
+        if len(q) >= 3:
+            candidates = None
+            for gram in _trigrams(q):
+                posting = self._trigrams.get(gram)
+                if posting is None:
+                    return np.empty(0, dtype=np.int64)
+                candidates = posting if candidates is None else np.intersect1d(candidates, posting, assume_unique=True)
+        else:
+            candidates = np.arange(len(self.merchant_names))
+        return np.asarray([c for c in candidates.tolist() if q in self.merchant_names[c]], dtype=np.int64)
+
+    def _merchant_receipts(self, codes: np.ndarray) -> np.ndarray:
+        if not len(codes):
+            return np.empty(0, dtype=np.int64)
+        starts, ends = self._merchant_offsets[codes], self._merchant_offsets[codes + 1]
+        return np.concatenate([self._merchant_rows[s:e] for s, e in zip(starts, ends)])
+
+    def _date_range(self, start: Optional[np.datetime64], end: Optional[np.datetime64]) -> np.ndarray:
+        valid = self._sorted_dates[:self._valid_dates]
+        lo = np.searchsorted(valid, start, 'left') if start is not None else 0
+        hi = np.searchsorted(valid, end, 'right') if end is not None else self._valid_dates
+        return self._by_date[lo:hi]
+
+    def _total_range(self, low: Optional[float], high: Optional[float]) -> np.ndarray:
+        lo = np.searchsorted(self._sorted_totals, low, 'left') if low is not None else 0
+        hi = np.searchsorted(self._sorted_totals, high, 'right') if high is not None else self.size
+        return self._by_total[lo:hi]
+
+    def query(self, merchant: str = '', start_date: Optional[np.datetime64] = None,
+              end_date: Optional[np.datetime64] = None, min_total: Optional[float] = None,
+              max_total: Optional[float] = None) -> np.ndarray:
+        """Positions of matching receipts, in load order.
+
+        Each active filter yields a candidate set from its index; the smallest
+        set is then checked against the other filters' predicates, so the work
+        is proportional to the most selective filter rather than to all receipts.
+        """
+        checks = []
+        if merchant:
+            codes = self.merchants_matching(merchant)
+            checks.append((self._merchant_receipts(codes), lambda rows: np.isin(self.merchant_codes[rows], codes)))
+        if start_date is not None or end_date is not None:
+            def in_dates(rows):
+                ok = ~np.isnat(self.dates[rows])
+                if start_date is not None:
+                    ok &= self.dates[rows] >= start_date
+                if end_date is not None:
+                    ok &= self.dates[rows] <= end_date
+                return ok
+            checks.append((self._date_range(start_date, end_date), in_dates))
+        if min_total is not None or max_total is not None:
+            def in_totals(rows):
+                ok = np.ones(len(rows), dtype=bool)
+                if min_total is not None:
+                    ok &= self.totals[rows] >= min_total
+                if max_total is not None:
+                    ok &= self.totals[rows] <= max_total
+                return ok
+            checks.append((self._total_range(min_total, max_total), in_totals))
+        if not checks:
+            return np.arange(self.size)
+
+        checks.sort(key=lambda c: len(c[0]))
+        rows = np.sort(checks[0][0])
+        for _, predicate in checks[1:]:
+            rows = rows[predicate(rows)]
+        return rows
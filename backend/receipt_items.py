@@ -0,0 +1,315 @@
+"""Receipt line-item analytics: top items and price history.
+
+``analyze_receipt`` normalizes each item once, at ingest, with
+``normalize_receipt``:
+
+- ``item_key``, a grouping key from the description (``"Latte 16oz"`` and
+  ``"LATTE, 16 OZ"`` -> ``LATTE 16OZ``);
+- numeric ``quantity_value``, ``unit_price_value`` and ``spend_value``.
+
+Receipt files written before this existed are normalized when first loaded,
+into the index only: the loaded receipts are shared with the receipt routes
+and stay as read.
+
+``ReceiptItems`` folds new receipt documents into:
+
+- spend, quantity and purchase totals per item;
+- the same totals per (item, merchant) cell for each month, so top-N queries
+  filtered by merchant or month range only touch the months in range;
+- a Space-Saving heavy-hitters summary per measure, so the unfiltered top-N
+  comes from ``HEAVY_HITTERS`` counters instead of a sort over every item;
+- each item's purchases sorted by date, for price history.
+"""
+import heapq
+import threading
+from functools import lru_cache
+from bisect import bisect_left, bisect_right, insort
+from operator import itemgetter
+from typing import Any, Dict, List, Tuple
+
+from dedupe import normalize_description
+from payables import parse_amount, parse_date, vendor_key
+
+MEASURES = ('spend', 'quantity', 'purchases')
+HEAVY_HITTERS = 512  # counters kept per measure
+
+
+@lru_cache(maxsize=65536)
+def item_key(description: str) -> str:
+    """Grouping key for an item description; size tokens are joined to their unit (``16 OZ`` -> ``16OZ``)."""
+    tokens = normalize_description(description).split()
+    merged: List[str] = []
+    for token in tokens:
+        if merged and merged[-1].isdigit() and token.isalpha() and len(token) <= 3:
+            merged[-1] += token
+        else:
+            merged.append(token)
+    return ' '.join(merged) or 'UNKNOWN'
+
+
+def item_values(item: Dict[str, Any]) -> Tuple[str, float, float, float]:
+    """``(item key, quantity, unit price, spend)`` of a receipt item, parsed unless already normalized."""
+    if 'item_key' in item:
+        return item['item_key'], item['quantity_value'], item['unit_price_value'], item['spend_value']
+    quantity = parse_amount(item.get('quantity')) or 1.0
+    price = parse_amount(item.get('price'))
+    spend = parse_amount(item.get('total_price')) or price * quantity
+    return item_key(item.get('description') or ''), quantity, price or round(spend / quantity, 4), spend
+
+
+def normalize_receipt(receipt: Dict[str, Any]) -> Dict[str, Any]:
+    """Add the grouping key and parsed amounts to each item of a new receipt (in place), before it is saved."""
+    for item in receipt.get('items') or []:
+        if 'item_key' in item:
+            continue
+        key, quantity, price, spend = item_values(item)
+        item['item_key'] = key
+        item['quantity_value'] = quantity
+        item['unit_price_value'] = price
+        item['spend_value'] = spend
+    return receipt
+
+
+class SpaceSaving:
+    """Space-Saving heavy hitters over weighted keys with at most ``capacity`` counters.
+
+    Every key whose total weight exceeds ``total / capacity`` is guaranteed to
+    hold a counter; a counter overestimates its key by at most ``error``.
+    """
+
+    def __init__(self, capacity: int = HEAVY_HITTERS):
+        self.capacity = capacity
+        self.counts: Dict[str, float] = {}
+        self.errors: Dict[str, float] = {}
+        self._heap: List[Tuple[float, str]] = []  # (count, key), stale entries skipped lazily
+
+    def add(self, key: str, weight: float = 1.0):
+        if weight <= 0:
+            return
+        counts = self.counts
+        if key in counts:
+            counts[key] += weight
+        elif len(counts) < self.capacity:
+            counts[key] = weight
+            self.errors[key] = 0.0
+        else:
+            # Replace the smallest counter; the newcomer inherits its count as error
+            while True:
+                count, victim = heapq.heappop(self._heap)
+                if counts.get(victim) == count:
+                    break
+            del counts[victim], self.errors[victim]
+            counts[key] = count + weight
+            self.errors[key] = count
+        heapq.heappush(self._heap, (counts[key], key))
+        if len(self._heap) > 4 * self.capacity:
+            self._heap = [(c, k) for k, c in counts.items()]
+            heapq.heapify(self._heap)
+
+    def top(self, n: int) -> List[Tuple[str, float, float]]:
+        """``(key, estimated weight, error)`` of the ``n`` largest counters."""
+        return [(k, c, self.errors[k]) for k, c in heapq.nlargest(n, self.counts.items(), key=lambda kv: kv[1])]
+
+
+class _Item:
+    __slots__ = ('description', 'spend', 'quantity', 'purchases', 'merchants', 'history', '_sorted')
+
+    def __init__(self, description: str):
+        self.description = description
+        self.spend = 0.0
+        self.quantity = 0.0
+        self.purchases = 0
+        self.merchants: Dict[str, int] = {}  # merchant key -> purchases
+        self.history: List[tuple] = []  # (date, merchant key, unit price, quantity, receipt id)
+        self._sorted = True
+
+    def dated(self) -> List[tuple]:
+        """The purchases sorted by date (sorted lazily, after a batch of appends)."""
+        if not self._sorted:
+            self.history.sort(key=itemgetter(0))
+            self._sorted = True
+        return self.history
+
+
+def _month_range(start_month: str, end_month: str) -> Tuple[str, str]:
+    """``YYYY-MM`` bounds (ValueError when malformed); empty bounds are open."""
+    for value in (start_month, end_month):
+        if value and (len(value) != 7 or not parse_date(value + '-01')):
+            raise ValueError(f"Invalid month '{value}', expected YYYY-MM")
+    return start_month, end_month
+
+
+class ReceiptItems:
+    """Incrementally maintained line-item aggregates over a ``JsonFolder`` of receipts."""
+
+    def __init__(self, folder, capacity: int = HEAVY_HITTERS):
+        self.folder = folder
+        self.capacity = capacity
+        self.generation = None
+        self._documents: Dict[str, list] = {}  # document id -> the records list folded in
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.items: Dict[str, _Item] = {}
+        self.merchant_names: Dict[str, str] = {}
+        self.cells: Dict[str, Dict[Tuple[str, str], list]] = {}  # month -> (item, merchant) -> [spend, qty, n]
+        self.months: List[str] = []
+        self.sketches = {measure: SpaceSaving(self.capacity) for measure in MEASURES}
+
+    def _add(self, doc_id: str, receipts: List[Dict[str, Any]]):
+        for i, receipt in enumerate(receipts):
+            name = receipt.get('merchant_name') or 'Unknown'
+            merchant = vendor_key(name)
+            self.merchant_names.setdefault(merchant, name)
+            day = parse_date(receipt.get('transaction_date'))
+            month = day[:7]
+            cells = self.cells.get(month)
+            if cells is None:
+                cells = self.cells[month] = {}
+                insort(self.months, month)
+            for item in receipt.get('items') or []:
+                key, quantity, price, spend = item_values(item)
+                entry = self.items.get(key)
+                if entry is None:
+                    entry = self.items[key] = _Item(item.get('description') or key)
+                entry.spend += spend
+                entry.quantity += quantity
+                entry.purchases += 1
+                entry.merchants[merchant] = entry.merchants.get(merchant, 0) + 1
+                entry.history.append((day, merchant, price, quantity, f'{doc_id}#{i}'))
+                entry._sorted = False
+                cell = cells.get((key, merchant))
+                if cell is None:
+                    cell = cells[(key, merchant)] = [0.0, 0.0, 0]
+                cell[0] += spend
+                cell[1] += quantity
+                cell[2] += 1
+                self.sketches['spend'].add(key, spend)
+                self.sketches['quantity'].add(key, quantity)
+                self.sketches['purchases'].add(key)
+
+    def update(self, refresh: bool = True) -> 'ReceiptItems':
+        """Fold in receipt documents added since the last update; rebuild when earlier ones changed."""
+        with self._lock:
+            if refresh:
+                self.folder.refresh()
+            if self.folder.generation == self.generation:
+                return self
+            documents = self.folder.documents(refresh=False)
+            current = dict(documents)
+            if any(current.get(doc_id) is not records for doc_id, records in self._documents.items()):
+                self._reset()
+                self._documents = {}
+            for doc_id, records in documents:
+                if doc_id not in self._documents:
+                    self._add(doc_id, records)
+            self._documents = current
+            self.generation = self.folder.generation
+            return self
+
+    def _row(self, key: str, spend: float, quantity: float, purchases: int) -> Dict[str, Any]:
+        entry = self.items[key]
+        return {
+            'item_key': key,
+            'description': entry.description,
+            'spend': round(spend, 2),
+            'quantity': round(quantity, 3),
+            'purchases': purchases,
+            'average_unit_price': round(spend / quantity, 2) if quantity else None,
+            'merchants': len(entry.merchants),
+        }
+
+    def top(self, n: int = 20, by: str = 'spend', merchant: str = '', start_month: str = '',
+            end_month: str = '') -> Dict[str, Any]:
+        """The ``n`` largest items by ``by``, optionally for one merchant (substring) and a month range.
+
+        Unfiltered queries are answered from the heavy-hitters counters; rows
+        are ``guaranteed`` when their count lower bound beats every item left
+        out. Filtered queries sum the month cells in range.
+        """
+        if by not in MEASURES:
+            raise ValueError(f"by must be one of {', '.join(MEASURES)}")
+        start_month, end_month = _month_range(start_month, end_month)
+        measure = MEASURES.index(by)
+        needle = merchant.strip().upper()
+        if not (needle or start_month or end_month) and n < self.capacity:
+            with self._lock:
+                candidates = self.sketches[by].top(n + 1)
+                cutoff = candidates[n][1] if len(candidates) > n else 0.0
+                rows = []
+                for key, count, error in candidates[:n]:
+                    entry = self.items[key]
+                    row = self._row(key, entry.spend, entry.quantity, entry.purchases)
+                    row['guaranteed'] = count - error >= cutoff
+                    rows.append(row)
+            rows.sort(key=lambda r: r[by], reverse=True)
+            return {'items': rows, 'source': 'heavy_hitters', 'distinct_items': len(self.items)}
+
+        totals: Dict[str, list] = {}
+        with self._lock:
+            lo = bisect_left(self.months, start_month) if start_month else 0
+            hi = bisect_right(self.months, end_month) if end_month else len(self.months)
+            cells = [list(self.cells[month].items()) for month in self.months[lo:hi]]
+        for month_cells in cells:
+            for (key, merchant_key), cell in month_cells:
+                if needle and needle not in merchant_key:
+                    continue
+                total = totals.get(key)
+                if total is None:
+                    total = totals[key] = [0.0, 0.0, 0]
+                total[0] += cell[0]
+                total[1] += cell[1]
+                total[2] += cell[2]
+        best = heapq.nlargest(n, totals.items(), key=lambda kv: kv[1][measure])
+        with self._lock:
+            rows = [self._row(key, *total) for key, total in best]
+        return {'items': rows, 'source': 'aggregates', 'distinct_items': len(totals)}
+
+    def resolve(self, query: str) -> List[str]:
+        """Item keys for a description: the exact key, else keys containing it, largest spend first."""
+        key = item_key(query)
+        if key in self.items:
+            return [key]
+        matches = [k for k in self.items if key in k]
+        matches.sort(key=lambda k: self.items[k].spend, reverse=True)
+        return matches
+
+    def history(self, key: str, merchant: str = '', start_month: str = '', end_month: str = '') -> Dict[str, Any]:
+        """Purchases of one item in date order, with min/average/max unit price per month."""
+        start_month, end_month = _month_range(start_month, end_month)
+        entry = self.items[key]
+        needle = merchant.strip().upper()
+        with self._lock:
+            history = entry.dated()
+            lo = bisect_left(history, (start_month,)) if start_month else 0
+            hi = bisect_left(history, (_next_month(end_month),)) if end_month else len(history)
+            history = history[lo:hi]
+        points, monthly = [], {}
+        for day, merchant_key, price, quantity, receipt_id in history:
+            if needle and needle not in merchant_key:
+                continue
+            points.append({'date': day, 'merchant': self.merchant_names.get(merchant_key, merchant_key),
+                           'unit_price': price, 'quantity': quantity, 'receipt_id': receipt_id})
+            if not day:
+                continue
+            stats = monthly.get(day[:7])
+            if stats is None:
+                stats = monthly[day[:7]] = [price, price, 0.0, 0]
+            stats[0] = min(stats[0], price)
+            stats[1] = max(stats[1], price)
+            stats[2] += price
+            stats[3] += 1
+        return {
+            'item_key': key,
+            'description': entry.description,
+            'points': points,
+            'monthly': [{'month': month, 'min_unit_price': s[0], 'max_unit_price': s[1],
+                         'average_unit_price': round(s[2] / s[3], 2), 'purchases': s[3]}
+                        for month, s in monthly.items()],
+        }
+
+
+def _next_month(month: str) -> str:
+    year, number = int(month[:4]), int(month[5:7])
+    return f'{year + number // 12:04d}-{number % 12 + 1:02d}'
@@ -0,0 +1,92 @@
+"""Vectorized balance reconciliation over every account in the transaction store.
+
+For each statement account ("slot") the running balance is recomputed as
+``beginning_balance + cumsum(deposit - withdrawal)`` for all slots at once:
+one global cumulative sum in integer cents, minus the cumulative sum at each
+slot's first row. Working in cents keeps the sums exact over tens of
+millions of rows, where a float cumsum would drift.
+"""
+from typing import Any, Dict, List
+
+import numpy as np
+
+from ledger_store import TransactionStore
+
+
+def _to_cents(values: np.ndarray) -> np.ndarray:
+    return np.rint(np.asarray(values, dtype=np.float64) * 100).astype(np.int64)
+
+
+def reconcile(store: TransactionStore, tolerance: float = 0.01, only_mismatched: bool = True) -> Dict[str, Any]:
+    """Compare computed running balances with the extracted balances.
+
+    An account is flagged when its computed ending balance differs from the
+    extracted ``ending_balance`` by more than ``tolerance``, or when any
+    recorded ``running_balance`` disagrees with the computed one. For flagged
+    accounts, ``first_divergence`` is the first transaction whose recorded
+    running balance differs from the computed one (None when the recorded
+    balances are self-consistent, e.g. missing or extra transactions).
+    """
+    tol = int(round(tolerance * 100))
+    slots = store.slots
+    bounds = store.slot_bounds()
+
+    net = _to_cents(store.deposits) - _to_cents(store.withdrawals)
+    cum = np.zeros(len(net) + 1, dtype=np.int64)
+    np.cumsum(net, out=cum[1:])
+
+    begin = _to_cents(store.slot_beginning)
+    ending = _to_cents(store.slot_ending)
+    computed_end = begin + cum[bounds[1:]] - cum[bounds[:-1]]
+    end_diff = computed_end - ending
+    end_mismatch = np.abs(end_diff) > tol
+
+    # Grouped cumulative sum: running balance of each row within its own slot
+    computed_running = begin[slots] + cum[1:] - cum[bounds[:-1]][slots]
+    row_mismatch = np.flatnonzero(np.abs(computed_running - _to_cents(store.running_balances)) > tol)
+    divergent_slots, first_pos = np.unique(slots[row_mismatch], return_index=True)
+    first_row = np.full(len(begin), -1, dtype=np.int64)
+    first_row[divergent_slots] = row_mismatch[first_pos]
+
+    flagged = end_mismatch | (first_row >= 0)
+    selected = np.flatnonzero(flagged) if only_mismatched else np.arange(len(begin))
+
+    accounts: List[Dict[str, Any]] = []
+    for slot in selected:
+        metadata = store.statements[store.slot_statement[slot]]['metadata']
+        row = int(first_row[slot])
+        divergence = None
+        if row >= 0:
+            tx = store.row(row)
+            divergence = {
+                'index': row - int(bounds[slot]),
+                'date': tx.date,
+                'description': tx.description,
+                'deposit': tx.deposit,
+                'withdrawal': tx.withdrawal,
+                'recorded_balance': tx.running_balance,
+                'computed_balance': computed_running[row] / 100,
+            }
+        accounts.append({
+            'statement_index': int(store.slot_statement[slot]),
+            'bank_name': metadata.get('bank_name', ''),
+            'statement_period': metadata.get('statement_period', {}),
+            'account_number': store.account_pool[store.slot_account[slot]],
+            'beginning_balance': float(store.slot_beginning[slot]),
+            'ending_balance': float(store.slot_ending[slot]),
+            'computed_ending_balance': computed_end[slot] / 100,
+            'difference': end_diff[slot] / 100,
+            'transactions_count': int(bounds[slot + 1] - bounds[slot]),
+            'reconciled': not bool(flagged[slot]),
+            'first_divergence': divergence,
+        })
+
+    return {
+        'summary': {
+            'accounts_checked': int(len(begin)),
+            'transactions_checked': int(len(net)),
+            'accounts_mismatched': int(flagged.sum()),
+            'tolerance': tolerance,
+        },
+        'accounts': accounts,
+    }
@@ -0,0 +1,178 @@
+"""Daily deposit/withdrawal/count rollups stored as prefix sums.
+
+``Rollups`` accumulates per-account daily totals (in integer cents) as new
+transactions are ingested, touching only the new rows. ``freeze()`` turns the
+accumulators into a ``RollupTable`` of cumulative sums along the day axis, so
+the total over any date range is two lookups, and weekly/monthly series are
+prefix differences at the period boundaries.
+"""
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from ledger_store import TransactionStore
+
+_MEASURES = ('deposits', 'withdrawals', 'count')
+_FREQ_UNITS = {'daily': 'D', 'weekly': 'W', 'monthly': 'M'}
+
+
+def _parse_day(value: Optional[str]) -> Optional[int]:
+    if not value:
+        return None
+    return int(np.datetime64(value, 'D').astype(np.int64))
+
+
+class RollupTable:
+    """Immutable prefix-sum view: ``prefix[m][account, i]`` is the total over days ``< origin + i``.
+
+    Row ``n_accounts`` (the last row) holds the all-accounts total.
+    """
+
+    def __init__(self, prefix: Dict[str, np.ndarray], origin: int, account_pool):
+        self.prefix = prefix
+        self.origin = origin
+        self.account_pool = account_pool
+        self.days = prefix['count'].shape[1] - 1
+
+    def _row(self, account: Optional[str]) -> Optional[int]:
+        total_row = self.prefix['count'].shape[0] - 1
+        if not account:
+            return total_row
+        code = self.account_pool.lookup(account)
+        return code if code is not None and code < total_row else None
+
+    def _index(self, day: Optional[int], default: int) -> int:
+        if day is None:
+            return default
+        return int(min(max(day - self.origin, 0), self.days))
+
+    @property
+    def first_day(self) -> Optional[str]:
+        return str(np.datetime64(self.origin, 'D')) if self.days else None
+
+    @property
+    def last_day(self) -> Optional[str]:
+        return str(np.datetime64(self.origin + self.days - 1, 'D')) if self.days else None
+
+    def range_total(self, start_date: Optional[str] = None, end_date: Optional[str] = None,
+                    account: Optional[str] = None) -> Dict[str, Any]:
+        """Totals for ``start_date <= day <= end_date`` (inclusive, ISO dates); O(1)."""
+        row = self._row(account)
+        lo = self._index(_parse_day(start_date), 0)
+        end = _parse_day(end_date)
+        hi = self._index(end + 1 if end is not None else None, self.days)
+        if row is None or hi <= lo:
+            return {'deposits': 0.0, 'withdrawals': 0.0, 'count': 0}
+        totals = {m: int(self.prefix[m][row, hi] - self.prefix[m][row, lo]) for m in _MEASURES}
+        return {
+            'deposits': totals['deposits'] / 100,
+            'withdrawals': totals['withdrawals'] / 100,
+            'count': totals['count'],
+        }
+
+    def series(self, freq: str = 'monthly', start_date: Optional[str] = None, end_date: Optional[str] = None,
+               account: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Per-period totals; periods are calendar days, ISO weeks (Monday start) or months."""
+        unit = _FREQ_UNITS[freq]
+        row = self._row(account)
+        if row is None or not self.days:
+            return []
+        lo = self._index(_parse_day(start_date), 0)
+        end = _parse_day(end_date)
+        hi = self._index(end + 1 if end is not None else None, self.days)
+        if hi <= lo:
+            return []
+
+        first = np.datetime64(self.origin + lo, 'D')
+        last = np.datetime64(self.origin + hi - 1, 'D')
+        if unit == 'W':
+            # numpy weeks start on Thursday (1970-01-01); align to Mondays instead
+            offset = (first.astype(np.int64) - 4) % 7
+            starts = np.arange(first - offset, last + 1, 7)
+        else:
+            starts = np.arange(first.astype(f'datetime64[{unit}]'), last.astype(f'datetime64[{unit}]') + 1).astype('datetime64[D]')
+        bounds = np.clip(starts.astype(np.int64) - self.origin, lo, hi)
+        bounds = np.append(bounds, hi)
+
+        sums = {m: np.diff(self.prefix[m][row, bounds]) for m in _MEASURES}
+        if unit == 'M':
+            labels = starts.astype('datetime64[M]').astype(str)
+        else:
+            labels = starts.astype(str)
+        return [
+            {
+                'period': str(label),
+                'deposits': sums['deposits'][i] / 100,
+                'withdrawals': sums['withdrawals'][i] / 100,
+                'count': int(sums['count'][i]),
+            }
+            for i, label in enumerate(labels)
+        ]
+
+
+class Rollups:
+    """Incrementally maintained per-account daily totals."""
+
+    def __init__(self, store: TransactionStore):
+        self.store = store
+        self.origin: Optional[int] = None
+        self._daily = {m: np.zeros((1, 0), dtype=np.int64) for m in _MEASURES}
+        self._processed = 0
+        self._table: Optional[RollupTable] = None
+
+    def _ensure(self, n_accounts: int, first_day: int, last_day: int):
+        """Grow the daily grids to cover the accounts and day range (plus one total row)."""
+        rows, days = self._daily['count'].shape
+        origin = self.origin if self.origin is not None else first_day
+        new_origin = min(origin, first_day)
+        new_days = max(origin + days, last_day + 1) - new_origin
+        new_rows = max(rows, n_accounts + 1)
+        if (new_origin, new_days, new_rows) == (origin, days, rows) and self.origin is not None:
+            return
+        shift = origin - new_origin
+        for m in _MEASURES:
+            grid = np.zeros((new_rows, new_days), dtype=np.int64)
+            old = self._daily[m]
+            # Accounts keep their rows; the total row moves to the new last row
+            grid[:rows - 1, shift:shift + days] = old[:rows - 1]
+            grid[-1, shift:shift + days] = old[-1]
+            self._daily[m] = grid
+        self.origin = new_origin
+
+    def update(self, duplicates: Optional[np.ndarray] = None) -> RollupTable:
+        """Add rows appended to the store since the last call (skipping duplicates); returns the table."""
+        store = self.store
+        start, end = self._processed, len(store)
+        if end > start:
+            days = store.dates[start:end]
+            keep = ~np.isnat(days)
+            if duplicates is not None:
+                keep &= ~duplicates[start:end]
+            day = days[keep].astype(np.int64)
+            if len(day):
+                accounts = store.account_codes[start:end][keep]
+                self._ensure(len(store.account_pool), int(day.min()), int(day.max()))
+                col = day - self.origin
+                values = {
+                    'deposits': np.rint(store.deposits[start:end][keep] * 100).astype(np.int64),
+                    'withdrawals': np.rint(store.withdrawals[start:end][keep] * 100).astype(np.int64),
+                    'count': np.ones(len(day), dtype=np.int64),
+                }
+                total_row = self._daily['count'].shape[0] - 1
+                for m in _MEASURES:
+                    np.add.at(self._daily[m], (accounts, col), values[m])
+                    np.add.at(self._daily[m][total_row], col, values[m])
+                self._table = None
+            self._processed = end
+        return self.freeze()
+
+    def freeze(self) -> RollupTable:
+        if self._table is None:
+            prefix = {}
+            for m in _MEASURES:
+                daily = self._daily[m]
+                p = np.zeros((daily.shape[0], daily.shape[1] + 1), dtype=np.int64)
+                np.cumsum(daily, axis=1, out=p[:, 1:])
+                prefix[m] = p
+            self._table = RollupTable(prefix, self.origin or 0, self.store.account_pool)
+        return self._table
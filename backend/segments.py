@@ -0,0 +1,146 @@
+"""Append-only NDJSON segment output for analyzer results.
+
+Instead of one pretty-printed JSON file per document, each analyzed document
+becomes one compact line ``{"id": <document id>, "records": [...]}``
+appended to ``<prefix>-<NNNNNN>.ndjson`` in the output folder. A segment is
+closed once it reaches ``max_bytes`` and the next one is started. Next to
+each segment, ``<segment>.idx`` holds one ``{"id", "offset", "length"}`` line
+per document, so a single document can be read back with one seek.
+
+Lines are written with a single ``write`` on a file opened for appending,
+under an exclusive lock when ``fcntl`` is available. Readers therefore only
+ever see whole lines, plus at most a partial last line, which they skip until
+it is complete. A document id written again later replaces the earlier one.
+"""
+import json
+import os
+import re
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows; single writer assumed there
+    fcntl = None
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+SEGMENT_SUFFIX = '.ndjson'
+INDEX_SUFFIX = '.idx'
+DEFAULT_SEGMENT_BYTES = 64 * 1024 * 1024
+
+# Legacy file suffix -> segment prefix for each analyzer output type
+SEGMENT_PREFIXES = {
+    '_bank_statement.json': 'bank_statement',
+    '_receipt.json': 'receipt',
+    '_invoice.json': 'invoice',
+}
+
+
+def parse_json(data: bytes) -> Any:
+    """Parse with ``orjson`` when installed (several times faster), else the stdlib ``json``."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def segment_paths(directory: str, prefix: str) -> List[str]:
+    """Segments of ``prefix`` in ``directory``, oldest first."""
+    if not os.path.isdir(directory):
+        return []
+    pattern = re.compile(rf'^{re.escape(prefix)}-(\d+){re.escape(SEGMENT_SUFFIX)}$')
+    names = sorted(n for n in os.listdir(directory) if pattern.match(n))
+    return [os.path.join(directory, n) for n in names]
+
+
+class SegmentWriter:
+    """Appends documents to rotating NDJSON segments with sidecar offset indexes."""
+
+    def __init__(self, directory: str, prefix: str, max_bytes: int = DEFAULT_SEGMENT_BYTES):
+        self.directory = directory
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def _segment_name(self, seq: int) -> str:
+        return os.path.join(self.directory, f'{self.prefix}-{seq:06d}{SEGMENT_SUFFIX}')
+
+    def _target(self, line_bytes: int) -> str:
+        existing = segment_paths(self.directory, self.prefix)
+        if not existing:
+            return self._segment_name(1)
+        last = existing[-1]
+        size = os.path.getsize(last)
+        if size and size + line_bytes > self.max_bytes:
+            seq = int(os.path.basename(last)[len(self.prefix) + 1:-len(SEGMENT_SUFFIX)])
+            return self._segment_name(seq + 1)
+        return last
+
+    def append(self, doc_id: str, records: List[Dict[str, Any]]) -> Tuple[str, int]:
+        """Append one document; returns ``(segment path, byte offset)``."""
+        line = json.dumps({'id': doc_id, 'records': records}, separators=(',', ':'), default=str)
+        data = (line + '\n').encode('utf-8')
+        with open(os.path.join(self.directory, f'.{self.prefix}.lock'), 'a') as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                path = self._target(len(data))
+                with open(path, 'ab') as f:
+                    offset = f.tell()
+                    f.write(data)
+                entry = json.dumps({'id': doc_id, 'offset': offset, 'length': len(data)}, separators=(',', ':'))
+                with open(path + INDEX_SUFFIX, 'a') as f:
+                    f.write(entry + '\n')
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+        return path, offset
+
+
+def read_segment(path: str, start: int = 0) -> Tuple[List[Tuple[str, List[Dict[str, Any]]]], int]:
+    """Documents in ``path`` from byte ``start`` on, and the offset after the last complete line."""
+    with open(path, 'rb') as f:
+        f.seek(start)
+        data = f.read()
+    end = data.rfind(b'\n') + 1
+    documents = []
+    for line in data[:end].splitlines():
+        if not line.strip():
+            continue
+        try:
+            doc = parse_json(line)
+        except Exception as e:
+            print(f"Error reading segment {os.path.basename(path)}: {e}")
+            continue
+        records = doc.get('records')
+        if isinstance(records, dict):
+            records = [records]
+        documents.append((str(doc.get('id', '')), records if isinstance(records, list) else []))
+    return documents, start + end
+
+
+def _index_entries(path: str) -> Iterator[Dict[str, Any]]:
+    try:
+        with open(path + INDEX_SUFFIX, 'rb') as f:
+            for line in f:
+                if line.endswith(b'\n'):
+                    yield parse_json(line)
+    except FileNotFoundError:
+        return
+
+
+def find_document(directory: str, prefix: str, doc_id: str) -> Optional[List[Dict[str, Any]]]:
+    """Latest records written for ``doc_id``, located through the sidecar indexes."""
+    for path in reversed(segment_paths(directory, prefix)):
+        found = None
+        for entry in _index_entries(path):
+            if entry.get('id') == doc_id:
+                found = entry
+        if found is not None:
+            with open(path, 'rb') as f:
+                f.seek(found['offset'])
+                doc = parse_json(f.read(found['length']))
+            return doc.get('records', [])
+    return None
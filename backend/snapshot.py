@@ -0,0 +1,250 @@
+"""Memory-mapped ledger snapshots shared by all dashboard workers.
+
+A snapshot is a directory of ``.npy`` column files plus a small JSON manifest:
+
+    output/snapshots/
+        CURRENT                   # name of the live snapshot directory
+        20250801T120000_123456789_ab12cd/
+            manifest.json         # statement metadata, row/slot counts, source file signature
+            tx_<column>.npy       # per-transaction columns
+            slot_<column>.npy     # per statement-account columns
+            pool_<name>.bytes.npy # UTF-8 blob of a dictionary-encoded string column
+            pool_<name>.offsets.npy
+
+Workers open the columns with ``np.load(mmap_mode='r')`` so every gunicorn
+worker shares the same page-cache pages instead of holding its own copy.
+Publishing is atomic: the snapshot directory is fully written under a
+temporary name, renamed, and only then is ``CURRENT`` replaced.
+
+The manifest records the stat signature of the bank statement output the
+snapshot was built from, so readers can tell when statements have been
+written since (e.g. by the analyzer CLI) and fall back to a live ledger.
+"""
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from json_folder import JsonFolder
+from ledger_store import TransactionStore
+
+DEFAULT_SNAPSHOT_DIR = os.path.join('output', 'snapshots')
+CURRENT_FILE = 'CURRENT'
+FORMAT_VERSION = 1
+
+
+class MappedStringPool:
+    """Read-only string pool backed by a UTF-8 blob and an offsets array."""
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray):
+        self._blob = blob
+        self._offsets = offsets
+        self._decoded: Optional[List[str]] = None
+        self._codes: Optional[Dict[str, int]] = None
+
+    def __getitem__(self, code: int) -> str:
+        if self._decoded is not None:
+            return self._decoded[code]
+        start, end = self._offsets[code], self._offsets[code + 1]
+        return bytes(self._blob[start:end]).decode('utf-8')
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def values(self) -> List[str]:
+        if self._decoded is None:
+            self._decoded = [self[i] for i in range(len(self))]
+        return self._decoded
+
+    def lookup(self, value: str) -> Optional[int]:
+        if self._codes is None:
+            self._codes = {v: i for i, v in enumerate(self.values())}
+        return self._codes.get(value)
+
+    def encode(self, value):
+        raise TypeError('snapshot string pools are read-only')
+
+
+def _save_pool(path_prefix: str, values: List[str]):
+    encoded = [v.encode('utf-8') for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    np.save(f'{path_prefix}.bytes.npy', np.frombuffer(b''.join(encoded), dtype=np.uint8))
+    np.save(f'{path_prefix}.offsets.npy', offsets)
+
+
+def _load_pool(path_prefix: str) -> MappedStringPool:
+    return MappedStringPool(
+        np.load(f'{path_prefix}.bytes.npy', mmap_mode='r'),
+        np.load(f'{path_prefix}.offsets.npy', mmap_mode='r'),
+    )
+
+
+def write_snapshot(store: TransactionStore, root: str = DEFAULT_SNAPSHOT_DIR, keep: int = 2,
+                   sources: Optional[Dict[str, List[int]]] = None) -> str:
+    """Write ``store`` as a new snapshot under ``root`` and publish it; returns its directory.
+
+    ``sources`` is the ``JsonFolder.signature()`` of the output it was built from.
+    """
+    os.makedirs(root, exist_ok=True)
+    # Nanosecond prefix: names sort in creation order even within one second
+    ns = time.time_ns()
+    name = f"{time.strftime('%Y%m%dT%H%M%S', time.localtime(ns // 10**9))}_{ns % 10**9:09d}_{uuid.uuid4().hex[:6]}"
+    tmp_dir = os.path.join(root, f'.{name}.tmp')
+    os.makedirs(tmp_dir)
+
+    for column, array in store.columns().items():
+        np.save(os.path.join(tmp_dir, f'tx_{column}.npy'), np.ascontiguousarray(array))
+    for column, array in store.slot_columns().items():
+        np.save(os.path.join(tmp_dir, f'slot_{column}.npy'), np.ascontiguousarray(array))
+    pools = {
+        'date': store.date_pool,
+        'description': store.description_pool,
+        'account': store.account_pool,
+        'text': store.text_pool,
+    }
+    for pool_name, pool in pools.items():
+        _save_pool(os.path.join(tmp_dir, f'pool_{pool_name}'), list(pool.values()))
+
+    manifest = {
+        'format_version': FORMAT_VERSION,
+        'created_at': datetime.now().isoformat(),
+        'transactions': len(store),
+        'slots': int(len(store.slot_account)),
+        'columns': sorted(store.columns()),
+        'slot_columns': sorted(store.slot_columns()),
+        'statements': [s['metadata'] for s in store.statements],
+        'sources': sources,
+    }
+    with open(os.path.join(tmp_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f)
+
+    final_dir = os.path.join(root, name)
+    os.rename(tmp_dir, final_dir)
+
+    # Publish: readers only ever see a complete snapshot name in CURRENT
+    pointer_tmp = os.path.join(root, f'.{CURRENT_FILE}.{uuid.uuid4().hex[:6]}')
+    with open(pointer_tmp, 'w') as f:
+        f.write(name)
+    os.replace(pointer_tmp, os.path.join(root, CURRENT_FILE))
+
+    _prune(root, keep)
+    return final_dir
+
+
+def _read_current(root: str) -> Optional[str]:
+    try:
+        with open(os.path.join(root, CURRENT_FILE), 'r') as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def _prune(root: str, keep: int):
+    """Remove all but the newest ``keep`` snapshots; the one ``CURRENT`` points to is always kept.
+
+    Workers that still map an old snapshot keep reading it safely: on POSIX
+    the unlinked files stay alive until the last mapping is closed.
+    """
+    names = sorted(
+        d for d in os.listdir(root)
+        if not d.startswith('.') and os.path.isdir(os.path.join(root, d))
+    )
+    current = _read_current(root)
+    for old in names[:-keep] if keep > 0 else []:
+        if old != current:
+            shutil.rmtree(os.path.join(root, old), ignore_errors=True)
+
+
+def read_manifest(snapshot_dir: str) -> Dict[str, Any]:
+    with open(os.path.join(snapshot_dir, 'manifest.json'), 'r') as f:
+        manifest = json.load(f)
+    if manifest.get('format_version') != FORMAT_VERSION:
+        raise ValueError(f"Unsupported snapshot format: {manifest.get('format_version')}")
+    return manifest
+
+
+def load_snapshot(snapshot_dir: str, manifest: Optional[Dict[str, Any]] = None) -> TransactionStore:
+    """Map a snapshot directory read-only; no column data is copied."""
+    manifest = manifest or read_manifest(snapshot_dir)
+
+    columns = {
+        c: np.load(os.path.join(snapshot_dir, f'tx_{c}.npy'), mmap_mode='r')
+        for c in manifest['columns']
+    }
+    slot_columns = {
+        c: np.load(os.path.join(snapshot_dir, f'slot_{c}.npy'), mmap_mode='r')
+        for c in manifest['slot_columns']
+    }
+    pools = {
+        name: _load_pool(os.path.join(snapshot_dir, f'pool_{name}'))
+        for name in ('date', 'description', 'account', 'text')
+    }
+    statements = [{'metadata': m} for m in manifest['statements']]
+    return TransactionStore.from_columns(statements, pools, slot_columns, columns)
+
+
+class SnapshotReader:
+    """Per-worker handle on the live snapshot; swaps to a newer one when ``CURRENT`` changes.
+
+    ``current()`` re-checks the pointer at most every ``check_interval`` seconds,
+    so request handlers can call it freely. The swap is a single reference
+    assignment, so in-flight requests keep using the store they already hold.
+    ``manifest`` is the live snapshot's manifest.
+    """
+
+    def __init__(self, root: str = DEFAULT_SNAPSHOT_DIR, check_interval: float = 1.0):
+        self.root = root
+        self.check_interval = check_interval
+        self.name: Optional[str] = None
+        self.manifest: Dict[str, Any] = {}
+        self._store: Optional[TransactionStore] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def current(self) -> Optional[TransactionStore]:
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return self._store
+        with self._lock:
+            self._checked_at = now
+            name = _read_current(self.root)
+            if name and name != self.name:
+                try:
+                    manifest = read_manifest(os.path.join(self.root, name))
+                    self._store = load_snapshot(os.path.join(self.root, name), manifest)
+                    self.name, self.manifest = name, manifest
+                except Exception as e:
+                    print(f"Error loading snapshot {name}: {e}")
+            elif name is None:
+                self._store, self.name, self.manifest = None, None, {}
+        return self._store
+
+
+def build_snapshot_from_output(output_dir: str = 'output', root: Optional[str] = None) -> Optional[str]:
+    """Build a snapshot from the structured bank statements under ``output_dir``.
+
+    It is published under ``root`` (default ``<output_dir>/snapshots``).
+    """
+    folder = JsonFolder(os.path.join(output_dir, 'bank_statements'), '_bank_statement.json')
+    # Taken before parsing: a file written meanwhile makes the snapshot look stale, never current
+    sources = folder.signature()
+    statements = folder.records()
+    if not statements:
+        return None
+    return write_snapshot(TransactionStore.from_statements(statements), root or os.path.join(output_dir, 'snapshots'),
+                          sources=sources)
+
+
+if __name__ == '__main__':
+    path = build_snapshot_from_output(root=os.getenv('LEDGER_SNAPSHOT_DIR') or None)
+    if path:
+        print(f"Created ledger snapshot: {path}")
+    else:
+        print("No bank statement data found; snapshot not written")
@@ -0,0 +1,239 @@
+"""Deterministic synthetic analyzer outputs for benchmarks and local testing.
+
+Writes files in the shapes ``doc_intel_quickstart.py`` produces:
+
+- ``<root>/bank_statements/*_bank_statement.json`` (one statement per file, one
+  or two accounts, running balances);
+- ``<root>/receipts/*_receipt.json`` (about half of them for real withdrawals,
+  so receipt matching has something to find);
+- ``<root>/invoices/*_invoice.json`` (field contents as strings, e.g. ``$1,234.56``);
+- optionally ``<base>_summary.csv`` / ``<base>_all_transactions.csv`` pairs,
+  read by the CSV fallback in ``app.load_bank_statements``.
+
+The same arguments always produce the same files::
+
+    python synthetic_data.py --root /tmp/demo/output --statements 24 --transactions 500 --receipts 5000
+"""
+import argparse
+import csv
+import json
+import os
+import random
+from datetime import date, timedelta
+from typing import Any, Dict, List
+
+MERCHANTS = [
+    ('STARBUCKS', 'Starbucks', 3, 15),
+    ('UBER TRIP', 'Uber', 8, 60),
+    ('LYFT RIDE', 'Lyft', 8, 55),
+    ('AMZN MKTP', 'Amazon', 10, 250),
+    ('AMAZON.COM', 'Amazon', 10, 250),
+    ('MICROSOFT*365 SUBSCRIPTION', 'Microsoft', 10, 30),
+    ('STAPLES', 'Staples', 5, 120),
+    ('SHELL OIL', 'Shell', 30, 90),
+    ('WHOLE FOODS', 'Whole Foods', 20, 200),
+    ('COSTCO WHSE', 'Costco', 40, 400),
+    ('HYDRO ONE', 'Hydro One', 60, 180),
+    ('ROGERS WIRELESS', 'Rogers', 50, 120),
+]
+INCOME = ['ACH IN PAYROLL', 'WIRE IN CLIENT PAYMENT', 'ACH IN REFUND']
+TRANSFERS = ['TRANSFER TO SAVINGS', 'TRANSFER FROM SAVINGS']
+BANKS = ['Scotiabank', 'TD Canada Trust', 'RBC Royal Bank', 'BMO']
+HOLDERS = ['Acme Consulting Inc', 'Northwind Traders', 'Jane Smith', 'Contoso Ltd', 'Fabrikam LLC']
+VENDORS = ['Contoso Supplies', 'Adatum Corporation', 'Litware Inc', 'Proseware Ltd', 'Tailspin Toys',
+           'Wingtip Partners', 'Fourth Coffee', 'Woodgrove Services']
+ITEMS = ['Coffee', 'Sandwich', 'Printer paper', 'USB cable', 'Fuel', 'Groceries', 'Monthly plan', 'Consulting hours']
+
+START = date(2024, 1, 1)
+
+
+def _money(value: float) -> str:
+    return f'${value:,.2f}'
+
+
+def _write_json(path: str, data: Any):
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2)
+
+
+def make_statement(rng: random.Random, index: int, transactions: int) -> Dict[str, Any]:
+    """One statement (monthly period) in ``analyze_bank_statement`` shape."""
+    period_start = START + timedelta(days=30 * index)
+    period_end = period_start + timedelta(days=29)
+    accounts = []
+    for a in range(1 if rng.random() < 0.7 else 2):
+        beginning = round(rng.uniform(1000, 20000), 2)
+        balance = beginning
+        rows = []
+        for _ in range(transactions):
+            day = period_start + timedelta(days=rng.randrange(30))
+            kind = rng.random()
+            deposit = withdrawal = 0.0
+            if kind < 0.1:
+                description = rng.choice(INCOME)
+                deposit = round(rng.uniform(500, 5000), 2)
+            elif kind < 0.15:
+                description = rng.choice(TRANSFERS)
+                withdrawal = round(rng.uniform(100, 1000), 2)
+            else:
+                pattern, _, low, high = rng.choice(MERCHANTS)
+                description = f'{pattern} #{rng.randrange(1000, 9999)}'
+                withdrawal = round(rng.uniform(low, high), 2)
+            rows.append((day, description, deposit, withdrawal))
+        rows.sort(key=lambda r: r[0])
+        txs = []
+        for day, description, deposit, withdrawal in rows:
+            balance += deposit - withdrawal
+            txs.append({
+                'date': day.isoformat(),
+                'description': description,
+                'deposit': deposit,
+                'withdrawal': withdrawal,
+                'running_balance': balance,
+                'check_number': '',
+                'category': '',
+            })
+        accounts.append({
+            'account_number': f'{index % 7:04d}{a:04d}',
+            'account_type': 'Checking' if a == 0 else 'Savings',
+            'beginning_balance': beginning,
+            'ending_balance': round(balance, 2),
+            'transactions': txs,
+        })
+    return {
+        'metadata': {
+            'account_holder': HOLDERS[index % len(HOLDERS)],
+            'bank_name': BANKS[index % len(BANKS)],
+            'statement_period': {'start_date': period_start.isoformat(), 'end_date': period_end.isoformat()},
+        },
+        'accounts': accounts,
+    }
+
+
+def make_receipt(rng: random.Random, withdrawal: Dict[str, Any] = None) -> Dict[str, Any]:
+    """One receipt in ``analyze_receipt`` shape, for ``withdrawal`` when given."""
+    if withdrawal is not None:
+        merchant = next((name for pattern, name, _, _ in MERCHANTS if withdrawal['description'].startswith(pattern)),
+                        withdrawal['description'].title())
+        day = date.fromisoformat(withdrawal['date']) - timedelta(days=rng.randrange(2))
+        total = withdrawal['withdrawal']
+    else:
+        _, merchant, low, high = rng.choice(MERCHANTS)
+        day = START + timedelta(days=rng.randrange(365))
+        total = round(rng.uniform(low, high), 2)
+    tax = round(total * 0.13 / 1.13, 2)
+    items = []
+    remaining = round(total - tax, 2)
+    for n in range(rng.randint(1, 4)):
+        price = remaining if n == 3 else round(remaining * rng.uniform(0.2, 0.6), 2)
+        remaining = round(remaining - price, 2)
+        items.append({'description': rng.choice(ITEMS), 'quantity': 1, 'price': price, 'total_price': price})
+    return {
+        'receipt_number': 1,
+        'type': 'receipt.retailMeal' if merchant == 'Starbucks' else 'receipt.retail',
+        'merchant_name': merchant,
+        'transaction_date': day.isoformat(),
+        'items': items,
+        'subtotal': round(total - tax, 2),
+        'tax': tax,
+        'tip': 0.0,
+        'total': total,
+    }
+
+
+def make_invoice(rng: random.Random, index: int) -> Dict[str, Any]:
+    """One invoice in ``analyze_invoice`` shape (field contents are strings)."""
+    invoice_date = START + timedelta(days=rng.randrange(365))
+    items, subtotal = [], 0.0
+    for _ in range(rng.randint(1, 6)):
+        quantity = rng.randint(1, 10)
+        unit_price = round(rng.uniform(10, 500), 2)
+        subtotal += quantity * unit_price
+        items.append({
+            'description': rng.choice(ITEMS),
+            'quantity': str(quantity),
+            'unit_price': _money(unit_price),
+            'amount': _money(quantity * unit_price),
+        })
+    tax = round(subtotal * 0.13, 2)
+    return {
+        'invoice_number': 1,
+        'vendor_name': VENDORS[rng.randrange(len(VENDORS))],
+        'vendor_address': f'{rng.randint(1, 999)} Main St, Toronto, ON',
+        'customer_name': HOLDERS[index % len(HOLDERS)],
+        'invoice_id': f'INV-{index:06d}',
+        'invoice_date': invoice_date.isoformat(),
+        'due_date': (invoice_date + timedelta(days=rng.choice([15, 30, 45, 60]))).isoformat(),
+        'items': items,
+        'subtotal': _money(subtotal),
+        'total_tax': _money(tax),
+        'invoice_total': _money(subtotal + tax),
+    }
+
+
+def write_csv_pair(directory: str, base: str, statement: Dict[str, Any]):
+    """``<base>_summary.csv`` and ``<base>_all_transactions.csv`` for one statement."""
+    meta = statement['metadata']
+    period = f"{meta['statement_period']['start_date']} to {meta['statement_period']['end_date']}"
+    with open(os.path.join(directory, f'{base}_summary.csv'), 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Client Name', 'Bank Name', 'Account Number', 'Statement Period',
+                         'Beginning Balance', 'Ending Balance'])
+        for account in statement['accounts']:
+            writer.writerow([meta['account_holder'], meta['bank_name'], account['account_number'], period,
+                             _money(account['beginning_balance']), _money(account['ending_balance'])])
+    with open(os.path.join(directory, f'{base}_all_transactions.csv'), 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Account Number', 'Date', 'Description', 'Deposits', 'Withdrawals', 'Running Balance'])
+        for account in statement['accounts']:
+            for tx in account['transactions']:
+                writer.writerow([account['account_number'], tx['date'], tx['description'],
+                                 _money(tx['deposit']) if tx['deposit'] else '',
+                                 _money(tx['withdrawal']) if tx['withdrawal'] else '',
+                                 _money(tx['running_balance'])])
+
+
+def generate(root: str = 'output', statements: int = 12, transactions: int = 200, receipts: int = 1000,
+             invoices: int = 200, csv_pairs: int = 0, seed: int = 0) -> Dict[str, int]:
+    """Write a synthetic output tree under ``root``; returns the number of files written per kind."""
+    rng = random.Random(seed)
+    bank_dir = os.path.join(root, 'bank_statements')
+    receipt_dir = os.path.join(root, 'receipts')
+    invoice_dir = os.path.join(root, 'invoices')
+    for d in (bank_dir, receipt_dir, invoice_dir):
+        os.makedirs(d, exist_ok=True)
+
+    withdrawals: List[Dict[str, Any]] = []
+    for i in range(statements):
+        statement = make_statement(rng, i, transactions)
+        _write_json(os.path.join(bank_dir, f'statement_{i:05d}_bank_statement.json'), [statement])
+        if len(withdrawals) < receipts:
+            withdrawals.extend(tx for a in statement['accounts'] for tx in a['transactions']
+                               if tx['withdrawal'] and not tx['description'].startswith('TRANSFER'))
+    for i in range(csv_pairs):
+        write_csv_pair(bank_dir, f'csv_statement_{i:05d}', make_statement(rng, i, transactions))
+
+    for i in range(receipts):
+        source = rng.choice(withdrawals) if withdrawals and rng.random() < 0.5 else None
+        _write_json(os.path.join(receipt_dir, f'receipt_{i:06d}_receipt.json'), [make_receipt(rng, source)])
+
+    for i in range(invoices):
+        _write_json(os.path.join(invoice_dir, f'invoice_{i:06d}_invoice.json'), [make_invoice(rng, i)])
+
+    return {'statements': statements, 'csv_pairs': csv_pairs, 'receipts': receipts, 'invoices': invoices}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Write synthetic analyzer outputs.')
+    parser.add_argument('--root', default='output')
+    parser.add_argument('--statements', type=int, default=12)
+    parser.add_argument('--transactions', type=int, default=200, help='transactions per account')
+    parser.add_argument('--receipts', type=int, default=1000)
+    parser.add_argument('--invoices', type=int, default=200)
+    parser.add_argument('--csv-pairs', type=int, default=0)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    counts = generate(args.root, args.statements, args.transactions, args.receipts,
+                      args.invoices, args.csv_pairs, args.seed)
+    print(f"Wrote {counts} under {args.root}")
@@ -0,0 +1,362 @@
+"""Per-client (tenant) partitions of the analyzer output.
+
+Each client's documents live in their own partition,
+``output/<tenant>/<type>/`` (``bank_statements``, ``receipts``,
+``invoices``), next to a small manifest ``output/<tenant>/tenant.json``
+holding the display name and per-type document counts. The flat
+``output/<type>/`` layout stays the default (no tenant) partition.
+
+The dashboard keeps one set of loaders per tenant (receipt and invoice
+folders, ledger, receipt index) and only ever reads the requested
+partition, so a request costs what that client's data costs, not what all
+clients' data costs. The most recently used tenants are kept in memory.
+
+Move an existing flat output tree into partitions with::
+
+    python tenants.py migrate --default-tenant acme   # receipts carry no client name
+    python tenants.py list
+"""
+import argparse
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from segments import INDEX_SUFFIX, SEGMENT_PREFIXES, SEGMENT_SUFFIX, SegmentWriter, read_segment, segment_paths
+
+DEFAULT_ROOT = 'output'
+MANIFEST_FILE = 'tenant.json'
+
+# Document type -> legacy file suffix of its analyzer output
+KINDS = {
+    'bank_statements': '_bank_statement.json',
+    'receipts': '_receipt.json',
+    'invoices': '_invoice.json',
+}
+
+
+TENANT_PATTERN = re.compile(r'^[a-z0-9][a-z0-9_-]{0,63}$')
+
+
+class UnknownTenant(LookupError):
+    """A valid tenant id without a partition (never created, or removed since)."""
+
+
+def _folder_under_root(path: str) -> Optional[str]:
+    """First folder name of ``path`` below ``DEFAULT_ROOT``, or None when it lies elsewhere."""
+    relative = os.path.normpath(os.path.relpath(path, DEFAULT_ROOT))
+    if relative == os.curdir or relative.startswith(os.pardir):
+        return None
+    return relative.split(os.sep)[0]
+
+
+@lru_cache(maxsize=None)
+def reserved() -> FrozenSet[str]:
+    """Folder names under output/ that belong to the default partition and other tools."""
+    # Imported here: snapshot and parquet_store load numpy, which most tenant callers never need
+    from load_test import DEFAULT_OUTPUT_DIR
+    from parquet_store import DEFAULT_DATASET_DIR
+    from perf import PROFILE_DIR
+    from snapshot import DEFAULT_SNAPSHOT_DIR
+
+    tools = (_folder_under_root(path) for path in (DEFAULT_SNAPSHOT_DIR, DEFAULT_DATASET_DIR, PROFILE_DIR,
+                                                    DEFAULT_OUTPUT_DIR))
+    return frozenset(KINDS) | {folder for folder in tools if folder}
+
+
+def slugify(name: str) -> str:
+    """Tenant id for a client name: ``"Acme Consulting, Inc."`` -> ``acme-consulting-inc``."""
+    slug = re.sub(r'[^a-z0-9]+', '-', str(name or '').lower()).strip('-')[:64].rstrip('-')
+    return slug if slug and slug not in reserved() else ''
+
+
+def validate(tenant: str) -> str:
+    """``tenant`` if it is a valid tenant id, else ValueError (ids never contain path separators)."""
+    if not TENANT_PATTERN.match(tenant or '') or tenant in reserved():
+        raise ValueError(f"Invalid tenant '{tenant}': use lowercase letters, digits, '-' and '_'")
+    return tenant
+
+
+def partition_dir(kind: str, tenant: Optional[str] = None, root: str = DEFAULT_ROOT) -> str:
+    """Output folder of ``kind`` for ``tenant`` (the flat ``root/kind`` folder when tenant is None)."""
+    if tenant is None:
+        return os.path.join(root, kind)
+    return os.path.join(root, validate(tenant), kind)
+
+
+def sources(kinds: Iterable[str], tenant: str, root: str = DEFAULT_ROOT) -> Tuple[Tuple[str, str], ...]:
+    """``(directory, suffix)`` pairs a tenant's ``kinds`` are read from (see http_cache.data_version)."""
+    pairs = []
+    for kind in kinds:
+        directory = partition_dir(kind, tenant, root)
+        pairs += [(directory, KINDS[kind]), (directory, SEGMENT_SUFFIX)]
+    return tuple(pairs)
+
+
+def client_name(kind: str, records: List[Dict[str, Any]]) -> str:
+    """Client named by a document itself (account holder, invoice customer), or ''."""
+    for record in records:
+        if kind == 'bank_statements':
+            name = (record.get('metadata') or {}).get('account_holder')
+        elif kind == 'invoices':
+            name = record.get('customer_name')
+        else:
+            name = record.get('client')  # receipts only carry one when the uploader added it
+        if name:
+            return str(name)
+    return ''
+
+
+def client_of(kind: str, records: List[Dict[str, Any]]) -> str:
+    """Tenant id of the client a document names, or ''."""
+    return slugify(client_name(kind, records))
+
+
+# ----------------------------------------------------------------------
+# Manifests
+# ----------------------------------------------------------------------
+
+def _count_documents(directory: str, kind: str) -> Tuple[int, int]:
+    """Documents and bytes in one partition folder, from the directory listing and segment indexes."""
+    suffix = KINDS[kind]
+    ids, size = set(), 0
+    if not os.path.isdir(directory):
+        return 0, 0
+    for entry in os.scandir(directory):
+        if entry.name.endswith(suffix):
+            ids.add(entry.name[:-len(suffix)])
+            size += entry.stat().st_size
+    for path in segment_paths(directory, SEGMENT_PREFIXES[suffix]):
+        size += os.path.getsize(path)
+        try:
+            with open(path + INDEX_SUFFIX, 'rb') as f:
+                ids.update(json.loads(line)['id'] for line in f if line.endswith(b'\n'))
+        except FileNotFoundError:
+            pass
+    return len(ids), size
+
+
+def read_manifest(tenant: str, root: str = DEFAULT_ROOT) -> Optional[Dict[str, Any]]:
+    path = os.path.join(root, validate(tenant), MANIFEST_FILE)
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"Error reading tenant manifest {path}: {e}")
+        return None
+
+
+def write_manifest(tenant: str, root: str = DEFAULT_ROOT, name: Optional[str] = None) -> Dict[str, Any]:
+    """Recount a tenant's partitions and rewrite its manifest; the display name is kept unless given."""
+    previous = read_manifest(tenant, root) or {}
+    documents = {}
+    for kind in KINDS:
+        count, size = _count_documents(partition_dir(kind, tenant, root), kind)
+        documents[kind] = {'documents': count, 'bytes': size}
+    manifest = {
+        'tenant': tenant,
+        'name': name or previous.get('name') or tenant,
+        'created_at': previous.get('created_at') or datetime.now().isoformat(timespec='seconds'),
+        'updated_at': datetime.now().isoformat(timespec='seconds'),
+        'documents': documents,
+    }
+    path = os.path.join(root, tenant, MANIFEST_FILE)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, path)
+    return manifest
+
+
+def list_tenants(root: str = DEFAULT_ROOT) -> List[Dict[str, Any]]:
+    """Manifests of every tenant under ``root``, by tenant id."""
+    if not os.path.isdir(root):
+        return []
+    manifests = []
+    for entry in sorted(os.scandir(root), key=lambda e: e.name):
+        if entry.is_dir() and TENANT_PATTERN.match(entry.name) and entry.name not in reserved():
+            manifest = read_manifest(entry.name, root)
+            if manifest is not None:
+                manifests.append(manifest)
+    return manifests
+
+
+def exists(tenant: str, root: str = DEFAULT_ROOT) -> bool:
+    return os.path.isdir(os.path.join(root, validate(tenant)))
+
+
+# ----------------------------------------------------------------------
+# Per-tenant loaders for the dashboard
+# ----------------------------------------------------------------------
+
+class TenantData:
+    """One tenant's incrementally refreshed folders, ledger, vendor aggregates and receipt indexes."""
+
+    def __init__(self, tenant: str, root: str = DEFAULT_ROOT):
+        from json_folder import JsonFolder
+        from ledger import Ledger
+        from payables import VendorAggregates
+        from receipt_items import ReceiptItems
+
+        self.tenant = tenant
+        self.root = root
+        self.receipts = JsonFolder(partition_dir('receipts', tenant, root), KINDS['receipts'], label='receipt file')
+        self.invoices = JsonFolder(partition_dir('invoices', tenant, root), KINDS['invoices'], label='invoice file')
+        self.ledger = Ledger(partition_dir('bank_statements', tenant, root))
+        self.payables = VendorAggregates(self.invoices)
+        self.receipt_items = ReceiptItems(self.receipts)
+        self._receipt_index = (None, None)  # (receipts generation, index)
+        self._lock = threading.Lock()
+
+    def receipt_index(self):
+        """Receipt query index, rebuilt only when the tenant's receipt files change."""
+        from receipt_index import ReceiptIndex
+
+        receipts = self.receipts.records()
+        with self._lock:
+            generation, index = self._receipt_index
+            if generation != self.receipts.generation:
+                index = ReceiptIndex(receipts) if receipts else None
+                self._receipt_index = (self.receipts.generation, index)
+            return index
+
+
+class TenantCache:
+    """The ``max_tenants`` most recently requested tenants' loaders; older ones are dropped."""
+
+    def __init__(self, root: str = DEFAULT_ROOT, max_tenants: int = 16):
+        self.root = root
+        self.max_tenants = max(1, max_tenants)
+        self._tenants: 'OrderedDict[str, TenantData]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, tenant: str) -> TenantData:
+        """Loaders of ``tenant``; ValueError for an invalid id, UnknownTenant when it has no partition."""
+        validate(tenant)
+        with self._lock:
+            data = self._tenants.get(tenant)
+            if data is not None:
+                self._tenants.move_to_end(tenant)
+                return data
+        if not exists(tenant, self.root):
+            raise UnknownTenant(f"Unknown tenant '{tenant}'")
+        with self._lock:
+            data = self._tenants.get(tenant)
+            if data is None:
+                data = self._tenants[tenant] = TenantData(tenant, self.root)
+                while len(self._tenants) > self.max_tenants:
+                    self._tenants.popitem(last=False)
+            self._tenants.move_to_end(tenant)
+            return data
+
+    def __len__(self) -> int:
+        return len(self._tenants)
+
+
+# ----------------------------------------------------------------------
+# Migration of the flat layout
+# ----------------------------------------------------------------------
+
+def migrate(root: str = DEFAULT_ROOT, default_tenant: Optional[str] = None,
+            dry_run: bool = False) -> Dict[str, Dict[str, int]]:
+    """Move flat ``root/<type>/`` outputs into tenant partitions.
+
+    Each document goes to the tenant named by its client field (see
+    ``client_of``), else to ``default_tenant``; without one it stays in the
+    flat folder. JSON files are moved; NDJSON segment documents are appended
+    to the tenant's segments and the old segments are removed once every
+    document in them has been placed. Returns ``{tenant: {type: documents}}``.
+    """
+    if default_tenant is not None:
+        validate(default_tenant)
+    moved: Dict[str, Dict[str, int]] = {}
+    names: Dict[str, str] = {}
+
+    def place(kind, records):
+        return client_of(kind, records) or default_tenant
+
+    def count(kind, tenant, records):
+        moved.setdefault(tenant, {}).setdefault(kind, 0)
+        moved[tenant][kind] += 1
+        if tenant not in names and client_of(kind, records) == tenant:
+            names[tenant] = client_name(kind, records)
+
+    for kind, suffix in KINDS.items():
+        flat = partition_dir(kind, None, root)
+        if not os.path.isdir(flat):
+            continue
+        for name in sorted(os.listdir(flat)):
+            if not name.endswith(suffix):
+                continue
+            path = os.path.join(flat, name)
+            try:
+                with open(path, 'r') as f:
+                    records = json.load(f)
+            except Exception as e:
+                print(f"Error reading {path}: {e}")
+                continue
+            records = records if isinstance(records, list) else [records]
+            tenant = place(kind, records)
+            if not tenant:
+                continue
+            count(kind, tenant, records)
+            if not dry_run:
+                target = partition_dir(kind, tenant, root)
+                os.makedirs(target, exist_ok=True)
+                os.replace(path, os.path.join(target, name))
+
+        prefix = SEGMENT_PREFIXES[suffix]
+        for path in segment_paths(flat, prefix):
+            documents, _ = read_segment(path)
+            placed = [(doc_id, records, place(kind, records)) for doc_id, records in documents]
+            if not all(tenant for _, _, tenant in placed):
+                continue  # segments are only moved whole
+            for doc_id, records, tenant in placed:
+                count(kind, tenant, records)
+                if dry_run:
+                    continue
+                SegmentWriter(partition_dir(kind, tenant, root), prefix).append(doc_id, records)
+            if dry_run:
+                continue
+            os.remove(path)
+            if os.path.exists(path + INDEX_SUFFIX):
+                os.remove(path + INDEX_SUFFIX)
+
+    if not dry_run:
+        for tenant in moved:
+            write_manifest(tenant, root, name=names.get(tenant))
+    return moved
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('command', choices=['list', 'migrate', 'reindex'])
+    parser.add_argument('--root', default=DEFAULT_ROOT)
+    parser.add_argument('--default-tenant', help='migrate: tenant for documents without a client field')
+    parser.add_argument('--dry-run', action='store_true', help='migrate: only report where documents would go')
+    args = parser.parse_args()
+
+    if args.command == 'migrate':
+        moved = migrate(args.root, args.default_tenant, args.dry_run)
+        for tenant, kinds in sorted(moved.items()):
+            print(f"{tenant}: " + ', '.join(f"{count} {kind}" for kind, count in sorted(kinds.items())))
+        if not moved:
+            print("Nothing to migrate")
+        return
+    if args.command == 'reindex':
+        for manifest in list_tenants(args.root):
+            write_manifest(manifest['tenant'], args.root)
+    for manifest in list_tenants(args.root):
+        counts = ', '.join(f"{v['documents']} {kind}" for kind, v in manifest['documents'].items())
+        print(f"{manifest['tenant']:<32} {manifest['name']:<32} {counts}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""Background watcher that ingests analyzer outputs as they land in ``output/``.
+
+Each watched kind (bank statements, receipts, invoices) has the source files
+it is built from and a refresh callback that updates the in-process data
+incrementally. The watcher runs the callbacks once at start-up and then
+whenever a kind's sources change, and bumps that kind's data version after
+the refresh has finished, so a version never runs ahead of the data.
+
+File events come from ``watchdog`` (inotify on Linux) when it is installed;
+otherwise, and as a periodic safety net, the sources are re-scanned every
+``interval`` seconds.
+"""
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional, Set, Tuple
+
+from http_cache import data_version
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # optional dependency
+    Observer = None
+    FileSystemEventHandler = object
+
+Sources = Iterable[Tuple[str, str]]
+
+
+class _EventHandler(FileSystemEventHandler):
+    def __init__(self, watcher: 'OutputWatcher'):
+        self.watcher = watcher
+
+    def on_any_event(self, event):
+        for path in (getattr(event, 'src_path', ''), getattr(event, 'dest_path', '')):
+            if path:
+                self.watcher.notify(path)
+
+
+class OutputWatcher:
+    """Keeps watched kinds refreshed and publishes monotonically increasing data versions."""
+
+    def __init__(self, root: str, sources: Dict[str, Sources], handlers: Dict[str, Callable[[], Any]],
+                 interval: float = 2.0, debounce: float = 0.25):
+        self.root = root
+        self.sources = {kind: tuple(s) for kind, s in sources.items()}
+        self.handlers = handlers
+        self.interval = interval
+        self.debounce = debounce
+        self.ready = threading.Event()
+        self._versions = {kind: 0 for kind in self.sources}
+        self._signatures: Dict[str, Optional[str]] = {kind: None for kind in self.sources}
+        self._pending: Set[str] = set()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._observer = None
+
+    @property
+    def version(self) -> int:
+        """Total number of refreshes that changed data; increases with every change of any kind."""
+        return sum(self._versions.values())
+
+    def version_of(self, kind: str) -> Optional[str]:
+        """Data version of ``kind`` for ETags, or None until the initial load has finished."""
+        if not self.ready.is_set():
+            return None
+        return f'w{self._versions[kind]}'
+
+    def _kinds_for(self, path: str) -> Set[str]:
+        path = path.replace('\\', '/')
+        kinds = set()
+        for kind, sources in self.sources.items():
+            for source, suffix in sources:
+                source = source.replace('\\', '/').rstrip('/')
+                if path == source or (path.startswith(source + '/') and path.endswith(suffix)
+                                      and '/' not in path[len(source) + 1:]):
+                    kinds.add(kind)
+        return kinds
+
+    def notify(self, path: str):
+        kinds = self._kinds_for(path)
+        if kinds:
+            self._pending |= kinds
+            self._wake.set()
+
+    def refresh(self, kinds: Optional[Iterable[str]] = None) -> Set[str]:
+        """Refresh the given kinds (default: all) whose sources changed; returns the kinds updated."""
+        updated = set()
+        for kind in (kinds if kinds is not None else self.sources):
+            signature = data_version(self.sources[kind])
+            if signature == self._signatures[kind]:
+                continue
+            try:
+                self.handlers[kind]()
+            except Exception as e:
+                print(f"Error refreshing {kind}: {e}")
+                continue
+            self._signatures[kind] = signature
+            self._versions[kind] += 1
+            updated.add(kind)
+        return updated
+
+    def _run(self):
+        self.refresh()
+        self.ready.set()
+        # With file events the periodic scan is only a safety net
+        timeout = self.interval if self._observer is None else max(self.interval, 30.0)
+        while not self._stop.is_set():
+            woke = self._wake.wait(timeout)
+            if self._stop.is_set():
+                break
+            if woke:
+                time.sleep(self.debounce)  # let a batch of writes settle
+                self._wake.clear()
+                kinds, self._pending = self._pending, set()
+                self.refresh(kinds)
+            else:
+                self.refresh()
+
+    def start(self) -> 'OutputWatcher':
+        if self._thread is not None:
+            return self
+        if Observer is not None:
+            try:
+                observer = Observer()
+                observer.schedule(_EventHandler(self), self.root, recursive=True)
+                observer.daemon = True
+                observer.start()
+                self._observer = observer
+            except Exception as e:
+                print(f"File events unavailable, polling {self.root} instead: {e}")
+        self._thread = threading.Thread(target=self._run, name='output-watcher', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._observer is not None:
+            self._observer.stop()
+        if self._thread is not None:
+            self._thread.join(timeout=5)